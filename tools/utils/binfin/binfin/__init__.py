@@ -4,8 +4,17 @@ binfin: Update MamMark (mm) META_INFO data
 @author: R. Li Fo Sjoe
 """
 
-__version__ = '1.1.2'
+__version__ = '1.2.0'
 
+# 1.2.0         batch mode, -b <manifest> finishes many images, -j <jobs>
+#               worker processes, summary table of checksums.
+#               --bin to name the .bin file.
+#
+# 1.1.3         mmap the ELF, checksum the text/data segments a chunk
+#               at a time and write just the image_info (exe and .bin)
+#               in place.  ELF section data no longer loaded.
+#               bininfo: hand ImageInfo a bytearray.
+#
 # 1.1.2         buffer passed to tagcore.tlv processing needs to
 #               be a bytearray vs. string.  Compatibility problem
 #               standalone binfin vs. tlv use via tagdump.
@@ -29,7 +29,11 @@
 #   Usage: binfin [-h] [-D] [-V] [-w] [-c] [-i] [--version <maj>.<min>.<build>]
 #       [ -d <Img Desc.> ] [ --repo0 <Repo0 Desc.> ] [ --repo1 <Repo1 Desc.> ]
 #                          [ --url0  <url0  desc.> ] [ --url1  <url1  desc.> ]
-#       [ -t <timestamp> ] [ -H <HW Ver.>] [ -M <Model> ] <elf/exe filename>
+#       [ -t <timestamp> ] [ -H <HW Ver.>] [ -M <Model> ] [ --bin <bin file> ]
+#       <elf/exe filename>
+#
+#          binfin [-D] [-w] [-c] [-q] [-j <jobs>] [<image options>]
+#                 -b <manifest>
 #
 #       <filename> the name of an elf exectable.
 #           This file must contain an image_info struct.  This struct
@@ -81,6 +85,25 @@
 #   -M
 #       Model # 8-bit HEX
 #
+#   --bin
+#       .bin file to update along with the ELF, default is the ELF's name
+#       with .bin in place of its extension.  Skipped if it doesn't exist.
+#
+#   -b, --batch <manifest>
+#       finish every image listed in <manifest>, one image per line:
+#
+#           [<image options>] <elf/exe filename>
+#
+#       image options are --version, -d, --repo0, --url0, --repo1, --url1,
+#       -t and --bin, quoted as for the shell.  Options given on the
+#       command line are defaults for every line.  Relative paths are
+#       relative to the manifest's directory.  Blank lines and # comments
+#       are ignored.  Each image is parsed and checksummed once, the
+#       results are shown as a summary table in manifest order.
+#
+#   -j, --jobs <jobs>
+#       batch: finish images using <jobs> worker processes.
+#
 
 
 from   __future__ import print_function
@@ -89,6 +112,10 @@ from   __init__   import __version__ as VERSION
 import sys
 import argparse
 import os.path
+import mmap
+import copy
+import shlex
+import multiprocessing
 
 from   elf                  import *
 from   tagcore.base_objs    import *
@@ -101,55 +128,70 @@ from   tagcore.imageinfo_defs import *
 from   tagcore.imageinfo_defs import iip_tlv
 from   tagcore.imageinfo      import ImageInfo
 
-'''
-Offsets into the ELF and .bin file(s) where the image_info struct should be located
-ELF is used to find the image_info structure.  A valid ELF file is *required* to
-make all this work.
-'''
-elf_meta_offset = None
-bin_meta_offset = None
-meta_size       = None
-
 parser = None
-ii_cls = None
 debug  = None
 
-def save_imageinfo_exe(filename, bin_img_info):
-    global elf_meta_offset
+# checksum the image in chunks this size, never a copy of a whole segment
+SUM_CHUNK       = 1024 * 1024
 
-    infile = open(filename, 'rb', 0)
-    raw_elf = infile.read()
-    infile.close()
-
-    raw_elf = raw_elf[:elf_meta_offset] + bin_img_info + raw_elf[elf_meta_offset + meta_size:]
-    outfile = open(filename, 'w+b')
-    outfile.write(raw_elf)
-    outfile.close()
-
-def save_imageinfo_bin(filename, bin_img_info):
-    global bin_meta_offset, debug
+def pwrite(filename, offset, data):
+    '''write data into filename at offset, the rest of the file is left alone'''
+    fd = os.open(filename, os.O_RDWR)
+    try:
+        if hasattr(os, 'pwrite'):
+            os.pwrite(fd, bytes(data), offset)
+        else:
+            os.lseek(fd, offset, os.SEEK_SET)
+            os.write(fd, bytes(data))
+    finally:
+        os.close(fd)
+
+def save_imageinfo_exe(filename, elf_meta_offset, bin_img_info):
+    pwrite(filename, elf_meta_offset, bin_img_info)
+
+def save_imageinfo_bin(filename, bin_meta_offset, bin_img_info):
+    '''update the .bin file if there is one, returns True if there was'''
+    global debug
 
     try:
-        infile = open(filename, 'rb', 0)
-        raw_bin = infile.read()
-    except:
-        return
-    infile.close()
+        bin_len = os.path.getsize(filename)
+    except OSError:
+        return False
 
     if debug:
         print('** binfin: {}  bin_len: {}  meta: {}  info_len: {} '.format(
-                  filename,  len(raw_bin), bin_meta_offset, len(bin_img_info)))
-
-    raw_bin = raw_bin[:bin_meta_offset] + bin_img_info + \
-              raw_bin[bin_meta_offset + meta_size:]
-    outfile = open(filename, 'w+b')
-    outfile.write(raw_bin)
-    outfile.close()
-
-
-def process_TLV(xtype, value):
-    global ii_cls
-
+                  filename,  bin_len, bin_meta_offset, len(bin_img_info)))
+
+    pwrite(filename, bin_meta_offset, bin_img_info)
+    return True
+
+def bin_name(filename):
+    '''the .bin file that goes with the ELF filename'''
+    fn = filename.split(".")
+    if len(fn) > 1:
+        fn = '.'.join(fn[:len(fn)-1])
+    return fn + ".bin"
+
+
+def image_sum(img, segs, patch_off, patch):
+    '''
+    byte sum (32 bits) of the segments (offset, size) of img, as if patch
+    had been laid into img at patch_off.  img is walked a chunk at a time.
+    '''
+    total = 0
+    p_end = patch_off + len(patch)
+    for off, size in segs:
+        end = off + size
+        for pos in range(off, end, SUM_CHUNK):
+            total += sum(bytearray(img[pos:min(end, pos + SUM_CHUNK)]))
+        lo, hi = max(off, patch_off), min(end, p_end)
+        if lo < hi:                     # patch lands in this segment
+            total += sum(bytearray(patch[lo - patch_off:hi - patch_off]))
+            total -= sum(bytearray(img[lo:hi]))
+    return total & 0xffffffff
+
+
+def process_TLV(ii_cls, xtype, value):
     ttype = iip_tlv[xtype]
     consumed = ii_cls.setTLV(ttype, value)
 
@@ -190,6 +232,29 @@ def binfin_args():
         action = 'store_true',
         help = 'turn on quiet mode')
 
+    parser.add_argument('-b', '--batch',
+        metavar = 'MANIFEST',
+        help = 'finish every image listed in MANIFEST')
+
+    parser.add_argument('-j', '--jobs',
+        type = int,
+        default = 0,
+        help = 'batch: use JOBS worker processes')
+
+    image_args(parser)
+
+    parser.add_argument('elf_file',
+        nargs = '?',
+        help = 'ELF(.exe) executable or binary')
+
+    args = parser.parse_args()
+    if not args.batch and not args.elf_file:
+        parser.error('an ELF file (or -b <manifest>) is required')
+    return args
+
+
+def image_args(parser):
+    '''options that describe one image, command line and manifest lines'''
     parser.add_argument('--version',
         help = 'version string <major>.<minor>.<build> for the image.')
 
@@ -211,10 +276,8 @@ def binfin_args():
     parser.add_argument('-t', '--timestamp',
         help = 'image build time')
 
-    parser.add_argument('elf_file',
-        help = 'ELF(.exe) executable or binary')
-
-    return parser.parse_args()
+    parser.add_argument('--bin',
+        help = '.bin file to update, default <elf_file less ext>.bin')
 
 
 ########## main
@@ -222,69 +285,60 @@ def qprint(*args, **kwargs):
     if g.quiet: return
     print(*args, **kwargs)
 
-def processMeta(argv):
-    global parser, ii_cls
-    global elf_meta_offset, bin_meta_offset, meta_size
-    global debug
-
-    args     = binfin_args()
-    filename = args.elf_file
-
-    if args.debug:
-        debug   = True;
-        g.debug = True;
-
-    if args.quiet:
-        g.quiet = True;
-
-    if args.info:                       #if asking for Meta Info only
-        if os.access(filename, os.R_OK) == False:
-            eprint("need Read access to {}.".format(filename))
-            sys.exit(2)
-        bininfo(args.elf_file)
-        sys.exit(0)
+def stamp_image(filename, args):
+    '''
+    build the new image_info for the ELF filename from args (version and
+    TLVs) and checksum the image with it in place.  Nothing is written.
 
+    returns (ii_cls, new_im, elf_meta_offset, bin_meta_offset)
+    raises RuntimeError if filename isn't something we can finish.
+    '''
     if os.access(filename, os.R_OK) == False:
-        eprint("need read access to {}.".format(filename))
-        sys.exit(2)
+        raise RuntimeError("need read access to {}.".format(filename))
 
     if args.write and os.access(filename, os.W_OK) == False:
-        eprint("need write access to {} for -w (write).".format(filename))
-        sys.exit(2)
+        raise RuntimeError("need write access to {} for -w (write).".format(filename))
 
-    # get image info from input file and sanity check
+    # get image info from input file and sanity check.  The image is
+    # mapped, not read, only the pieces we need get touched.
     infile  = open(filename, 'rb', 0)
-    raw_elf = bytearray(infile.read())
-    infile.seek(0)                      # back to front of file
+    try:
+        raw_elf = mmap.mmap(infile.fileno(), 0, access = mmap.ACCESS_READ)
+    except (mmap.error, ValueError) as e:
+        raise RuntimeError("File {}: can't map: {}".format(filename, e))
+    finally:
+        infile.close()
 
-    # Load the ELF data and use the section information to find where the
+    try:
+        return stamp_mapped(filename, raw_elf, args)
+    finally:
+        raw_elf.close()
+
+def stamp_mapped(filename, raw_elf, args):
+    # Load the ELF headers and use the section information to find where the
     # image_info is located.  Then they can move this around at will if
     # needed
     elf = ELFObject()
     try:
-        elfhdr = elf.fromFile(infile)
+        elfhdr = elf.fromFile(raw_elf, load_data = False)
     except:
         eprint("*** File {} does not contain required valid ELF structure".format(filename))
         eprint('*** ELF: unhandled exception', sys.exc_info()[0])
         raise
-    infile.close()
 
     progs = elf.getProgrammableSections()
     meta  = elf.getSection('.image_meta')
+    if meta is None or meta.sh_offset == 0:
+        raise RuntimeError("File {} Requires a valid image_info META structure".format(filename))
     bin_meta_offset = meta.sh_addr - progs[0].p_paddr
     elf_meta_offset = meta.sh_offset
     meta_size       = meta.sh_size
-    if elf_meta_offset == 0:
-        parser.print_usage()
-        eprint("File {} Requires a valid image_info META structure".format(filename))
-        sys.exit(2)
 
     if meta_size != IMAGE_INFO_SIZE:
-        eprint("binary meta size {} does not agree with tagcore meta size {}".format(
+        raise RuntimeError("binary meta size {} does not agree with tagcore meta size {}".format(
             meta_size, IMAGE_INFO_SIZE))
-        sys.exit(2)
 
-    raw_ii = raw_elf[elf_meta_offset:elf_meta_offset + meta_size]
+    raw_ii = bytearray(raw_elf[elf_meta_offset:elf_meta_offset + meta_size])
     if debug:
         dump_buf(raw_ii, '', 'r_ii: ')
         print()
@@ -303,22 +357,22 @@ def processMeta(argv):
         ii_cls.setVersion(ver[0], ver[1], ver[2])
 
     if args.desc:
-        tlv_success = process_TLV('desc', args.desc)
+        process_TLV(ii_cls, 'desc', args.desc)
 
     if args.repo0:
-        tlv_success = process_TLV('repo0', args.repo0)
+        process_TLV(ii_cls, 'repo0', args.repo0)
 
     if args.url0:
-        tlv_success = process_TLV('url0', args.url0)
+        process_TLV(ii_cls, 'url0', args.url0)
 
     if args.repo1:
-        tlv_success = process_TLV('repo1', args.repo1)
+        process_TLV(ii_cls, 'repo1', args.repo1)
 
     if args.url1:
-        tlv_success = process_TLV('url1', args.url1)
+        process_TLV(ii_cls, 'url1', args.url1)
 
     if args.timestamp:
-        tlv_success = process_TLV('stamp', args.timestamp)
+        process_TLV(ii_cls, 'stamp', args.timestamp)
 
     text_offset = progs[0].p_offset
     text_size   = progs[0].p_filesz
@@ -332,27 +386,150 @@ def processMeta(argv):
     if debug:
         dump_buf(mod_im, '', 'mod:  ')
         print()
-    raw_elf = raw_elf[:elf_meta_offset] + mod_im + raw_elf[elf_meta_offset + meta_size:]
-
-    bin_img   = raw_elf[text_offset:text_offset+text_size] + raw_elf[data_offset:data_offset+data_size]
-    bin_bytes = bytearray(bin_img)
-    imgchksum = sum(bin_bytes) & 0xffffffff
+    imgchksum = image_sum(raw_elf, [ (text_offset, text_size),
+                                     (data_offset, data_size) ],
+                          elf_meta_offset, mod_im)
     ii_cls.setChecksum(imgchksum)
     new_im = ii_cls.build()
     if debug:
         dump_buf(new_im, '', 'new:  ')
         print()
+    return ii_cls, new_im, elf_meta_offset, bin_meta_offset
+
+
+def read_manifest(manifest, args):
+    '''
+    one job per image line of manifest: (line, elf file, bin file, args).
+    command line args are the defaults for each line.
+    '''
+    line_parser = argparse.ArgumentParser(prog = manifest, add_help = False)
+    image_args(line_parser)
+    line_parser.add_argument('elf_file')
+
+    base = os.path.dirname(manifest)
+    defaults = copy.copy(args)
+    defaults.bin = None
+    jobs = []
+    with open(manifest) as fd:
+        for lineno, line in enumerate(fd, 1):
+            words = shlex.split(line, comments = True)
+            if not words:
+                continue
+            try:
+                largs = line_parser.parse_args(words, copy.copy(defaults))
+            except SystemExit:
+                eprint('*** {}:{}: bad manifest line'.format(manifest, lineno))
+                sys.exit(2)
+            filename = os.path.join(base, largs.elf_file)
+            binfile  = os.path.join(base, largs.bin) if largs.bin else bin_name(filename)
+            jobs.append((lineno, filename, binfile, largs))
+    return jobs
+
+'''
+batch_one() : batch worker, finish one image.  Runs in a worker process
+    with --jobs, hands back a summary row or the error.
+'''
+def batch_one(job):
+    lineno, filename, binfile, args = job
+    try:
+        ii_cls, new_im, elf_meta_offset, bin_meta_offset = \
+            stamp_image(filename, args)
+        bin_done = False
+        if args.write:
+            save_imageinfo_exe(filename, elf_meta_offset, new_im)
+            bin_done = save_imageinfo_bin(binfile, bin_meta_offset, new_im)
+    except (Exception, SystemExit) as e:
+        return (lineno, filename, None, '{}: {}'.format(type(e).__name__, e))
+    basic = ii_cls.im_basic
+    ver   = basic['ver_id']
+    row   = ('{}.{}.{}'.format(ver['major'].val, ver['minor'].val, ver['build'].val),
+             basic['im_start'].val, basic['im_len'].val, basic['im_chk'].val,
+             os.path.basename(binfile) if bin_done else '-')
+    return (lineno, filename, row, None)
+
+'''
+batch_finish() : finish every image in the manifest, display a summary
+    table (manifest order).  Returns the exit status.
+'''
+def batch_finish(args):
+    jobs = read_manifest(args.batch, args)
+    if not jobs:
+        eprint('*** {}: no images'.format(args.batch))
+        return 2
+
+    if args.jobs > 1 and len(jobs) > 1:
+        pool    = multiprocessing.Pool(min(args.jobs, len(jobs)))
+        results = pool.imap(batch_one, jobs)
+    else:
+        pool    = None
+        results = (batch_one(job) for job in jobs)
+    width = max(len(job[1]) for job in jobs)
+    print('{:{w}}  {:10}  {:10}  {:10}  {:10}  {}'.format(
+        'image', 'sw_ver', 'load', 'len', 'chksum', 'bin', w = width))
+    errs = 0
+    try:
+        for lineno, filename, row, err in results:
+            if err:
+                errs += 1
+                print('{:{w}}  *** line {}: {}'.format(filename, lineno, err, w = width))
+                continue
+            print('{:{w}}  {:10}  0x{:08x}  0x{:08x}  0x{:08x}  {}'.format(
+                filename, *row, w = width))
+    except KeyboardInterrupt:
+        if pool:
+            pool.terminate()
+        raise
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    print()
+    if args.write:
+        print('{} of {} image(s) finished'.format(len(jobs) - errs, len(jobs)))
+    else:
+        print('*** write disabled')
+    return 1 if errs else 0
+
+
+def processMeta(argv):
+    global parser
+    global debug
+
+    args     = binfin_args()
+    filename = args.elf_file
+
+    if args.debug:
+        debug   = True;
+        g.debug = True;
+
+    if args.quiet:
+        g.quiet = True;
+
+    if args.info:                       #if asking for Meta Info only
+        if not filename:
+            parser.error('-i needs an ELF file')
+        if os.access(filename, os.R_OK) == False:
+            eprint("need Read access to {}.".format(filename))
+            sys.exit(2)
+        bininfo(args.elf_file)
+        sys.exit(0)
+
+    if args.batch:
+        sys.exit(batch_finish(args))
+
+    try:
+        ii_cls, new_im, elf_meta_offset, bin_meta_offset = \
+            stamp_image(filename, args)
+    except RuntimeError as e:
+        eprint(e)
+        sys.exit(2)
 
     qprint()
     if args.write:
-        save_imageinfo_exe(filename, new_im)
+        save_imageinfo_exe(filename, elf_meta_offset, new_im)
 
         # See if a .bin file is in the same place.  If so... update that as well
-        fn = filename.split(".")
-        if len(fn) > 1:
-            fn = '.'.join(fn[:len(fn)-1])
-        fn += ".bin"
-        save_imageinfo_bin(fn, new_im)
+        save_imageinfo_bin(args.bin or bin_name(filename), bin_meta_offset, new_im)
     else:
         print('*** write disabled')
 
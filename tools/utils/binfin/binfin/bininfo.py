@@ -83,7 +83,7 @@ def bininfo(filename):
             sys.exit(2)
 
     inFile.seek(meta_offset)
-    meta_raw = inFile.read(IMAGE_INFO_SIZE)
+    meta_raw = bytearray(inFile.read(IMAGE_INFO_SIZE))
     inFile.close()
     if g.debug:
         dump_buf(meta_raw[:0x150])
@@ -1,5 +1,6 @@
 #!/usr/bin/python2
 import struct
+from   bisect import bisect_right
 
 # ELF object file reader
 # (C) 2003 cliechti@gmx.net
@@ -57,6 +58,15 @@ import struct
     #~ Elf32_Word p_align;
 #~ } Elf32_Phdr;
 
+#~ typedef struct {
+    #~ Elf32_Word    st_name;
+    #~ Elf32_Addr    st_value;
+    #~ Elf32_Word    st_size;
+    #~ unsigned char st_info;
+    #~ unsigned char st_other;
+    #~ Elf32_Half    st_shndx;
+#~ } Elf32_Sym;
+
 
 class ELFException(Exception): pass
 
@@ -155,6 +165,51 @@ class ELFProgramHeader:
             self.p_filesz, self.p_memsz, self.p_flags,
             self.p_align)
 
+class ELFSymbol:
+    """read and store a symbol table entry"""
+    Elf32_Sym = "<IIIBBH"               #symbol format
+
+    #symbol types, st_info & 0xf
+    STT_NOTYPE      = 0
+    STT_OBJECT      = 1
+    STT_FUNC        = 2
+    STT_SECTION     = 3
+    STT_FILE        = 4
+    #symbol binding, st_info >> 4
+    STB_LOCAL       = 0
+    STB_GLOBAL      = 1
+    STB_WEAK        = 2
+    #special section indices
+    SHN_UNDEF       = 0
+    SHN_ABS         = 0xfff1
+
+    def __init__(self):
+        """create a new empty symbol"""
+        (self.st_name, self.st_value, self.st_size, self.st_info,
+         self.st_other, self.st_shndx) = [0]*6
+        self.name  = None
+        self.addr  = 0
+
+    def fromString(self, s):
+        """get symbol from string"""
+        (self.st_name, self.st_value, self.st_size, self.st_info,
+         self.st_other, self.st_shndx) = struct.unpack(self.Elf32_Sym, s)
+        self.addr = self.st_value
+        if self.type() == self.STT_FUNC:
+            self.addr &= ~1             #thumb bit
+
+    def type(self):
+        return self.st_info & 0xf
+
+    def bind(self):
+        return self.st_info >> 4
+
+    def __str__(self):
+        """pretty print for debug..."""
+        return "%s(%r, addr=0x%08x, size=%s, type=%s, bind=%s, shndx=%s)" % (
+            self.__class__.__name__, self.name, self.addr, self.st_size,
+            self.type(), self.bind(), self.st_shndx)
+
 class ELFObject:
     """Object to read and handle an LEF object file"""
     #header information
@@ -193,10 +248,16 @@ class ELFObject:
         self.e_entry, self.e_phoff, self.e_shoff,
         self.e_flags, self.e_ehsize, self.e_phentsize, self.e_phnum,
         self.e_shentsize, self.e_shnum, self.e_shstrndx) = [0]*14
+        self.fileobj     = None
+        self.section_map = {}           #name -> section
+        self.symbols     = None         #sorted by addr, see getSymbols
+        self.sym_addrs   = None
 
-    def fromFile(self, fileobj):
+    def fromFile(self, fileobj, load_data = True):
         """read all relevant data from fileobj.
-        the file must be seekable"""
+        the file must be seekable (an mmap will do).
+        load_data False only loads the string tables, section data
+        is left in the file"""
         #get file header
         (self.e_ident, self.e_type, self.e_machine, self.e_version,
         self.e_entry, self.e_phoff, self.e_shoff,
@@ -240,23 +301,90 @@ class ELFObject:
 
         #load data for all sections
         for section in self.sections:
-            fileobj.seek(section.sh_offset)
-            data = fileobj.read(section.sh_size)
-            section.data = data
-            if section.sh_type == ELFSection.SHT_STRTAB:
-                section.values = data.split('\0')
+            if load_data or section.sh_type == ELFSection.SHT_STRTAB:
+                fileobj.seek(section.sh_offset)
+                data = fileobj.read(section.sh_size)
+                section.data = data
+                if section.sh_type == ELFSection.SHT_STRTAB:
+                    section.values = data.split('\0')
             section.lma = self.getLMA(section)
 
         #get section names
         for section in self.sections:
             start = self.sections[self.e_shstrndx].data[section.sh_name:]
             section.name = start.split('\0')[0]
+            self.section_map.setdefault(section.name, section)
+
+        #symbols are parsed on first use, from here
+        self.fileobj = fileobj
+        self.symbols = None
 
     def getSection(self, name):
         """get section by name"""
-        for section in self.sections:
-            if section.name == name:
-                return section
+        return self.section_map.get(name)
+
+    def getSectionData(self, section):
+        """section data, from the file if fromFile didn't load it"""
+        if section.data is None:
+            self.fileobj.seek(section.sh_offset)
+            section.data = self.fileobj.read(section.sh_size)
+        return section.data
+
+    def getSymbols(self):
+        """code and data symbols from .symtab sorted by address.
+        parsed on first use, the file must still be open"""
+        if self.symbols is None:
+            self.loadSymbols()
+        return self.symbols
+
+    def loadSymbols(self):
+        """parse .symtab (names from its linked string table) into
+        the address index, symbols and sym_addrs"""
+        self.symbols   = []
+        self.sym_addrs = []
+        symtab = self.getSection('.symtab')
+        if symtab is None or symtab.sh_link >= len(self.sections):
+            return
+        strtab = self.getSectionData(self.sections[symtab.sh_link])
+        data   = self.getSectionData(symtab)
+        entsize = symtab.sh_entsize or struct.calcsize(ELFSymbol.Elf32_Sym)
+        symsize = struct.calcsize(ELFSymbol.Elf32_Sym)
+        for pos in range(0, len(data) - symsize + 1, entsize):
+            sym = ELFSymbol()
+            sym.fromString(data[pos:pos + symsize])
+            if sym.type() not in (ELFSymbol.STT_NOTYPE, ELFSymbol.STT_OBJECT,
+                                  ELFSymbol.STT_FUNC) or \
+               sym.st_shndx in (ELFSymbol.SHN_UNDEF, ELFSymbol.SHN_ABS):
+                continue
+            sym.name = strtab[sym.st_name:strtab.find('\0', sym.st_name)]
+            if not sym.name or sym.name[0] == '$':   #arm mapping symbols
+                continue
+            self.symbols.append(sym)
+        #where several share an address the sized function/object wins
+        self.symbols.sort(key = lambda sym: (sym.addr,
+                                             sym.type() != ELFSymbol.STT_NOTYPE,
+                                             sym.st_size))
+        self.sym_addrs = [ sym.addr for sym in self.symbols ]
+
+    def lookup(self, addr):
+        """symbol containing addr, None if there isn't one"""
+        symbols = self.getSymbols()
+        i = bisect_right(self.sym_addrs, addr) - 1
+        if i < 0:
+            return None
+        sym = symbols[i]
+        if sym.st_size and addr >= sym.addr + sym.st_size:
+            return None
+        return sym
+
+    def symbolize(self, addr):
+        """addr as name+0xoff, None if no symbol covers it"""
+        sym = self.lookup(addr)
+        if sym is None:
+            return None
+        if addr == sym.addr:
+            return sym.name
+        return "%s+0x%x" % (sym.name, addr - sym.addr)
 
     def getProgrammableSections(self):
         """get all program headers that are marked as executable and
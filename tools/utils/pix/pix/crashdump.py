@@ -33,6 +33,7 @@ from   __init__                 import __version__ as VERSION
 import sys
 import struct
 import zlib
+import binascii
 from   collections  import OrderedDict
 
 from   tagcore.base_objs    import *
@@ -51,206 +52,134 @@ class CrashDumpFormat:
 
     CRASHDUMP_SIG = CRASH_CATCHER_SIG
 
-    def __init__(self, panic, raw):
+    # registers symbolized in the report when we have the image's ELF
+    SYM_REGS = ['bxPC', 'bxLR']
+
+    def __init__(self, panic, raw, syms = None):
+        """
+        syms, if given, is the image's binfin.elf.ELFObject (anything
+        with symbolize(addr)), used to show where PC and LR were.
+        """
         self.panic = panic
         self.panic_raw = raw
+        self.syms  = syms
         self.panic_block0_obj  = self.panic['pb']
         self.panic_block1_obj  = obj_panic_zero_1()
         self.panic_block1_obj.set(raw[self.DEFAULT_BLOCK_SIZE:])
         return
 
     def dump_build(self, outFile):
+        report, dump = self.dump_text()
+        print(report, end = '')
+        outFile.write(dump)
+        return
+
+    def dump_text(self):
+        """
+        returns (report, dump).  report is the summary that gets
+        displayed, dump the CrashDump file contents.  The dump is built
+        in memory and written in one piece (see dump_build).
+        """
+        rpt = []                        # report pieces
+        out = []                        # dump pieces
         panic_info = self.panic_block0_obj['panic_info']
         add_info   = self.panic_block0_obj['add_info']
         crash_info = self.panic_block1_obj['crash_info']
-        if crash_info['ci_sig'] != CRASH_INFO_SIG:
-            print('*** crash_info_sig_mismatch: wanted {:08x}, got {:08x}'.format(
+        if crash_info['ci_sig'].val != CRASH_INFO_SIG:
+            rpt.append('*** crash_info_sig_mismatch: wanted {:08x}, got {:08x}\n'.format(
                 CRASH_INFO_SIG, crash_info['ci_sig'].val))
 
         image_info = self.panic['im']
         image_desc = image_info.getTLV(iip_tlv['desc'])
         rep0_desc = image_info.getTLV(iip_tlv['repo0'])
-        out = "{}/{}/{} {}:{}:{}.{}\n{} {}".format(panic_info['rt']['mon'].val,
+        hdr = "{}/{}/{} {}:{}:{}.{}\n{} {}".format(panic_info['rt']['mon'].val,
             panic_info['rt']['day'].val, panic_info['rt']['year'].val,
             panic_info['rt']['hr'].val, panic_info['rt']['min'].val,
             panic_info['rt']['sec'].val, panic_info['rt']['sub_sec'].val,
             image_desc, rep0_desc)
-        out += "\n"
-        print(out)
-        print(image_info)
-
-        ci_sig      = (crash_info['ci_sig'].val)
-        cc_sig      = (crash_info['cc_sig'].val)
-        cc_flags    = (crash_info['flags'].val)
-        bxReg_0     = (crash_info['bxReg_0'].val)
-        bxReg_1     = (crash_info['bxReg_1'].val)
-        bxReg_2     = (crash_info['bxReg_2'].val)
-        bxReg_3     = (crash_info['bxReg_3'].val)
-        bxReg_4     = (crash_info['bxReg_4'].val)
-        bxReg_5     = (crash_info['bxReg_5'].val)
-        bxReg_6     = (crash_info['bxReg_6'].val)
-        bxReg_7     = (crash_info['bxReg_7'].val)
-        bxReg_8     = (crash_info['bxReg_8'].val)
-        bxReg_9     = (crash_info['bxReg_9'].val)
-        bxReg_10    = (crash_info['bxReg_10'].val)
-        bxReg_11    = (crash_info['bxReg_11'].val)
-        bxReg_12    = (crash_info['bxReg_12'].val)
-        bxSP        = (crash_info['bxSP'].val)
-        bxLR        = (crash_info['bxLR'].val)
-        bxPC        = (crash_info['bxPC'].val)
-        bxPSR       = (crash_info['bxPSR'].val)
-        bxMSP	     = (crash_info['MSP'].val)
-        bxPSP	     = (crash_info['PSP'].val)
-        axPSR       = (crash_info['axPSR'].val)
-
-        ai_sig      = (add_info['ai_sig'].val)
-        ii_block    = ImageInfo(image_info.build())
+        hdr += "\n"
+        rpt.append(hdr + '\n')
+        rpt.append('{}\n'.format(image_info))
+        if self.syms is not None:
+            for reg in self.SYM_REGS:
+                addr = crash_info[reg].val
+                name = self.syms.symbolize(addr & ~1)      # thumb bit
+                rpt.append('{}: {:08X}  {}\n'.format(reg, addr, name or '?'))
+            rpt.append('\n')
 
         ram_offset  = (add_info['ram_offset'].val) - self.panic['offset']
-        ram_sector  = (ram_offset / self.DEFAULT_BLOCK_SIZE)
         ram_size    = (add_info['ram_size'].val)
         io_offset  = (add_info['io_offset'].val) - self.panic['offset']
-        io_sector = io_offset / self.DEFAULT_BLOCK_SIZE
         crumb_offset= (add_info['fcrumb_offset'].val) - self.panic['offset']
 
-        '''
+        """
         WRite the CrashDump 0x6343 (Cc) Signature
         NOTE: We override the panic dump cc_sig.  We need 0300 for
             version otherwise CrashDebug complains with ENODEV
-        '''
+        """
         global CRASH_CATCHER_SIG
-        outFile.write("{:08X}".format(CRASH_CATCHER_SIG))
-        outFile.write("\n")
+        out.append("{:08X}\n".format(CRASH_CATCHER_SIG))
 
         #Floating Point Regs do *not* follow registers
-        outFile.write("{:08X}".format(0))
-        '''
-        For new we exclude FP regs from the dump --TODO--
-        outFile.write("{:08X}".format(1 << 24))
-        '''
-        outFile.write("\n")
-
-        #Dump Registers
-        regs_1      = [bxReg_0,bxReg_1,bxReg_2,bxReg_3]
-        regs_2      = [bxReg_4,bxReg_5,bxReg_6,bxReg_7]
-        regs_3      = [bxReg_8,bxReg_9,bxReg_10,bxReg_11]
-        regs_4      = [bxReg_12]
-        regs_5	     = [bxSP]
-        regs_6	     = [bxLR, bxPC, bxPSR]
-        regs_7	     = [bxMSP, bxPSP, axPSR]
-        for b in regs_1:
-            val = struct.pack(">I", b)
-            val = struct.unpack("<I", val)[0]
-            outFile.write("{:08X}".format(val))
-        outFile.write("\n")
-        for b in regs_2:
-            val = struct.pack(">I", b)
-            val = struct.unpack("<I", val)[0]
-            outFile.write("{:08X}".format(val))
-        outFile.write("\n")
-        for b in regs_3:
-            val = struct.pack(">I", b)
-            val = struct.unpack("<I", val)[0]
-            outFile.write("{:08X}".format(val))
-        outFile.write("\n")
-        for b in regs_4:
-            val = struct.pack(">I", b)
-            val = struct.unpack("<I", val)[0]
-            outFile.write("{:08X}".format(val))
-        outFile.write("\n")
-        for b in regs_5:
-            val = struct.pack(">I", b)
-            val = struct.unpack("<I", val)[0]
-            outFile.write("{:08X}".format(val))
-        outFile.write("\n")
-        for b in regs_6:
-            val = struct.pack(">I", b)
-            val = struct.unpack("<I", val)[0]
-            outFile.write("{:08X}".format(val))
-        outFile.write("\n")
-        for b in regs_7:
-            val = struct.pack(">I", b)
-            val = struct.unpack("<I", val)[0]
-            outFile.write("{:08X}".format(val))
-        outFile.write("\n")
-
-        '''
+        #For now we exclude FP regs from the dump --TODO--
+        #  (1 << 24) says they follow
+        out.append("{:08X}\n".format(0))
+
+        #Dump Registers, each word as its little endian bytes
+        regs = [ ['bxReg_0', 'bxReg_1', 'bxReg_2', 'bxReg_3'],
+                 ['bxReg_4', 'bxReg_5', 'bxReg_6', 'bxReg_7'],
+                 ['bxReg_8', 'bxReg_9', 'bxReg_10', 'bxReg_11'],
+                 ['bxReg_12'],
+                 ['bxSP'],
+                 ['bxLR', 'bxPC', 'bxPSR'],
+                 ['MSP', 'PSP', 'axPSR'] ]
+        for line in regs:
+            out.append(le_words(*[ crash_info[r].val for r in line ]))
+            out.append("\n")
+
+        """
         Dump the RAM region
-        '''
+        """
         ram_header = self.panic_block1_obj['ram_header']
         ram_start   = (ram_header['start'].val)
         ram_end     = (ram_header['end'].val)
-        print("RAM: {:08X} - {:08X}".format(ram_start, ram_end))
-        val = struct.pack(">I", ram_start)
-        val = struct.unpack("<I", val)[0]
-        outFile.write("{:08X}".format(val))
-        val = struct.pack(">I", ram_end)
-        val = struct.unpack("<I", val)[0]
-        outFile.write("{:08X}".format(val))
-        outFile.write("\n")
-
-        rambytes = bytearray(self.panic_raw[ram_offset:])
-        offset = 0
-        while True:
-            b = rambytes[offset]
-            outFile.write("{:02X}".format(b))
-            offset += 1
-            if offset >= ram_size:
-                break;
-            if offset % 16 == 0:
-                outFile.write("\n")
-        outFile.write("\n")
-
-        '''
+        rpt.append("RAM: {:08X} - {:08X}\n".format(ram_start, ram_end))
+        out.append(le_words(ram_start, ram_end))
+        out.append("\n")
+        rambytes = self.panic_raw[ram_offset:ram_offset + max(ram_size, 1)]
+        if len(rambytes) < max(ram_size, 1):
+            raise IndexError('crashdump: ram region past the end of the panic block')
+        out.append(hex_lines(rambytes))
+
+        """
         I/O Space... Do we dump this at all?
-        '''
+        """
         global io_reg_map
         rambytes = self.panic_raw[io_offset:crumb_offset]
         io_info = obj_io_info()
         io_info.set(rambytes)
         for reg, addr in io_reg_map.items():
-            iostart = addr
             reglen = len(io_info[reg])
-            val = struct.pack(">I", addr)
-            val = struct.unpack("<I", val)[0]
-            outFile.write("{:08X}".format(val))
-            ioend = addr+reglen
-            val = struct.pack(">I", addr + reglen)
-            val = struct.unpack("<I", val)[0]
-            outFile.write("{:08X}".format(val))
-            outFile.write("\n")
-#            print("{} : {:08X} - {:08X}".format(reg, iostart, ioend))
+            out.append(le_words(addr, addr + reglen))
+            out.append("\n")
+            out.append(hex_lines(io_info[reg].val))
 
-            charcount = 0
-            reg_data = io_info[reg].val
-            reg_data = bytearray(reg_data)
-            for c in reg_data:
-                outFile.write("{:02X}".format(c))
-                charcount += 1
-                if charcount % 16 == 0:
-                    outFile.write("\n")
-            if charcount % 16 != 0:
-                outFile.write("\n")
-
-        '''
+        """
         Dump the Crumbs region  --TODO--
-        outFile.write("{:08X}".format(ram_start))
-        outFile.write("{:08X}".format(ram_end))
-        outFile.write("\n")
+        see the RAM region, fcrumb_offset (add_info) - self.panic['offset']
+        is where the crumbs start in the panic block.
+        """
 
-        fcrumb_offset = add_info['fcrumb_offset'].val
-        fcrumb_pb_offset = fcrumb_offset - self.panic['offset']
-        rambytes = bytearray(self.panic_raw[fcrumb_pb_offset:len(self.panic_raw)])
-        offset = 0
-        while True:
-            b = rambytes[offset]
-            outFile.write("{:02X}".format(b))
-            offset += 1
-            if offset >= ram_size:
-                break;
-            if offset % 16 == 0:
-                outFile.write("\n")
-        outFile.write("\n")
-        '''
+        return ''.join(rpt), ''.join(out)
 
-        return
+
+def le_words(*words):
+    """hex of the words as little endian bytes, what CrashDebug wants"""
+    return binascii.hexlify(struct.pack('<{}I'.format(len(words)), *words)).upper()
+
+
+def hex_lines(data, width = 16):
+    """hex of data, width bytes per line, every line ends with a newline"""
+    data = bytes(data)
+    return ''.join([ binascii.hexlify(data[i:i + width]).upper() + '\n'
+                     for i in range(0, len(data), width) ])
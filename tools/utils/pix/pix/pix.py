@@ -23,9 +23,11 @@
 display and extract panic blocks from a composite PANIC file.
 Extracted panics can be fed to CrashDump for analysis.
 
-usage: pix [-h] [-V]
+usage: pix [-h] [-V] [-l] [-x <n>] [-n]
            [-o <output>]
            [--output <output>]
+           [-a | -r <lo>:<hi>] [-d <dir>] [-j <jobs>]
+           [-e <elf>]
            panic_file
 
 Args:
@@ -34,18 +36,57 @@ optional arguments:
   -h            show this help message and exit
   -V            show program's version number and exit
   -l            List all PanicBlocks available
+  -x <n>        panic block to extract
 
   -o <output>   enables extraction and sets output file.
                 (args.output, file)
 
+  -n, --nocache don't use or write the panic directory cache
+
+  -e <elf>      the image's ELF (main.exe), extraction reports show the
+  --elf <elf>   function bxPC and bxLR were in (needs binfin)
+
+batch extraction, one CrashDump file per panic, written to
+<dir>/<panic_file>.<n>.dmp:
+
+  -a, --all     extract every valid panic
+  -r <lo>:<hi>  extract the valid panics in slots lo through hi
+  --range       (either end can be left off)
+
+  -d <dir>      where the batch dumps go (default .)
+  --dir <dir>
+
+  -j <jobs>     extract using <jobs> worker processes
+  --jobs <jobs>
+
 positional argument:
   panic_file    input file, composite PANIC file.
+
+The PANIC file is memory mapped.  The panic info signature of every
+slot is checked in one pass (numpy if available) and only the slots
+that have one are decoded.  The resulting panic directory is cached in
+<panic_file>.pidx, good as long as the PANIC directory sector and the
+file size haven't changed, so listing and extracting again don't
+rescan the file.
+
+cache file layout (little endian):
+
+    header:  magic 'PIDX', version (H), entry count (H), file size (Q),
+             raw PANIC directory (DIR_RAW_SIZE bytes), warning count (H)
+    entries: slot (I), offset (Q), rtctime (sub_sec, sec, min, hr, dow,
+             day, mon, year), desc len (H), repo0 len (H), then desc
+             and repo0 (as displayed)
+    warnings: len (H), then the text.  What the scan reported about
+             bad slots, displayed again when the cache is used.
 '''
 
 from   __future__               import print_function
 from   __init__                 import __version__ as VERSION
 
+import os
 import sys
+import mmap
+import multiprocessing
 import struct
 import argparse
 from   collections              import OrderedDict
@@ -57,15 +98,38 @@ from   tagcore.panic_headers    import *
 
 from crashdump                  import *
 
+# numpy is optional, only used to speed up the slot scan.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# binfin is optional, its ELF reader symbolizes PC/LR (-e).
+try:
+    from binfin.elf import ELFObject
+except ImportError:
+    ELFObject = None
+
 ppPP = PrettyPrinter(indent = 4)
 pp   = ppPP.pprint
 
 DEFAULT_BLOCK_SIZE = 512    #Default we use for DIR record
 
+PIX_MAJIK          = b'PIDX'
+PIX_VERSION        = 2
+DIR_RAW_SIZE       = 32     # panic_dir, what the cache is keyed on
+
+pix_hdr_struct     = struct.Struct('<4sHHQ{}sH'.format(DIR_RAW_SIZE))
+pix_entry_struct   = struct.Struct('<IQHBBBBBBHHH')
+pix_warn_struct    = struct.Struct('<H')
+pi_sig_struct      = struct.Struct('<I')
+
 # Global scope
 args    = None
 inFile  = None
+inMap   = None
 outFile = None
+elfSyms = None
 
 pblk            = 'ffffff'
 plist           = []
@@ -81,11 +145,17 @@ panic_block_maximum = None
 pix_init : Read the directory and validate we have good data to look at
 '''
 def pix_init():
-    global inFile, panic_dir_sector, panic_high_sector, panic_block_size
+    global inFile, inMap, panic_dir_sector, panic_high_sector, panic_block_size
     global  DEFAULT_BLOCK_SIZE, panic_block_maximum, panic_block_index
 
+    try:
+        inMap = mmap.mmap(inFile.fileno(), 0, access = mmap.ACCESS_READ)
+    except (mmap.error, ValueError) as e:
+        print('*** {}: can not map: {}'.format(inFile.name, e))
+        sys.exit(1)
+
     # Read in Directory block for verification
-    raw = inFile.read(DEFAULT_BLOCK_SIZE)
+    raw = bytearray(inMap[:DEFAULT_BLOCK_SIZE])
     panic_dir_obj     = obj_panic_dir()
     consumed          = panic_dir_obj.set(raw)
     panic_dir_cksum   = panic_dir_obj['panic_dir_checksum'].val
@@ -107,14 +177,40 @@ def pix_init():
     return
 
 '''
-panic_valid() : Validates a specific panic block
+elf_load() : symbols of the image's ELF, for the extraction reports.
+    Parsed here, before any batch workers are started, so they share it.
+'''
+def elf_load(elf_file):
+    global elfSyms
+
+    if ELFObject is None:
+        print('*** -e needs binfin (binfin.elf) installed')
+        sys.exit(1)
+    elfSyms = ELFObject()
+    try:
+        elfSyms.fromFile(elf_file, load_data = False)
+        elfSyms.getSymbols()
+    except Exception as e:
+        print('*** {}: not a usable ELF: {}'.format(elf_file.name, e))
+        sys.exit(1)
+    if not elfSyms.getSymbols():
+        print('*** {}: no symbols (stripped?)'.format(elf_file.name))
+    return
+
+'''
+panic_offset() : file offset of a panic block
+'''
+def panic_offset(blockno):
+    return (blockno * (panic_block_size * DEFAULT_BLOCK_SIZE)) + DEFAULT_BLOCK_SIZE
+
+'''
+panic_valid() : decode a specific panic block, one with a good pi_sig
 '''
 def panic_valid(blockno):
     global plist, panic_block_size, DEFAULT_BLOCK_SIZE, PANIC_INFO_SIG
 
-    offset = (blockno * (panic_block_size * DEFAULT_BLOCK_SIZE)) + DEFAULT_BLOCK_SIZE
-    inFile.seek(offset)
-    buf = inFile.read(DEFAULT_BLOCK_SIZE)
+    offset = panic_offset(blockno)
+    buf = bytearray(inMap[offset:offset + DEFAULT_BLOCK_SIZE])
 
     panic_block_0_obj  = obj_panic_zero_0()
     panic_block_0_size = len(panic_block_0_obj)
@@ -122,16 +218,121 @@ def panic_valid(blockno):
     image_info = ImageInfo(buf[pbsize:])
     bptr = buf
     consumed   = panic_block_0_obj.set(bptr)
-    panic_info = panic_block_0_obj['panic_info']
-    pi_sig     = panic_info['pi_sig'].val
-    if pi_sig != PANIC_INFO_SIG:
-        print("*** Panic Info Signature Fail :#{}  wanted {:08X}, got {:08X}".format(
-            blockno,
-            PANIC_INFO_SIG,
-            panic_info['pi_sig'],
-            ))
     return {'pb':panic_block_0_obj, 'im':image_info, 'offset':offset}
 
+'''
+panic_scan() : slots (< panic_block_index) holding a panic, one pass
+    over the signatures.  returns (slots, warnings), warnings are the
+    lines reporting bad slots.
+'''
+def panic_scan():
+    slots = range(0, panic_block_index)
+    offsets = [ panic_offset(n) for n in slots ]
+    offsets = [ o for o in offsets if o + DEFAULT_BLOCK_SIZE <= len(inMap) ]
+    if np is not None and offsets:
+        words = np.frombuffer(inMap, dtype = np.uint32,
+                              count = offsets[-1] / 4 + 1)
+        sigs  = words[np.array(offsets) / 4].tolist()
+    else:
+        sigs  = [ pi_sig_struct.unpack_from(inMap, o)[0] for o in offsets ]
+    good  = []
+    warns = []
+    for n in slots:
+        sig = sigs[n] if n < len(sigs) else None
+        if sig == PANIC_INFO_SIG:
+            good.append(n)
+        elif sig is None:
+            warns.append("*** Panic Block #{} past end of file".format(n))
+        else:
+            warns.append("*** Panic Info Signature Fail :#{}  wanted {:08X}, got {:08X}".format(
+                n, PANIC_INFO_SIG, sig))
+    return good, warns
+
+'''
+panic_entry() : directory entry for a panic block.  Only what the
+    listing needs is decoded, panic_info and the image_info tlvs.
+'''
+panic_info_obj = obj_panic_info()
+image_info_at  = len(obj_panic_info()) + len(obj_owcb())
+
+def panic_entry(blockno):
+    offset = panic_offset(blockno)
+    buf = bytearray(inMap[offset:offset + DEFAULT_BLOCK_SIZE])
+    panic_info_obj.set(buf)
+    image_info = ImageInfo(buf[image_info_at:])
+    rt = panic_info_obj['rt']
+    return {
+        'slot':   blockno,
+        'offset': offset,
+        'rt':     tuple([ rt[f].val for f in ('sub_sec', 'sec', 'min', 'hr',
+                                              'dow', 'day', 'mon', 'year') ]),
+        'desc':   '{}'.format(image_info.getTLV(iip_tlv['desc'])),
+        'repo0':  '{}'.format(image_info.getTLV(iip_tlv['repo0'])),
+    }
+
+def cache_path():
+    return inFile.name + '.pidx'
+
+def dir_raw():
+    return bytes(inMap[:DIR_RAW_SIZE])
+
+'''
+cache_load() : (panic directory, scan warnings) from the sidecar, None
+    if it isn't there or isn't for this PANIC file (directory sector or
+    size changed)
+'''
+def cache_load():
+    try:
+        with open(cache_path(), 'rb') as fd:
+            buf = fd.read()
+        majik, ver, count, fsize, raw, nwarn = pix_hdr_struct.unpack_from(buf, 0)
+        if majik != PIX_MAJIK or ver != PIX_VERSION or \
+           fsize != len(inMap) or raw != dir_raw():
+            return None
+        entries = []
+        pos = pix_hdr_struct.size
+        for i in range(count):
+            vals = pix_entry_struct.unpack_from(buf, pos)
+            pos += pix_entry_struct.size
+            dlen, rlen = vals[-2:]
+            if pos + dlen + rlen > len(buf):
+                return None
+            entries.append({
+                'slot':   vals[0],
+                'offset': vals[1],
+                'rt':     vals[2:10],
+                'desc':   buf[pos:pos + dlen],
+                'repo0':  buf[pos + dlen:pos + dlen + rlen],
+            })
+            pos += dlen + rlen
+        warns = []
+        for i in range(nwarn):
+            wlen, = pix_warn_struct.unpack_from(buf, pos)
+            pos += pix_warn_struct.size
+            if pos + wlen > len(buf):
+                return None
+            warns.append(buf[pos:pos + wlen])
+            pos += wlen
+    except (IOError, struct.error):
+        return None
+    return entries, warns
+
+def cache_write(entries, warns):
+    try:
+        with open(cache_path(), 'wb') as fd:
+            fd.write(pix_hdr_struct.pack(PIX_MAJIK, PIX_VERSION, len(entries),
+                                         len(inMap), dir_raw(), len(warns)))
+            for e in entries:
+                fd.write(pix_entry_struct.pack(*((e['slot'], e['offset']) + e['rt'] +
+                                                 (len(e['desc']), len(e['repo0'])))))
+                fd.write(e['desc'])
+                fd.write(e['repo0'])
+            for w in warns:
+                fd.write(pix_warn_struct.pack(len(w)))
+                fd.write(w)
+    except IOError as e:
+        print('*** panic cache: {}: {}'.format(cache_path(), e))
+
 '''
 panic_search() : Search for all panic blocks and get basic header info.
     Build a list of this to allow for further Xtraction
@@ -139,34 +340,120 @@ panic_search() : Search for all panic blocks and get basic header info.
 def panic_search():
     global inFile, plist, valid_panic_count, panic_block_index
 
-    for panic in range(0, panic_block_index):
-        p = panic_valid(panic)
-        if (p):
-            valid_panic_count += 1
-            plist.append(p)
+    cached = None
+    if not args.nocache:
+        cached = cache_load()
+    if cached:
+        plist, warns = cached
+    else:
+        slots, warns = panic_scan()
+        plist = [ panic_entry(n) for n in slots ]
+        if not args.nocache:
+            cache_write(plist, warns)
+    for w in warns:
+        print(w)
+    valid_panic_count = len(plist)
     return
 
+def panic_find(blockno):
+    for p in plist:
+        if p['slot'] == blockno:
+            return p
+    return None
+
 def panic_dir():
     global valid_panic_count, plist
     print("{} Panic Dump(s) found".format(valid_panic_count))
     out = ""
-    k = 0
     for panic in plist:
-        panic_info = panic['pb']['panic_info']
-        image_info = panic['im']
-        image_desc = image_info.getTLV(iip_tlv['desc'])
-        rep0_desc = image_info.getTLV(iip_tlv['repo0'])
-        out += "#{} {}/{}/{} {}:{}:{}.{}\n{} {}".format(k,
-            panic_info['rt']['mon'].val,
-            panic_info['rt']['day'].val, panic_info['rt']['year'].val,
-            panic_info['rt']['hr'].val, panic_info['rt']['min'].val,
-            panic_info['rt']['sec'].val, panic_info['rt']['sub_sec'].val,
-            image_desc, rep0_desc)
+        sub_sec, sec, xmin, hr, dow, day, mon, year = panic['rt']
+        out += "#{} {}/{}/{} {}:{}:{}.{}\n{} {}".format(panic['slot'],
+            mon, day, year, hr, xmin, sec, sub_sec,
+            panic['desc'], panic['repo0'])
         out += "\n"
-        k += 1
     print("{}".format(out))
     return
 
+'''
+slot_range() : argparse type for -r, 'lo:hi', 'lo:', ':hi', or 'n'
+'''
+def slot_range(arg):
+    try:
+        if ':' not in arg:
+            return (int(arg), int(arg))
+        lo, hi = arg.split(':', 1)
+        return (int(lo) if lo else 0, int(hi) if hi else None)
+    except ValueError:
+        raise argparse.ArgumentTypeError('bad slot range: {}'.format(arg))
+
+'''
+panic_extract() : CrashDump of one panic block, (report, dump) strings
+'''
+def panic_extract(blockno):
+    pb = panic_valid(blockno)
+    pblk_offset = pb['offset']
+    ex_blk = inMap[pblk_offset:pblk_offset + panic_block_size*DEFAULT_BLOCK_SIZE]
+    return CrashDumpFormat(pb, ex_blk, elfSyms).dump_text()
+
+def batch_path(blockno):
+    return os.path.join(args.dir, '{}.{}.dmp'.format(
+        os.path.basename(inFile.name), blockno))
+
+'''
+batch_one() : batch worker, extract one panic block to its file.  Runs
+    in a worker process with --jobs, everything handed back is a string.
+'''
+def batch_one(blockno):
+    path = batch_path(blockno)
+    try:
+        report, dump = panic_extract(blockno)
+        with open(path, 'wb') as fd:
+            fd.write(dump)
+    except Exception as e:
+        return (blockno, path, '', '{}: {}'.format(type(e).__name__, e))
+    return (blockno, path, report, None)
+
+'''
+panic_batch() : extract all (or a range of) the valid panics, each to
+    its own CrashDump file.  Results are displayed in slot order.
+'''
+def panic_batch():
+    lo, hi = args.range or (0, None)
+    slots = [ p['slot'] for p in plist
+              if p['slot'] >= lo and (hi is None or p['slot'] <= hi) ]
+    if not slots:
+        print('*** no valid panics to extract')
+        return 1
+    if not os.path.isdir(args.dir):
+        os.makedirs(args.dir)
+
+    if args.jobs > 1 and len(slots) > 1:
+        pool    = multiprocessing.Pool(min(args.jobs, len(slots)))
+        results = pool.imap(batch_one, slots)
+    else:
+        pool    = None
+        results = (batch_one(n) for n in slots)
+    errs = 0
+    try:
+        for blockno, path, report, err in results:
+            if err:
+                errs += 1
+                print('*** #{}: extraction failed: {}'.format(blockno, err))
+                continue
+            print('#{} -> {}'.format(blockno, path))
+            print(report)
+    except KeyboardInterrupt:
+        if pool:
+            pool.terminate()
+        raise
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    print('{} of {} panic(s) extracted to {}'.format(
+        len(slots) - errs, len(slots), args.dir))
+    return 1 if errs else 0
+
 def panic_args():
     parser = argparse.ArgumentParser(
         description='Panic Inspector/eXtractor (PIX)')
@@ -183,6 +470,31 @@ def panic_args():
         type = int,
         help = 'Extract specific panic block #')
 
+    parser.add_argument('-n', '--nocache',
+        action = 'store_true',
+        help = "don't use or write the panic directory cache")
+
+    parser.add_argument('-a', '--all',
+        action = 'store_true',
+        help = 'extract every valid panic (batch)')
+
+    parser.add_argument('-r', '--range',
+        type = slot_range,
+        help = 'extract the valid panics in slots lo:hi (batch)')
+
+    parser.add_argument('-d', '--dir',
+        default = '.',
+        help = 'directory for batch extraction, default .')
+
+    parser.add_argument('-j', '--jobs',
+        type = int,
+        default = 0,
+        help = 'batch extraction using JOBS worker processes')
+
+    parser.add_argument('-e', '--elf',
+                        type = argparse.FileType('rb'),
+                        help = "image ELF, symbolize bxPC/bxLR in extractions")
+
     parser.add_argument('panic_file',
                         type = argparse.FileType('rb'),
                         help = 'panic file')
@@ -208,23 +520,25 @@ def main():
 
     pix_init()
     panic_search()
+    if args.elf:
+        elf_load(args.elf)
 
     if args.ls:
         panic_dir()
 
     if args.output:
         panic_block = args.extract
-        if panic_block >= panic_block_index:
+        if panic_block is None or panic_find(panic_block) is None:
             print("**Enter a valid Panic Block.  Use -l to see available panic blocks***")
             sys.exit(1)
 
-        pb = plist[panic_block]
-        pblk_offset = pb['offset']
-        inFile.seek(pblk_offset)
-        ex_blk = inFile.read(panic_block_size*DEFAULT_BLOCK_SIZE)
-        crashdump = CrashDumpFormat(pb, ex_blk)
-        crashdump.dump_build(outFile)
+        report, dump = panic_extract(panic_block)
+        print(report, end = '')
+        outFile.write(dump)
         outFile.close()
 
+    if args.all or args.range:
+        sys.exit(panic_batch())
+
 if __name__ == "__main__":
     main()
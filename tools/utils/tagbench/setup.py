@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+
+DESCRIPTION = 'Decode benchmark for Tag record decoders and emitters'
+
+import os, re
+def get_version():
+    VERSIONFILE = os.path.join('tagbench', '__init__.py')
+    initfile_lines = open(VERSIONFILE, 'rt').readlines()
+    VSRE = r"^__version__ = ['\"]([^'\"]*)['\"]"
+    for line in initfile_lines:
+        mo = re.search(VSRE, line, re.M)
+        if mo:
+            return mo.group(1)
+    raise RuntimeError('Unable to find version string in %s.' % (VERSIONFILE,))
+
+try:
+    from setuptools import setup
+except ImportError:
+    from distutils.core import setup
+
+setup(
+    name             = 'tagbench',
+    version          = get_version(),
+    url              = 'https://github.com/MamMark/mm/tools/utils/tagbench',
+    author           = 'Eric B. Decker',
+    author_email     = 'cire831@gmail.com',
+#    license_file     = 'LICENCE.txt',
+    license          = 'GPL3',
+    packages         = [ 'tagbench' ],
+    install_requires = [ 'tagcore' ],
+    entry_points     = {
+        'console_scripts': ['tagbench=tagbench.tagbench:main'],
+    }
+)
@@ -0,0 +1,6 @@
+"""
+tagbench: decode benchmark for Tag record decoders and emitters
+@author: Eric B. Decker
+"""
+
+__version__ = '0.4.10.dev0'
@@ -0,0 +1,715 @@
+# Copyright (c) 2021 Eric B. Decker
+# All rights reserved.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# See COPYING in the top level directory of this source tree.
+#
+# Contact: Eric B. Decker <cire831@gmail.com>
+
+'''
+tagbench - decode benchmark for tagcore record decoders and emitters
+
+Everything is timed from memory.  A dblk stream is synthesized (or an
+existing dblk file is read in), split into records once, and then each
+stage is run over the records on its own:
+
+    read        tagdump.get_record, TagMap.records, TagRecords
+    decode      the rtype's decoder, per rtype
+    emit        the emitters alone, per emitter family
+                (core, mr, ge, influx) and rtype.  Each record is
+                decoded (untimed) just before its emitters run.
+
+Emitter output is thrown away (stdout is pointed at /dev/null) and the
+influx family hands its points to a null sink, no database is needed.
+
+Each timing is the best of --repeat runs.  Results are appended to the
+results file as one json line per run, -c compares against an earlier
+run.
+'''
+
+from   __future__         import print_function
+
+import os
+import sys
+import json
+import socket
+import struct
+import random
+import argparse
+import tempfile
+import importlib
+import platform
+from   timeit             import default_timer as timer
+from   collections        import OrderedDict
+from   datetime           import datetime, timedelta
+
+try:
+    import tagcore.core_rev as vers
+except ImportError:
+    print('*** tagcore is required, but is not installed.')
+    sys.exit()
+
+import tagcore.globals         as     g
+from   tagcore.base_objs       import atom
+from   tagcore.dt_defs         import *
+import tagcore.dt_defs         as     dtd
+from   tagcore.core_headers    import *
+from   tagcore.ubx_defs        import UBX_SOP_SEQ
+from   tagcore.ubx_headers     import obj_ubx_nav_pvt, obj_ubx_nav_pvt_var
+from   tagcore.ubx_headers     import obj_ubx_nav_sat, obj_ubx_nav_sat_elm
+from   tagcore.sensor_headers  import obj_tmp_px
+from   tagcore.tagfile         import TagFile
+from   tagcore.tagmap          import TagMap
+from   tagcore.tagrecs         import TagRecords
+from   tagcore.misc_utils      import eprint
+
+from   __init__                import __version__   as VERSION
+
+DBLK_DIR_SIZE   = 0x200
+RESULTS         = '~/.tagbench_results'
+FAMILIES        = [ 'core', 'mr', 'ge', 'influx' ]
+
+POPULATORS      = OrderedDict([
+    ('core',    'tagcore.core_populate'),
+    ('mr',      'tagcore.mr_populate'),
+    ('ge',      'tagcore.core_populate_ge'),
+    ('influx',  'tagcore.core_populate'),   # decoders only, see bench_emit
+])
+
+UBX_NAV_PVT     = 0x0107
+UBX_NAV_SAT     = 0x0135
+
+
+def parseargs():
+    parser = argparse.ArgumentParser(
+        description='decode benchmark for tagcore decoders and emitters')
+
+    parser.add_argument('-V', '--version',
+        action = 'version',
+        version = '%(prog)s ' + VERSION)
+
+    parser.add_argument('-n', '--records',
+                        type    = int,
+                        default = 20000,
+                        help    = 'number of records to synthesize')
+
+    parser.add_argument('-r', '--repeat',
+                        type    = int,
+                        default = 3,
+                        help    = 'runs per timing, best is kept')
+
+    parser.add_argument('-f', '--families',
+                        default = ','.join(FAMILIES),
+                        help    = 'emitter families, comma separated')
+
+    parser.add_argument('-l', '--label',
+                        default = '',
+                        help    = 'label stored with the run')
+
+    parser.add_argument('-c', '--compare',
+                        nargs   = '?',
+                        const   = '',
+                        default = None,
+                        metavar = 'LABEL',
+                        help    = 'compare against the previous run '
+                                  '(or the last run with LABEL)')
+
+    parser.add_argument('--results',
+                        default = RESULTS,
+                        help    = 'results file (default {})'.format(RESULTS))
+
+    parser.add_argument('--nosave',
+                        action  = 'store_true',
+                        help    = 'do not append this run to the results')
+
+    parser.add_argument('-o', '--output',
+                        help    = 'write the synthesized stream to OUTPUT')
+
+    parser.add_argument('input',
+                        nargs   = '?',
+                        help    = 'dblk file to use instead of synthesizing')
+
+    return parser.parse_args()
+
+
+########################################################################
+#
+# stream synthesis
+#
+# records are built from the same objects the decoders use.  All atoms
+# are zeroed, the interesting fields filled in, and obj.build() lays it
+# down.
+#
+
+def zero_obj(obj):
+    if isinstance(obj, atom):
+        obj.val = '' if obj.s_str.endswith('s') else 0
+        return
+    for v in obj.values():
+        zero_obj(v)
+
+
+def set_rt(rt, when):
+    rt['sub_sec'].val = when.microsecond * 32768 / 1000000
+    rt['sec'].val     = when.second
+    rt['min'].val     = when.minute
+    rt['hr'].val      = when.hour
+    rt['dow'].val     = when.isoweekday() % 7
+    rt['day'].val     = when.day
+    rt['mon'].val     = when.month
+    rt['year'].val    = when.year
+
+
+def dt_rec(obj, hdr, rtype, recnum, when, payload = bytearray()):
+    '''
+    build a complete record, obj's fields already filled in.  hdr is the
+    obj's dt header, payload anything following obj.  Returns the record
+    padded out to the next quad.
+    '''
+    hdr['len'].val    = len(obj) + len(payload)
+    hdr['type'].val   = rtype
+    hdr['recnum'].val = recnum
+    hdr['recsum'].val = 0
+    set_rt(hdr['rt'], when)
+    rec = obj.build() + payload
+    struct.pack_into('<H', rec, 18, sum(rec) & 0xffff)
+    return rec + bytearray(-len(rec) & 3)
+
+
+def ubx_packet(obj, cid, var = ()):
+    '''
+    build a ubxbin packet.  obj is the packet's static object (starts
+    with the ubx header), var any variable sections, in order.
+    '''
+    ubx = obj['ubx']
+    ubx['start'].val = UBX_SOP_SEQ
+    ubx['cid'].val   = cid
+    ubx['len'].val   = len(obj) - len(ubx) + sum([ len(v) for v in var ])
+    pkt = obj.build()
+    for v in var:
+        pkt += v.build()
+    ck_a = ck_b = 0
+    for c in pkt[2:]:
+        ck_a = (ck_a + c)    & 0xff
+        ck_b = (ck_b + ck_a) & 0xff
+    return pkt + bytearray([ ck_a, ck_b ])
+
+
+class synth(object):
+    '''
+    synthesize a dblk stream.  A REBOOT first, a SYNC every 32 records,
+    the rest a mix of EVENTs, GPS_RAW (ubx NAV-PVT and NAV-SAT) and
+    TMP_PX sensor records.  Fixed seed so runs are comparable.
+    '''
+
+    def __init__(self, seed = 1):
+        self.rand      = random.Random(seed)
+        self.when      = datetime(2021, 6, 1, 10, 0, 0)
+        self.recnum    = 1
+        self.last_sync = 0
+
+        self.reboot    = obj_dt_reboot()
+        self.sync      = obj_dt_sync()
+        self.event     = obj_dt_event()
+        self.gps_raw   = obj_dt_gps_raw()
+        self.sns       = obj_dt_sns_data()
+        self.tmp_px    = obj_tmp_px()
+        self.pvt       = obj_ubx_nav_pvt()
+        self.pvt_var   = obj_ubx_nav_pvt_var()
+        self.sat       = obj_ubx_nav_sat()
+        self.sat_elms  = [ obj_ubx_nav_sat_elm() for n in range(32) ]
+        for obj in [ self.reboot, self.sync, self.event, self.gps_raw,
+                     self.sns, self.tmp_px, self.pvt, self.pvt_var,
+                     self.sat ] + self.sat_elms:
+            zero_obj(obj)
+
+    def rec(self, obj, hdr, rtype, payload = bytearray()):
+        rec = dt_rec(obj, hdr, rtype, self.recnum, self.when, payload)
+        self.recnum += 1
+        self.when   += timedelta(milliseconds = self.rand.randint(10, 500))
+        return rec
+
+    def mk_reboot(self, offset):
+        obj = self.reboot
+        obj['core_rev'].val   = vers.CORE_REV
+        obj['core_minor'].val = vers.CORE_MINOR
+        obj['base'].val       = 0x20000
+        obj['node_id'].val    = '\x65\x8b\xfd\x0f\x00\x00'
+        return self.rec(obj, obj['hdr'], DT_REBOOT)
+
+    def mk_sync(self, offset):
+        obj = self.sync
+        obj['prev_sync'].val = self.last_sync
+        obj['majik'].val     = dt_sync_majik
+        self.last_sync       = offset
+        return self.rec(obj, obj['hdr'], DT_SYNC)
+
+    def mk_event(self, offset):
+        obj = self.event
+        obj['event'].val = self.rand.choice([ 1, 2, 6, 9, 17, 32, 33 ])
+        obj['pcode'].val = self.rand.randint(0, 3)
+        obj['arg0'].val  = self.rand.randint(0, 0xffff)
+        obj['arg1'].val  = self.rand.randint(0, 0xffff)
+        return self.rec(obj, obj['hdr'], DT_EVENT)
+
+    def gps_rec(self, pkt):
+        obj = self.gps_raw
+        obj['gps_hdr']['mark'].val = self.rand.randint(0, 0xffffff)
+        obj['gps_hdr']['dir'].val  = 0                  # rx
+        return self.rec(obj, obj['gps_hdr']['hdr'], DT_GPS_RAW, pkt)
+
+    def mk_nav_pvt(self, offset):
+        v = self.pvt_var
+        w = self.when
+        v['iTOW'].val    = (w.isoweekday() % 7) * 86400000 + \
+            (w.hour * 3600 + w.minute * 60 + w.second) * 1000
+        v['year'].val    = w.year
+        v['month'].val   = w.month
+        v['day'].val     = w.day
+        v['hour'].val    = w.hour
+        v['min'].val     = w.minute
+        v['sec'].val     = w.second
+        v['valid'].val   = 0x37
+        v['fixType'].val = 3
+        v['flags'].val   = 0x01
+        v['numSV'].val   = self.rand.randint(4, 14)
+        v['lat'].val     = 374219999 + self.rand.randint(-5000, 5000)
+        v['lon'].val     = -1220840575 + self.rand.randint(-5000, 5000)
+        v['height'].val  = self.rand.randint(0, 50000)
+        v['hMSL'].val    = v['height'].val + 32000
+        v['hAcc'].val    = self.rand.randint(1000, 20000)
+        v['vAcc'].val    = self.rand.randint(1000, 30000)
+        v['pDOP'].val    = self.rand.randint(80, 400)
+        return self.gps_rec(ubx_packet(self.pvt, UBX_NAV_PVT, [ v ]))
+
+    def mk_nav_sat(self, offset):
+        obj = self.sat
+        nsv = self.rand.randint(4, 20)
+        obj['iTOW'].val    = self.rand.randint(0, 604800000)
+        obj['version'].val = 1
+        obj['numSv'].val   = nsv
+        elms = self.sat_elms[:nsv]
+        for n, elm in enumerate(elms):
+            elm['gnssId'].val = 0 if n < 12 else 2
+            elm['svId'].val   = n + 1
+            elm['cno'].val    = self.rand.randint(0, 45)
+            elm['elev'].val   = self.rand.randint(-10, 90)
+            elm['azim'].val   = self.rand.randint(0, 359)
+            elm['prRes'].val  = self.rand.randint(-100, 100)
+            elm['flags'].val  = 0x1f
+        return self.gps_rec(ubx_packet(obj, UBX_NAV_SAT, elms))
+
+    def mk_tmp_px(self, offset):
+        obj = self.sns
+        obj['sched_delta'].val   = self.rand.randint(0, 100)
+        self.tmp_px['tmp_p'].val = self.rand.randint(1800, 2600)
+        self.tmp_px['tmp_x'].val = self.rand.randint(1800, 2600)
+        return self.rec(obj, obj['hdr'], DT_SNS_TMP_PX, self.tmp_px.build())
+
+    def stream(self, num):
+        '''returns bytearray, num records behind an empty directory sector'''
+        mix = [ (30, self.mk_event),   (20, self.mk_nav_pvt),
+                (20, self.mk_nav_sat), (30, self.mk_tmp_px) ]
+        out = bytearray(DBLK_DIR_SIZE)
+        out += self.mk_reboot(len(out))
+        for n in range(1, num):
+            if n % 32 == 0:
+                out += self.mk_sync(len(out))
+                continue
+            pick = self.rand.randint(1, 100)
+            for weight, mk in mix:
+                pick -= weight
+                if pick <= 0:
+                    break
+            out += mk(len(out))
+        return out
+
+
+########################################################################
+#
+# timing
+#
+
+class null_out(object):
+    '''stand in for stdout and the influx writer, swallows everything'''
+
+    def __init__(self):
+        self.points = 0
+
+    def write(self, s):
+        pass
+
+    def flush(self):
+        pass
+
+    def add(self, points):
+        self.points += 1
+
+    def close(self):
+        pass
+
+
+def best_of(repeat, func, *args):
+    '''
+    run func repeat times with its output thrown away, best time wins.
+    If func returns a time it did its own timing (see emit_all) and that
+    is used instead of the time of the whole call.
+    '''
+    best   = None
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout = sys.stderr = null_out()
+    try:
+        for n in range(repeat):
+            t0 = timer()
+            ft = func(*args)
+            t  = timer() - t0
+            if ft is not None:
+                t = ft
+            if best is None or t < best:
+                best = t
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+    return best
+
+
+def result(recs, nbytes, secs):
+    return OrderedDict([ ('recs', recs), ('bytes', nbytes), ('secs', secs) ])
+
+
+def read_get_record(td, path):
+    tf = TagFile(open(path, 'rb'))
+    tf.seek(DBLK_DIR_SIZE)
+    while True:
+        offset, hdr, buf = td.get_record(tf)
+        if offset < 0:
+            break
+    tf.fd.close()
+
+
+def read_tagmap(buf):
+    tm = TagMap(buf)
+    tm.seek(DBLK_DIR_SIZE)
+    for r in tm.records():
+        pass
+
+
+def read_tagrecs(buf):
+    for r in TagRecords(buf, start = DBLK_DIR_SIZE, decode = False):
+        pass
+
+
+def bench_read(results, repeat, buf, path, recs):
+    nrecs  = len(recs)
+    nbytes = sum([ len(r.buf) for r in recs ])
+    td = import_tagdump(path)
+    if td:
+        results['read/get_record'] = result(nrecs, nbytes,
+            best_of(repeat, read_get_record, td, path))
+    results['read/tagmap']  = result(nrecs, nbytes,
+        best_of(repeat, read_tagmap, buf))
+    results['read/tagrecs'] = result(nrecs, nbytes,
+        best_of(repeat, read_tagrecs, buf))
+
+
+def import_tagdump(path):
+    '''
+    tagdump parses its args (and sets tagcore.globals) at import, give
+    it a harmless command line and put the globals back afterwards.
+    '''
+    saved = (sys.argv, g.verbose, g.debug, g.export, g.quiet,
+             g.gps_level, g.mr_emitters, g.columnar)
+    sys.argv = [ 'tagdump', path ]
+    stdout = sys.stdout
+    sys.stdout = null_out()
+    try:
+        try:
+            import tagdump as td
+            if not hasattr(td, 'get_record'):
+                from tagdump import tagdump as td
+        except (Exception, SystemExit) as e:
+            eprint('*** tagdump: {}'.format(e))
+            td = None
+    finally:
+        sys.stdout = stdout
+        (sys.argv, g.verbose, g.debug, g.export, g.quiet,
+         g.gps_level, g.mr_emitters, g.columnar) = saved
+    if td is None:
+        eprint('*** tagdump not installed, get_record not timed')
+    return td
+
+
+def by_rtype(recs):
+    '''group the records by rtype, OrderedDict rtype -> [ (offset, buf) ]'''
+    groups = OrderedDict()
+    for r in recs:
+        groups.setdefault(r.rtype, []).append((r.offset, r.buf))
+    return groups
+
+
+def decode_all(recs, decoder, obj):
+    for offset, buf in recs:
+        decoder(0, offset, buf, obj)
+
+
+def emit_all(recs, decoder, emitters, obj):
+    '''
+    the decoder's object is shared, each record is decoded right before
+    its emitters run.  Only the emitters are timed, returns their time.
+    '''
+    secs = 0.
+    for offset, buf in recs:
+        decoder(0, offset, buf, obj)
+        t0 = timer()
+        for e in emitters:
+            e(0, offset, buf, obj)
+        secs += timer() - t0
+    return secs
+
+
+def populate(family):
+    '''install family's decoders/emitters, returns a copy of dt_records'''
+    g.gps_level   = 1    if family == 'ge' else None
+    g.mr_emitters = True if family == 'mr' else False
+    mod = POPULATORS[family]
+    if mod in sys.modules:
+        reload(sys.modules[mod])
+    else:
+        importlib.import_module(mod)
+    return dict(dtd.dt_records)
+
+
+def influx_setup():
+    '''
+    json_emitters, pointed at a null sink.  --noexport keeps it from
+    looking for a database when imported.
+    '''
+    export   = g.export
+    g.export = -1
+    stdout   = sys.stdout
+    sys.stdout = null_out()
+    try:
+        import tagcore.json_emitters as je
+    except ImportError as e:
+        eprint('*** influx family needs json_emitters: {}'.format(e))
+        return None
+    finally:
+        sys.stdout = stdout
+        g.export   = export
+    je.influxdb_version = je.versions_ok[-1]
+    je.influx_out       = null_out()
+    return je
+
+
+def influx_done(je):
+    je.influxdb_version = ''
+    je.influx_out       = None
+
+
+def bench_decode(results, repeat, groups, table):
+    for rtype, recs in groups.items():
+        v = table.get(rtype)
+        if not v or not v[DTR_DECODER] or v[DTR_OBJ] is None:
+            continue
+        nbytes = sum([ len(b) for o, b in recs ])
+        try:
+            secs = best_of(repeat, decode_all, recs, v[DTR_DECODER], v[DTR_OBJ])
+        except (struct.error, KeyError, TypeError) as e:
+            eprint('*** decode {}: {}'.format(v[DTR_NAME], e))
+            continue
+        results['decode/' + v[DTR_NAME]] = result(len(recs), nbytes, secs)
+
+
+def bench_emit(results, repeat, groups, family):
+    '''
+    emitters can't run without their decoder (objects are shared).  The
+    decoder runs untimed before each record's emitters, see emit_all.
+    '''
+    try:
+        table = populate(family)
+    except Exception as e:
+        eprint('*** emit/{}: populator failed: {}: {}'.format(family,
+            type(e).__name__, e))
+        return
+    je    = None
+    if family == 'influx':
+        je = influx_setup()
+        if je is None:
+            return
+    tot_recs = tot_bytes = tot_secs = 0
+    for rtype, recs in groups.items():
+        v = table.get(rtype)
+        if not v or not v[DTR_DECODER] or v[DTR_OBJ] is None:
+            continue
+        emitters = [ je.emit_influx ] if je else v[DTR_EMITTERS]
+        if not emitters:
+            continue
+        nbytes = sum([ len(b) for o, b in recs ])
+        try:
+            secs = best_of(repeat, emit_all, recs, v[DTR_DECODER],
+                           emitters, v[DTR_OBJ])
+        except Exception as e:
+            eprint('*** emit/{} {}: {}: {}'.format(family, v[DTR_NAME],
+                type(e).__name__, e))
+            continue
+        results['emit/{}/{}'.format(family, v[DTR_NAME])] = \
+            result(len(recs), nbytes, secs)
+        tot_recs  += len(recs)
+        tot_bytes += nbytes
+        tot_secs  += secs
+    if tot_recs:
+        results['emit/' + family] = result(tot_recs, tot_bytes, tot_secs)
+    if je:
+        influx_done(je)
+
+
+########################################################################
+#
+# results
+#
+
+def rate(r):
+    '''recs/s and MB/s, None if there is no usable time'''
+    if r['secs'] <= 0:
+        return None, None
+    return r['recs'] / r['secs'], r['bytes'] / r['secs'] / 1e6
+
+
+def report(results, prev = None):
+    title = '{:28s} {:>7s} {:>8s} {:>12s} {:>9s}'.format(
+        '', 'recs', 'MB', 'recs/s', 'MB/s')
+    if prev:
+        title += '   {:>12s} {:>7s}'.format('prev recs/s', 'delta')
+    print(title)
+    for name, r in results.items():
+        rps, mbps = rate(r)
+        line = '{:28s} {:7d} {:8.3f} '.format(name, r['recs'], r['bytes'] / 1e6)
+        if rps is None:
+            line += '{:>12s} {:>9s}'.format('n/a', 'n/a')
+        else:
+            line += '{:12.1f} {:9.3f}'.format(rps, mbps)
+        p = prev['results'].get(name) if prev else None
+        if p:
+            prps, pmbps = rate(p)
+            if prps is None:
+                line += '   {:>12s}'.format('n/a')
+            elif rps is None:
+                line += '   {:12.1f}'.format(prps)
+            else:
+                line += '   {:12.1f} {:+6.1f}%'.format(prps,
+                            (rps - prps) / prps * 100.)
+        print(line)
+
+
+def load_runs(path):
+    runs = []
+    try:
+        with open(path) as fd:
+            for line in fd:
+                try:
+                    runs.append(json.loads(line, object_pairs_hook = OrderedDict))
+                except ValueError:
+                    continue
+    except IOError:
+        pass
+    return runs
+
+
+def find_prev(runs, label):
+    for run in reversed(runs):
+        if not label or run.get('label') == label:
+            return run
+    return None
+
+
+def save_run(path, run):
+    with open(path, 'a') as fd:
+        fd.write(json.dumps(run))
+        fd.write('\n')
+
+
+def main():
+    args = parseargs()
+    families = [ f.strip() for f in args.families.split(',') if f.strip() ]
+    for f in families:
+        if f not in POPULATORS:
+            print('*** unknown emitter family: {}'.format(f))
+            sys.exit(1)
+
+    tmp = None
+    if args.input:
+        path = args.input
+        with open(path, 'rb') as fd:
+            buf = bytearray(fd.read())
+    else:
+        buf = synth().stream(args.records)
+        path = args.output
+        if not path:
+            fd, tmp = tempfile.mkstemp(prefix = 'tagbench.')
+            os.close(fd)
+            path = tmp
+        with open(path, 'wb') as fd:
+            fd.write(buf)
+
+    try:
+        import tagcore.sensor_populate
+    except Exception as e:
+        eprint('*** sensor_populate: {}, sensor records not decoded'.format(e))
+    import tagcore.ubx_populate
+
+    table = populate('core')
+    recs  = list(TagRecords(buf, start = DBLK_DIR_SIZE, decode = False))
+    groups = by_rtype(recs)
+
+    results = OrderedDict()
+    bench_read(results, args.repeat, buf, path, recs)
+    table = populate('core')            # tagdump may have installed others
+    bench_decode(results, args.repeat, groups, table)
+    for family in families:
+        bench_emit(results, args.repeat, groups, family)
+
+    if tmp:
+        os.remove(tmp)
+
+    run = OrderedDict([
+        ('time',     datetime.now().isoformat()),
+        ('label',    args.label),
+        ('host',     socket.gethostname()),
+        ('python',   platform.python_version()),
+        ('tagcore',  vers.core_ver),
+        ('tagbench', VERSION),
+        ('input',    args.input or 'synth'),
+        ('records',  len(recs)),
+        ('bytes',    sum([ len(r.buf) for r in recs ])),
+        ('repeat',   args.repeat),
+        ('results',  results),
+    ])
+
+    results_path = os.path.expanduser(args.results)
+    prev = None
+    if args.compare is not None:
+        prev = find_prev(load_runs(results_path), args.compare)
+        if prev is None:
+            eprint('*** no previous run to compare against')
+    print('tagbench {}: {} records, {} bytes, {}'.format(VERSION,
+            run['records'], run['bytes'], run['input']))
+    if prev:
+        print('  compared with {} {}'.format(prev['time'], prev.get('label', '')))
+    print()
+    report(results, prev)
+    if not args.nosave:
+        save_run(results_path, run)
+
+
+if __name__ == '__main__':
+    main()
@@ -50,6 +50,9 @@ setup(
 
     install_requires = ['pytz'],
     scripts          = [],
+    entry_points     = {
+        'console_scripts': ['dblkz=tagcore.dblkz:main'],
+    },
     provides         = ['tagcore'],
     packages         = ['tagcore'],
     keywords         = ['tagcore', 'tagdump', 'tagctl'],
@@ -24,6 +24,7 @@
 import struct
 import copy
 from   collections import OrderedDict
+from   collections import namedtuple
 from   misc_utils  import dump_buf
 
 import tagcore.globals        as     g
@@ -33,7 +34,7 @@ from   tagcore.imageinfo_defs import iip_tlv_name
 from   tagcore.imageinfo_defs import IMAGE_INFO_PLUS_SIZE
 from   tagcore.imageinfo_defs import IIP_TLV_END
 
-__version__ = '0.4.9.dev0'
+__version__ = '0.4.10.dev0'
 
 # WARNING: all bufs are assumed to be bytearrays
 
@@ -97,6 +98,9 @@ class aggie(OrderedDict):
         super(aggie, self).__init__(a_dict)
 
     def __len__(self):
+        flat = getattr(self, 'flat', None)
+        if flat:                        # flattened, size is known
+            return flat.s_rec.size
         l = 0
         for key, v_obj in self.iteritems():
             if isinstance(v_obj, atom) or isinstance(v_obj, aggie):
@@ -156,9 +160,8 @@ class tlv_aggie(aggie):
         #
         if len(buf) < 2:
             return 0
-        tlv_type  = buf[0]
-        tlv_len   = buf[1]
-        tlv_value = buf[2: tlv_len]
+        tlv_type, tlv_len = bytearray(buf[:2])  # ints, str or bytearray buf
+        tlv_value = bytes(buf[2: tlv_len])      # struct 's' wants a str
         self['tlv_type'].val  = tlv_type
         self['tlv_len'].val   = tlv_len
         self['tlv_value'].val = tlv_value
@@ -206,6 +209,10 @@ class tlv_block_aggie(aggie):
         super(tlv_block_aggie, self).__init__(a_dict)
 
     def set(self, buf):
+        # tlv type/len are peeked at as ints below.  On py2 a file read
+        # is a str (binfin's image_info), make it a bytearray.
+        if not isinstance(buf, bytearray):
+            buf = bytearray(buf)
         consumed = super(tlv_block_aggie, self).set(buf)
         tlv_consumed = 0
         while True:
@@ -301,3 +308,252 @@ class tlv_block_aggie(aggie):
     def build(self):
         out = super(tlv_block_aggie, self).build()
         return out
+
+
+########################################################################
+#
+# flat aggies
+#
+# aggie.set walks the aggie tree, slicing the buffer at each level and
+# calling struct.unpack once per atom.  For records with a fixed layout
+# (no tlvs, nothing variable) the whole tree can be flattened into one
+# struct.Struct and pulled apart with one unpack_from.
+#
+# flat_aggie(agg) compiles agg.  flat_aggie.set(buf) fills in the .val of
+# every atom in agg, same as agg.set(buf).  flat_aggie.unpack(buf) instead
+# returns a lightweight record object with the same key names,
+#
+#   rec = flat_aggie(obj_dt_event()).unpack(buf)
+#   rec['hdr']['recnum'], rec.hdr.recnum, rec.arg0
+#
+# flatten() compiles an aggie in place, the aggie's set is replaced by
+# the flat set.  This is what the populators use, decode_default and all
+# of the emitters keep working off the same aggie.
+#
+# lazy decode: flat_aggie.lazy(buf) doesn't unpack anything, it hangs on
+# to buf.  The atoms (turned into lazy_atoms) pick up their val when they
+# are first asked for it, obj['hdr']['type'].val keeps working.  The
+# first ask unpacks the record in one go, every later one just indexes
+# the unpacked values.  Good for records an emitter usually drops after
+# looking at a field or two (see core_populate_ge), a record that gets
+# printed in full is cheaper done with set.  buf must not be changed
+# while the record is in use, the decoders are handed a fresh buffer per
+# record.
+#
+
+# struct byte order/size prefixes.  We can only glue little endian and
+# single byte items together.
+le_prefixes = '<='
+
+
+def flat_record_class(names):
+    '''
+    build a record class with the given field names.  A namedtuple that
+    can also be indexed by key name, rec['hdr'] same as rec.hdr.
+    '''
+    base = namedtuple('flat_record', names)
+
+    class flat_record(base):
+        __slots__ = ()
+
+        def __getitem__(self, key):
+            if isinstance(key, str):
+                return getattr(self, key)
+            return base.__getitem__(self, key)
+
+        def __contains__(self, key):
+            return key in self._fields
+
+        def keys(self):
+            return list(self._fields)
+
+        def items(self):
+            return zip(self._fields, self)
+    return flat_record
+
+
+class lazy_src(object):
+    '''
+    where a flat_aggie's lazy atoms get their values.  gen bumps per
+    record, vals is the unpack of the whole record, done on first use.
+    '''
+    __slots__ = ('s_rec', 'buf', 'offset', 'gen', 'vals')
+
+    def __init__(self, s_rec):
+        self.s_rec  = s_rec
+        self.buf    = None
+        self.offset = 0
+        self.gen    = 0
+        self.vals   = None
+
+
+class lazy_atom(atom):
+    '''
+    atom whose val comes out of the current record on first access and
+    is then cached (see flat_aggie.lazy).  Assigning val works as usual,
+    it sticks until the next record comes in.
+    '''
+    @property
+    def val(self):
+        src = self._src
+        if self._gen != src.gen:
+            vals = src.vals
+            if vals is None:
+                vals = src.vals = src.s_rec.unpack_from(src.buf, src.offset)
+            self._val = vals[self._idx]
+            self._gen = src.gen
+        return self._val
+
+    @val.setter
+    def val(self, val):
+        self._val = val
+        self._gen = self._src.gen
+
+
+class flat_aggie(object):
+    '''
+    flat_aggie: precompiled decoder for a fixed layout aggie.
+
+    raises TypeError (or ValueError from namedtuple) if the aggie can't
+    be flattened (tlvs, big endian fields, or keys that can't be record
+    field names).
+    '''
+    def __init__(self, agg):
+        self.agg    = agg
+        self.fmt    = ''
+        self.leaves = []                # (atom, index into unpacked vals)
+        self.classes= {}
+        self.bound  = False             # leaves are lazy and ours
+        self.layout = self.compile(agg)
+        self.s_rec  = struct.Struct('<' + self.fmt)
+        self.src    = lazy_src(self.s_rec)
+        self.build_rec = eval('lambda v: ' + self.layout, self.classes)
+        if self.s_rec.size != len(agg):
+            raise TypeError('flat_aggie: size mismatch, {} vs. {}'.format(
+                self.s_rec.size, len(agg)))
+        self.nvals  = len(self.s_rec.unpack(bytearray(self.s_rec.size)))
+        self.simple = [ a for a, idx in self.leaves ]
+        if len(self.simple) != self.nvals:
+            self.simple = None          # multi-valued atoms, use leaves
+
+    def compile(self, agg):
+        '''
+        walk agg, append each atom's struct string to self.fmt and
+        return the layout used by unpack.  The layout is the constructor
+        expression for the record, ie. for obj_dt_sync
+
+            C2(C1(v[0], ..., C0(v[4], ...), v[12]), v[13], v[14])
+
+        which gets turned into build_rec(vals).
+        '''
+        if type(agg) is not aggie:
+            raise TypeError('flat_aggie: {} is not a simple aggie'.format(
+                type(agg).__name__))
+        fields = []
+        for key, v_obj in agg.iteritems():
+            if not isinstance(key, str) or not key.replace('_', 'a').isalnum() \
+               or key[0].isdigit() or key[0] == '_':
+                raise TypeError('flat_aggie: bad key {}'.format(key))
+            if isinstance(v_obj, atom):
+                s_str = v_obj.s_str
+                if s_str[0] in le_prefixes:
+                    s_str = s_str[1:]
+                elif not s_str[0].isalnum():
+                    raise TypeError('flat_aggie: {}: not little endian ({})'.format(
+                        key, v_obj.s_str))
+                if struct.calcsize('<' + s_str) != len(v_obj):
+                    raise TypeError('flat_aggie: {}: native size ({})'.format(
+                        key, v_obj.s_str))
+                idx = len(struct.Struct('<' + self.fmt).unpack(
+                    bytearray(struct.calcsize('<' + self.fmt))))
+                self.fmt += s_str
+                self.leaves.append((v_obj, idx))
+                fields.append((key, 'v[{}]'.format(idx)))
+            else:
+                fields.append((key, self.compile(v_obj)))
+        cls_name = 'C{}'.format(len(self.classes))
+        self.classes[cls_name] = flat_record_class([ k for k, f in fields ])
+        return '{}({})'.format(cls_name, ', '.join([ f for k, f in fields ]))
+
+    def __len__(self):
+        return self.s_rec.size
+
+    def set(self, buf, offset = 0):
+        vals = self.s_rec.unpack_from(buf, offset)
+        if self.simple:
+            for a, v in zip(self.simple, vals):
+                a.val = v
+        else:
+            for a, idx in self.leaves:
+                a.val = vals[idx]
+        return self.s_rec.size
+
+    def unpack(self, buf, offset = 0):
+        return self.build_rec(self.s_rec.unpack_from(buf, offset))
+
+    def index(self, *keys):
+        '''
+        where agg[key0][key1]...'s value lands in s_rec.unpack's tuple.
+        For pulling a few fields out with an itemgetter.
+        '''
+        a = self.agg
+        for key in keys:
+            a = a[key]
+        for leaf, idx in self.leaves:
+            if leaf is a:
+                return idx
+        raise KeyError('flat_aggie: {} not an atom'.format('/'.join(keys)))
+
+    def lazy(self, buf, offset = 0):
+        '''
+        set the aggie from buf without unpacking anything, the atoms pull
+        their val out of buf when asked.  Same return and short buffer
+        error as set.
+        '''
+        size = self.s_rec.size
+        if len(buf) - offset < size:
+            raise struct.error('unpack_from requires a buffer of at least '
+                               '{} bytes'.format(size))
+        if not self.bound:
+            self.bind()
+        src = self.src
+        src.buf     = buf
+        src.offset  = offset
+        src.vals    = None
+        src.gen    += 1
+        return size
+
+    def bind(self):
+        '''
+        point our leaves at our lazy_src.  Nested aggies are flattened
+        on their own too, so a leaf can belong to more than one
+        flat_aggie.  Whoever had it last has to bind again.
+        '''
+        for a, idx in self.leaves:
+            if type(a) is atom:
+                a.__class__ = lazy_atom
+                a._val = a.__dict__.pop('val', None)
+            elif a._owner is not self:
+                a._owner.bound = False
+            a._src   = self.src
+            a._owner = self
+            a._idx   = idx
+            a._gen   = -1
+        self.bound = True
+
+
+def flatten(agg):
+    '''
+    compile agg in place.  agg.set is replaced with the flat set and
+    agg.flat holds the flat_aggie.  Aggies that can't be flattened are
+    returned untouched.
+    '''
+    try:
+        flat = flat_aggie(agg)
+    except (TypeError, ValueError) as e:
+        if g.debug:
+            eprint('*** flatten: {}'.format(e))
+        return agg
+    agg.flat = flat
+    agg.set  = flat.set
+    return agg
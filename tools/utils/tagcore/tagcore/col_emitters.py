@@ -0,0 +1,224 @@
+# Copyright (c) 2021 Eric B. Decker
+# All rights reserved.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# See COPYING in the top level directory of this source tree.
+#
+# Contact: Eric B. Decker <cire831@gmail.com>
+#
+# implementation of columnar export emitters
+# enable with --columnar <dir>
+#
+
+'''columnar export emitters
+
+Rather than formatting a line per record (see mr_emitters) the decoded
+fields of each record are appended to column buffers, one table per
+record type.  Every COL_BATCH rows a table's buffers are written out in
+one go.
+
+Each table gets its own file in the --columnar directory.  If pyarrow is
+available the tables are written as parquet (<table>.parquet), otherwise
+as plain csv with a title row (<table>.csv).  Either loads directly into
+pandas.
+
+Every row starts with:
+
+    offset      file offset of the record
+    recnum      record number
+    rtctime     record rtctime, secs since the epoch (float)
+
+col_close() must be called when done to write out partial batches.
+'''
+
+from   __future__         import print_function
+
+__version__ = '0.4.10.dev0'
+
+__all__ = [
+    'col_close',
+    'emit_event_col',
+    'emit_gps_geo_col',
+    'emit_gps_trk_col',
+    'emit_sensor_data_col',
+]
+
+import os
+import csv
+from   collections    import OrderedDict
+
+import tagcore.globals as    g
+from   .dt_defs       import dt_name
+from   .core_events   import event_name
+from   .misc_utils    import rtc2secs
+from   .misc_utils    import eprint
+from   sensor_defs    import *
+import sensor_defs    as     sensor
+
+# pyarrow is optional, without it we write csv.
+try:
+    import pyarrow            as pa
+    import pyarrow.parquet    as pq
+except ImportError:
+    pa = None
+
+COL_BATCH       = 64 * 1024             # rows buffered per table
+
+
+class col_table(object):
+    '''
+    column buffers for one table (record type).
+
+    The columns are fixed by the first row added.  Rows are added as
+    sequences in column order.
+    '''
+
+    def __init__(self, name, columns):
+        self.name    = name
+        self.titles  = list(columns)
+        self.cols    = [ [] for c in self.titles ]
+        self.rows    = 0
+        self.writer  = None
+        self.fd      = None
+        ext          = 'parquet' if pa else 'csv'
+        self.path    = os.path.join(g.columnar, '{}.{}'.format(name, ext))
+
+    def add(self, row):
+        for col, val in zip(self.cols, row):
+            col.append(val)
+        self.rows += 1
+        if len(self.cols[0]) >= COL_BATCH:
+            self.flush()
+
+    def flush(self):
+        if not self.cols[0]:
+            return
+        if pa:
+            batch = pa.Table.from_arrays(
+                [ pa.array(c) for c in self.cols ], names = self.titles)
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.path, batch.schema)
+            self.writer.write_table(batch)
+        else:
+            if self.fd is None:
+                self.fd     = open(self.path, 'wb')
+                self.writer = csv.writer(self.fd)
+                self.writer.writerow(self.titles)
+            self.writer.writerows(zip(*self.cols))
+        self.cols = [ [] for c in self.titles ]
+
+    def close(self):
+        self.flush()
+        if self.writer and pa:
+            self.writer.close()
+        if self.fd:
+            self.fd.close()
+        self.writer = None
+        self.fd     = None
+
+
+col_tables = OrderedDict()              # table name -> col_table
+
+
+def col_add(name, offset, hdr, fields):
+    '''
+    add a row to table name.  fields is an OrderedDict of the record
+    specific columns, the common columns are taken from hdr.
+    '''
+    rt  = hdr['rt']
+    row = [ offset, hdr['recnum'].val,
+            rtc2secs(rt) + rt['sub_sec'].val / 32768. ]
+    row.extend(fields.values())
+    t = col_tables.get(name)
+    if t is None:
+        if not os.path.isdir(g.columnar):
+            os.makedirs(g.columnar)
+        t = col_table(name, [ 'offset', 'recnum', 'rtctime' ] + fields.keys())
+        col_tables[name] = t
+    t.add(row)
+
+
+def col_close():
+    '''write out anything still buffered and close all the tables'''
+    for t in col_tables.values():
+        t.close()
+        if g.verbose or g.debug:
+            eprint('*** columnar: {}: {} rows'.format(t.path, t.rows))
+
+
+def emit_event_col(level, offset, buf, obj):
+    ev = obj['event'].val
+    c  = OrderedDict()
+    c['event'] = ev
+    c['name']  = event_name(ev)
+    c['arg0']  = obj['arg0'].val
+    c['arg1']  = obj['arg1'].val
+    c['arg2']  = obj['arg2'].val
+    c['arg3']  = obj['arg3'].val
+    c['pcode'] = obj['pcode'].val
+    c['w']     = obj['w'].val
+    col_add('EVENT', offset, obj['hdr'], c)
+
+
+def emit_gps_geo_col(level, offset, buf, obj):
+    c = OrderedDict()
+    c['itow']    = obj['itow'].val
+    c['lat']     = obj['lat'].val/10000000.
+    c['lon']     = obj['lon'].val/10000000.
+    c['alt_ell'] = obj['alt_ell'].val/1000.
+    c['msl']     = obj['alt_msl'].val/1000.
+    c['hacc']    = obj['hacc'].val/1000.
+    c['vacc']    = obj['vacc'].val/1000.
+    c['pdop']    = obj['pdop'].val/100.
+    c['fixtype'] = obj['fixtype'].val
+    c['flags']   = obj['flags'].val
+    c['nsats']   = obj['nsats'].val
+    col_add('GPS_GEO', offset, obj['gps_hdr']['hdr'], c)
+
+
+def emit_gps_trk_col(level, offset, buf, obj):
+    '''one row per channel'''
+    hdr   = obj['gps_hdr']['hdr']
+    tow   = obj['tow100'].val/100.
+    week  = obj['week'].val
+    chans = obj['chans'].val
+    for n in range(chans):
+        ch = obj[n]
+        c  = OrderedDict()
+        c['week']    = week
+        c['tow']     = tow
+        c['chan']    = n
+        c['svid']    = ch['svid']
+        c['az']      = ch['az10']/10.
+        c['el']      = ch['el10']/10.
+        c['state']   = ch['state']
+        c['cno_avg'] = ch['cno_avg']
+        for j in range(10):
+            cno = 'cno' + str(j)
+            c[cno] = ch[cno]
+        col_add('GPS_TRK', offset, hdr, c)
+
+
+def emit_sensor_data_col(level, offset, buf, obj):
+    '''
+    sensors with a sns_dict (ie. TMP_PX) get a table per sensor using
+    the dict's columns.  The others don't have anything to add yet.
+    '''
+    hdr       = obj['hdr']
+    dt_sns_id = hdr['type'].val
+    v = sensor.sns_table.get(dt_sns_id, ('', None, None, None, None, ''))
+    dict_func = sns_dict(dt_sns_id)
+    if not dict_func:
+        return
+    col_add(dt_name(dt_sns_id), offset, hdr, dict_func(v[SNS_OBJECT]))
@@ -0,0 +1,27 @@
+'''assign decoders and emitters for core data types (columnar export)
+
+only the record types that have columnar emitters are decoded, everything
+else is left with decode_null and no emitters.  The objects are kept,
+resync uses the sync object.
+'''
+
+from   dt_defs       import *
+import dt_defs       as     dtd
+from   core_headers  import *
+from   col_emitters  import *
+import core_populate                    # names and required lengths
+
+def decode_default(level, offset, buf, obj):
+    return obj.set(buf)
+
+def decode_null(level, offset, buf, obj):
+    return 0
+
+for rtype, v in dtd.dt_records.items():
+    dtd.dt_records[rtype] = (v[DTR_REQ_LEN], decode_null, [ ]) + v[DTR_OBJ:DTR_FLAT] + (False,)
+
+dtd.dt_records[DT_EVENT]            = ( 40, decode_default, [ emit_event_col ],         obj_dt_event(),           'EVENT',            'obj_dt_event',    True  )
+dtd.dt_records[DT_GPS_GEO]          = (  0, decode_default, [ emit_gps_geo_col ],       obj_dt_gps_geo(),         'GPS_GEO',          'obj_dt_gps_geo',  True  )
+dtd.dt_records[DT_GPS_TRK]          = (  0, decode_gps_trk, [ emit_gps_trk_col ],       obj_dt_gps_trk(),         'GPS_TRK',          'obj_dt_trk',      False )
+dtd.dt_records[DT_SENSOR_DATA]      = (  0, decode_sensor,  [ emit_sensor_data_col ],   obj_dt_sns_data(),        'SENSOR',           'obj_dt_sen_data', False )
+dtd.dt_records[DT_SNS_TMP_PX]       = (  0, decode_sensor,  [ emit_sensor_data_col ],   obj_dt_sns_data(),        'SNS_TMP_PX',       'obj_dt_sns_data', False )
@@ -873,23 +873,20 @@ def emit_gps_raw(level, offset, buf, obj):
     print(rec0.format(offset, recnum, brt, xlen, xtype,
                       dt_name(xtype)), end = '')
 
-    index = len(obj)
-    if buf[index] == ord('$'):
-        print(' -- NMEA <{:2}> [{:s}]'.format(dir_str, buf[index+1:index+6]))
+    msg = obj.msg                       # framed by decode_gps_raw
+    if msg and msg.kind == 'nmea':
+        print(' -- NMEA <{:2}> [{:s}]'.format(dir_str, msg.msg[1:6]))
         if (level >= 1):
-            print('    {:s}'.format(buf[index:].rstrip('\r\n\x00')))
+            print('    {:s}'.format(msg.msg))
 
-    ubx_start = buf[index] << 8 | buf[index + 1]
-    if ubx_start != UBX_SOP_SEQ:
+    if not msg or msg.kind != 'ubx':
         print
         if (level >= 2):
             dump_buf(buf, '    ')
         return
 
-    # extract cid and len manually.  ubx_len is little endian
-    # class/id are combined with class being most significant.
-    cid = buf[index + 2] << 8 | buf[index + 3]
-    ubx_len = buf[index + 4] | buf[index + 5] << 8
+    cid     = msg.cid
+    ubx_len = len(msg.msg) - UBX_HDR_SIZE - UBX_CHK_SIZE
 
     v = ubx.cid_table.get(cid, (None, None, None, 'unk'))
     emitters  = v[CID_EMITTERS]         # emitter list
@@ -907,7 +904,7 @@ def emit_gps_raw(level, offset, buf, obj):
     print(' -- UBX: <{:2}> {:16s}'.format(
         dir_str, '[{:s}]'.format(xcid_name)), end='')
     for e in emitters:
-        e(level, offset, buf[len(obj):], ubx_obj, dir_bit)
+        e(level, offset, msg.msg, ubx_obj, dir_bit)
 
 
 def emit_tagnet(level, offset, buf, obj):
@@ -23,7 +23,7 @@
 
 from   __future__         import print_function
 
-__version__ = '0.4.9.dev0'
+__version__ = '0.4.10.dev0'
 
 import binascii
 from   collections  import OrderedDict
@@ -36,6 +36,7 @@ import sensor_defs  as     sensor
 
 from   ubx_defs     import *
 import ubx_defs     as     ubx
+from   ubx_frame    import GpsFramer
 
 import tagcore.globals as  g
 
@@ -90,7 +91,9 @@ def decode_sensor(level, offset, buf, obj):
 # this decoder does the following:  (it is not a simple decode_default)
 #
 # o consume/process a gps_raw_hdr (dt_hdr + gps_hdr)
-# o extract class/id from the ubxbin header.
+# o frame what follows using the same framer used for ubx streams
+#   (ubx_frame.GpsFramer).  The framed message (a gps_msg, or None if
+#   nothing could be framed) is left in obj.msg for the emitters.
 #
 # Note: for ubxbin packets we do not consume the ubx_hdr.  It get decoded
 # so we know the Class/Id.  But the header gets offically processed as part
@@ -103,14 +106,16 @@ def decode_sensor(level, offset, buf, obj):
 # o Look up class/id in cid_table
 # o consume/process the entire ubxbin packet using the appropriate decoder.
 
+gps_raw_framer = GpsFramer()
+
 def decode_gps_raw(level, offset, buf, obj):
     consumed = obj.set(buf)
-    start    = buf[consumed]   << 8 | buf[consumed+1]
-
-    if start != UBX_SOP_SEQ:
+    msgs     = gps_raw_framer.frame(buf, consumed)
+    obj.msg  = msgs[0] if msgs else None
+    if not msgs or msgs[0].kind != 'ubx':
         return consumed
 
-    cid      = buf[consumed+2] << 8 | buf[consumed+3]
+    cid      = msgs[0].cid
     try:
         ubx.cid_count[cid] += 1
     except KeyError:
@@ -123,7 +128,7 @@ def decode_gps_raw(level, offset, buf, obj):
         if level >= 5 or g.debug:
             print('*** no decoder/obj defined for class/id {:04X}'.format(cid))
         return consumed
-    consumed += decoder(level, offset, buf[consumed:], decoder_obj)
+    consumed += decoder(level, offset, msgs[0].msg, decoder_obj)
     return consumed
 
 
@@ -147,18 +152,18 @@ def obj_rtctime():
 
 
 def obj_dt_hdr():
-    return aggie(OrderedDict([
+    return flatten(aggie(OrderedDict([
         ('len',     atom(('<H', '{}'))),
         ('type',    atom(('B',  '{}'))),
         ('hdr_crc8',atom(('B',  '{}'))),
         ('recnum',  atom(('<I', '{}'))),
         ('rt',      obj_rtctime()),
         ('recsum',  atom(('<H', '0x{:04x}'))),
-    ]))
+    ])))
 
 
 def obj_dt_reboot():
-    return aggie(OrderedDict([
+    return flatten(aggie(OrderedDict([
         ('hdr',       obj_dt_hdr()),
         ('core_rev',  atom(('<H', '0x{:04x}'))),
         ('core_minor',atom(('<H', '0x{:04x}'))),
@@ -166,7 +171,7 @@ def obj_dt_reboot():
         ('node_id',   atom(('6s', '{}', binascii.hexlify))),
         ('pad',       atom(('<H', '0x{:04x}'))),
         ('owcb',      obj_owcb())
-    ]))
+    ])))
 
 
 # RTC SRC values
@@ -321,11 +326,11 @@ def obj_image_plus():
 
 
 def obj_dt_sync():
-    return aggie(OrderedDict([
+    return flatten(aggie(OrderedDict([
         ('hdr',       obj_dt_hdr()),
         ('prev_sync', atom(('<I', '0x{:x}'))),
         ('majik',     atom(('<I', '0x{:08x}'))),
-    ]))
+    ])))
 
 
 img_mgr_events = {
@@ -347,7 +352,7 @@ def img_mgr_event_name(im_ev):
 
 
 def obj_dt_event():
-    return aggie(OrderedDict([
+    return flatten(aggie(OrderedDict([
         ('hdr',   obj_dt_hdr()),
         ('event', atom(('<H', '{}'))),
         ('pcode', atom(('<B', '{}'))),
@@ -356,16 +361,16 @@ def obj_dt_event():
         ('arg1',  atom(('<I', '0x{:04x}'))),
         ('arg2',  atom(('<I', '0x{:04x}'))),
         ('arg3',  atom(('<I', '0x{:04x}'))),
-    ]))
+    ])))
 
 
 #
 # not implemented yet.
 #
 def obj_dt_debug():
-    return aggie(OrderedDict([
+    return flatten(aggie(OrderedDict([
         ('hdr',   obj_dt_hdr()),
-    ]))
+    ])))
 
 
 #
@@ -373,25 +378,25 @@ def obj_dt_debug():
 # used by DT_GPS_VERSION and DT_GPS_RAW (gps_raw)
 #
 def obj_dt_gps_hdr():
-    return aggie(OrderedDict([
+    return flatten(aggie(OrderedDict([
         ('hdr',     obj_dt_hdr()),
         ('mark',    atom(('<I', '0x{:04x}'))),
         ('chip',    atom(('B',  '0x{:02x}'))),
         ('dir',     atom(('B',  '{}'))),
         ('pad',     atom(('<H', '{}'))),
-    ]))
+    ])))
 
 
 # deprecated
 def obj_dt_gps_ver():
-    return aggie(OrderedDict([
+    return flatten(aggie(OrderedDict([
         ('gps_hdr',    obj_dt_gps_hdr()),
 #        ('sirf_swver', obj_sirf_swver()),
-    ]))
+    ])))
 
 
 def obj_dt_gps_time():
-    return aggie(OrderedDict([
+    return flatten(aggie(OrderedDict([
         ('gps_hdr',   obj_dt_gps_hdr()),
         ('capdelta',  atom(('<i', '{}'))),
         ('itow',      atom(('<I', '{}'))),
@@ -404,11 +409,11 @@ def obj_dt_gps_time():
         ('utc_min',   atom(('<B', '{}'))),
         ('utc_sec',   atom(('<B', '{}'))),
         ('nsats',     atom(('<B', '{}'))),
-    ]))
+    ])))
 
 
 def obj_dt_gps_geo():
-    return aggie(OrderedDict([
+    return flatten(aggie(OrderedDict([
         ('gps_hdr',   obj_dt_gps_hdr()),
         ('capdelta',  atom(('<i', '{}'))),
         ('itow',      atom(('<I', '{}'))),
@@ -422,11 +427,11 @@ def obj_dt_gps_geo():
         ('fixtype',   atom(('<B', '{}'))),
         ('flags',     atom(('<B', '0x{:02x}'))),
         ('nsats',     atom(('<B', '{}'))),
-    ]))
+    ])))
 
 
 def obj_dt_gps_xyz():
-    return aggie(OrderedDict([
+    return flatten(aggie(OrderedDict([
         ('gps_hdr',   obj_dt_gps_hdr()),
         ('capdelta',  atom(('<i', '{}'))),
         ('x',         atom(('<i', '{}'))),
@@ -438,11 +443,11 @@ def obj_dt_gps_xyz():
         ('m1',        atom(('<B', '0x{:02x}'))),
         ('hdop5',     atom(('<B', '{}'))),
         ('nsats',     atom(('<B', '{}'))),
-    ]))
+    ])))
 
 
 def obj_dt_gps_clk():
-    return aggie(OrderedDict([
+    return flatten(aggie(OrderedDict([
         ('gps_hdr',   obj_dt_gps_hdr()),
         ('capdelta',  atom(('<i', '{}'))),
         ('tow100',    atom(('<I', '{}'))),
@@ -450,11 +455,11 @@ def obj_dt_gps_clk():
         ('bias',      atom(('<I', '{}'))),
         ('week_x',    atom(('<H', '{}'))),
         ('nsats',     atom(('B', '{}'))),
-    ]))
+    ])))
 
 
 def obj_dt_gps_trk_element():
-    return aggie(OrderedDict([
+    return flatten(aggie(OrderedDict([
         ('az10',      atom(('<H', '{}'))),
         ('el10',      atom(('<H', '{}'))),
         ('state',     atom(('<H', '{}'))),
@@ -469,17 +474,17 @@ def obj_dt_gps_trk_element():
         ('cno7',      atom(('B',  '{}'))),
         ('cno8',      atom(('B',  '{}'))),
         ('cno9',      atom(('B',  '{}'))),
-    ]))
+    ])))
 
 
 def obj_dt_gps_trk():
-    return aggie(OrderedDict([
+    return flatten(aggie(OrderedDict([
         ('gps_hdr',   obj_dt_gps_hdr()),
         ('capdelta',  atom(('<i', '{}'))),
         ('tow100',    atom(('<I', '{}'))),
         ('week',      atom(('<H', '{}'))),
         ('chans',     atom(('<H', '{}'))),
-    ]))
+    ])))
 
 
 ####
@@ -490,16 +495,16 @@ def obj_dt_gps_trk():
 # dt_sns_id determines the format of the sensor data.
 #
 def obj_dt_sns_data():
-    return aggie(OrderedDict([
+    return flatten(aggie(OrderedDict([
         ('hdr',         obj_dt_hdr()),
         ('sched_delta', atom(('<I', '{}'))),
-    ]))
+    ])))
 
 
 def obj_dt_test():
-    return aggie(OrderedDict([
+    return flatten(aggie(OrderedDict([
         ('hdr',   obj_dt_hdr()),
-    ]))
+    ])))
 
 ####
 #
@@ -510,14 +515,14 @@ def obj_dt_test():
 # ascii string (yeah, localization is an issue, but not now).
 #
 def obj_dt_note():
-    return aggie(OrderedDict([
+    return flatten(aggie(OrderedDict([
         ('hdr',   obj_dt_hdr()),
-    ]))
+    ])))
 
 def obj_dt_config():
-    return aggie(OrderedDict([
+    return flatten(aggie(OrderedDict([
         ('hdr',   obj_dt_hdr()),
-    ]))
+    ])))
 
 
 ####
@@ -526,10 +531,10 @@ def obj_dt_config():
 #
 
 def obj_dt_gps_proto_stats():
-    return aggie(OrderedDict([
+    return flatten(aggie(OrderedDict([
         ('hdr',                 obj_dt_hdr()),
         ('stats',               obj_gps_proto_stats()),
-    ]))
+    ])))
 
 def obj_gps_proto_stats():
     return aggie(OrderedDict([
@@ -553,14 +558,14 @@ def obj_gps_proto_stats():
 # DT_GPS_RAW, dt, native, little endian
 #  ubx data little endian.
 def obj_dt_gps_raw():
-    return aggie(OrderedDict([
+    return flatten(aggie(OrderedDict([
         ('gps_hdr', obj_dt_gps_hdr()),
-    ]))
+    ])))
 
 def obj_dt_tagnet():
-    return aggie(OrderedDict([
+    return flatten(aggie(OrderedDict([
         ('hdr',   obj_dt_hdr()),
-    ]))
+    ])))
 
 
 # extract and decode gps nav track messages.
@@ -0,0 +1,369 @@
+# Copyright (c) 2021 Eric B. Decker
+# All rights reserved.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# See COPYING in the top level directory of this source tree.
+#
+# Contact: Eric B. Decker <cire831@gmail.com>
+
+'''seekable block compressed dblk files (dblkz)
+
+Archived dblk data compresses well but a gzip or zstd stream can only be
+read front to back, tagdump wants to seek (-j, resync, SYNC_FLUSH sector
+skips).  A dblkz file is the raw dblk data cut into fixed size blocks,
+each compressed on its own, plus an index of where each block landed.
+A seek is a bisect of the index and at most one block to decompress.
+
+    from   tagcore.dblkz import DblkZFile, is_dblkz
+
+    fd = open('DBLK0001.dbz', 'rb')
+    if is_dblkz(fd):
+        fd = DblkZFile(fd)              # read/seek/tell like the raw file
+
+DblkZFile can be handed to TagFile.  Converting (also a console script,
+dblkz):
+
+    dblkz DBLK0001                      # -> DBLK0001.dbz
+    dblkz DBLK0001.gz                   # gzip/zstd archives read directly
+    dblkz -d DBLK0001.dbz               # back to raw, -> DBLK0001
+
+codecs:     zlib    always available (default)
+            zstd    if the zstandard module is installed
+
+file layout (little endian):
+
+    header:  majik 'DBKZ', version (H), codec (c), pad, block size (I),
+             raw size (Q), index offset (Q), block count (I)
+    blocks:  compressed blocks, back to back
+    index:   per block: raw offset (Q), file offset (Q), compressed
+             length (I)
+'''
+
+from   __future__         import print_function
+
+__version__ = '0.4.10.dev0'
+
+__all__ = [
+    'DblkZFile',
+    'DblkZWriter',
+    'is_dblkz',
+    'compress',
+    'decompress',
+]
+
+import os
+import sys
+import zlib
+import errno
+import struct
+import argparse
+from   bisect      import bisect_right
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from   .misc_utils import eprint
+
+DBKZ_MAJIK              = b'DBKZ'
+DBKZ_VERSION            = 1
+DBKZ_BLOCK_SIZE         = 256 * 1024
+
+dbkz_hdr_struct         = struct.Struct('<4sHcxIQQI')
+dbkz_idx_struct         = struct.Struct('<QQI')
+
+CODEC_ZLIB              = b'z'
+CODEC_ZSTD              = b's'
+
+codec_names = {
+    'zlib': CODEC_ZLIB,
+    'zstd': CODEC_ZSTD,
+}
+
+
+def is_dblkz(fd):
+    '''True if fd (a file object) holds a dblkz file, position kept'''
+    try:
+        pos = fd.tell()
+        fd.seek(0)
+        majik = fd.read(len(DBKZ_MAJIK))
+        fd.seek(pos)
+    except (IOError, OSError):
+        return False                    # pipes and such
+    return majik == DBKZ_MAJIK
+
+
+def compressor(codec, level):
+    if codec == CODEC_ZLIB:
+        return lambda data: zlib.compress(data, level)
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError('dblkz: zstd needs the zstandard module')
+        return zstandard.ZstdCompressor(level = level).compress
+    raise ValueError('dblkz: unknown codec {!r}'.format(codec))
+
+
+def decompressor(codec):
+    if codec == CODEC_ZLIB:
+        return zlib.decompress
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise IOError('dblkz: zstd compressed, needs the zstandard module')
+        return zstandard.ZstdDecompressor().decompress
+    raise IOError('dblkz: unknown codec {!r}'.format(codec))
+
+
+class DblkZFile(object):
+    '''read only file-like view of the raw data in a dblkz file
+
+    inputs:     input   open (binary) file object of the dblkz file
+
+    methods:    read, seek, tell, close     as for a file.  Reads past
+                                            the end return what's left
+                                            ('' at the end).
+
+    The last block decompressed is kept, records and resyncs mostly
+    stay within a block.
+    '''
+
+    def __init__(self, input):
+        super(DblkZFile, self).__init__()
+        self.fd   = input
+        self.name = input.name
+        self.fd.seek(0)
+        hdr = self.fd.read(dbkz_hdr_struct.size)
+        if len(hdr) < dbkz_hdr_struct.size:
+            raise IOError('dblkz: {} header truncated'.format(self.name))
+        majik, ver, codec, self.block_size, self.size, idx_offset, count = \
+            dbkz_hdr_struct.unpack(hdr)
+        if majik != DBKZ_MAJIK or ver != DBKZ_VERSION:
+            raise IOError('dblkz: {} not a dblkz file (v{})'.format(self.name, ver))
+        self.codec      = codec
+        self.decompress = decompressor(codec)
+
+        self.fd.seek(idx_offset)
+        idx = self.fd.read(count * dbkz_idx_struct.size)
+        if len(idx) < count * dbkz_idx_struct.size:
+            raise IOError('dblkz: {} index truncated'.format(self.name))
+        self.raw_offsets = []
+        self.blocks      = []           # (file offset, compressed len)
+        for i in range(count):
+            raw, off, clen = dbkz_idx_struct.unpack_from(idx, i * dbkz_idx_struct.size)
+            self.raw_offsets.append(raw)
+            self.blocks.append((off, clen))
+
+        self.pos       = 0
+        self.cur       = -1             # block in cur_data
+        self.cur_data  = b''
+
+    def block(self, n):
+        '''raw data of block n'''
+        if n != self.cur:
+            off, clen = self.blocks[n]
+            self.fd.seek(off)
+            self.cur_data = self.decompress(self.fd.read(clen))
+            self.cur      = n
+        return self.cur_data
+
+    def read(self, cnt = -1):
+        if cnt < 0:
+            cnt = self.size - self.pos
+        pieces = []
+        while cnt > 0 and self.pos < self.size:
+            n     = bisect_right(self.raw_offsets, self.pos) - 1
+            data  = self.block(n)
+            start = self.pos - self.raw_offsets[n]
+            piece = data[start:start + cnt]
+            if not piece:
+                break                   # short block, shouldn't happen
+            pieces.append(piece)
+            self.pos += len(piece)
+            cnt      -= len(piece)
+        return b''.join(pieces)
+
+    def seek(self, pos, how = os.SEEK_SET):
+        if how == os.SEEK_CUR:
+            pos += self.pos
+        elif how == os.SEEK_END:
+            pos += self.size
+        if pos < 0:
+            raise IOError(errno.EINVAL, os.strerror(errno.EINVAL))
+        self.pos = pos
+        return self.pos
+
+    def tell(self):
+        return self.pos
+
+    def close(self):
+        self.fd.close()
+
+
+class DblkZWriter(object):
+    '''write raw dblk data out as a dblkz file
+
+    inputs:     path        output file
+                codec       'zlib' or 'zstd'
+                level       compression level
+                block_size  raw bytes per block
+
+    write() any amount, close() writes the index and finishes the header.
+    '''
+
+    def __init__(self, path, codec = 'zlib', level = 6,
+                 block_size = DBKZ_BLOCK_SIZE):
+        super(DblkZWriter, self).__init__()
+        self.codec      = codec_names.get(codec, codec)
+        self.compress   = compressor(self.codec, level)
+        self.block_size = block_size
+        self.fd         = open(path, 'wb')
+        self.raw_size   = 0
+        self.pending    = []
+        self.plen       = 0
+        self.index      = []
+        self.fd.write(b'\0' * dbkz_hdr_struct.size)
+
+    def write(self, data):
+        self.pending.append(data)
+        self.plen += len(data)
+        if self.plen >= self.block_size:
+            data = b''.join(self.pending)
+            bs   = self.block_size
+            full = len(data) - len(data) % bs
+            for i in range(0, full, bs):
+                self.put_block(data[i:i + bs])
+            self.pending = [ data[full:] ]
+            self.plen    = len(data) - full
+
+    def put_block(self, raw):
+        comp = self.compress(raw)
+        self.index.append((self.raw_size, self.fd.tell(), len(comp)))
+        self.fd.write(comp)
+        self.raw_size += len(raw)
+
+    def close(self):
+        if self.fd is None:
+            return
+        if self.plen:
+            self.put_block(b''.join(self.pending))
+        self.pending, self.plen = [], 0
+        idx_offset = self.fd.tell()
+        for entry in self.index:
+            self.fd.write(dbkz_idx_struct.pack(*entry))
+        self.fd.seek(0)
+        self.fd.write(dbkz_hdr_struct.pack(DBKZ_MAJIK, DBKZ_VERSION,
+                                           self.codec, self.block_size,
+                                           self.raw_size, idx_offset,
+                                           len(self.index)))
+        self.fd.close()
+        self.fd = None
+
+
+def open_archive(path):
+    '''raw, gzip, or zstd compressed dblk data, opened for reading'''
+    if path.endswith('.gz'):
+        import gzip
+        return gzip.open(path, 'rb')
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise IOError('dblkz: {} needs the zstandard module'.format(path))
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'))
+    return open(path, 'rb')
+
+
+def copy_out(src, write, chunk = 1024 * 1024):
+    while True:
+        data = src.read(chunk)
+        if not data:
+            return
+        write(data)
+
+
+def compress(src_path, dst_path, codec = 'zlib', level = 6,
+             block_size = DBKZ_BLOCK_SIZE):
+    '''raw (or .gz/.zst) dblk data at src_path to dblkz dst_path'''
+    src = open_archive(src_path)
+    out = DblkZWriter(dst_path, codec, level, block_size)
+    try:
+        copy_out(src, out.write)
+    finally:
+        out.close()
+        src.close()
+    return out.raw_size
+
+
+def decompress(src_path, dst_path):
+    '''dblkz src_path back to raw dblk data'''
+    src = DblkZFile(open(src_path, 'rb'))
+    with open(dst_path, 'wb') as out:
+        copy_out(src, out.write)
+    src.close()
+    return src.size
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description = 'convert dblk data to/from seekable block compressed '
+                      'dblkz files')
+    parser.add_argument('input',
+                        help = 'raw, .gz, or .zst dblk data (dblkz with -d)')
+    parser.add_argument('output', nargs = '?',
+                        help = 'output file, default input + .dbz (-d: '
+                               'input less .dbz)')
+    parser.add_argument('-d', '--decompress',
+                        action = 'store_true',
+                        help = 'dblkz back to raw dblk data')
+    parser.add_argument('-c', '--codec',
+                        choices = sorted(codec_names.keys()),
+                        default = 'zlib',
+                        help = 'block compression (default zlib)')
+    parser.add_argument('-l', '--level',
+                        type = int,
+                        default = 6,
+                        help = 'compression level')
+    parser.add_argument('-b', '--block',
+                        type = int,
+                        default = DBKZ_BLOCK_SIZE / 1024,
+                        help = 'raw block size in KiB')
+    args = parser.parse_args()
+
+    src = args.input
+    if args.decompress:
+        dst = args.output or (src[:-4] if src.endswith('.dbz') else src + '.raw')
+    else:
+        dst = args.output
+        if not dst:
+            base = src
+            for ext in ('.gz', '.zst'):
+                if base.endswith(ext):
+                    base = base[:-len(ext)]
+            dst = base + '.dbz'
+    if os.path.realpath(src) == os.path.realpath(dst):
+        eprint('*** dblkz: input and output are the same file')
+        sys.exit(1)
+
+    try:
+        if args.decompress:
+            size = decompress(src, dst)
+        else:
+            size = compress(src, dst, args.codec, args.level, args.block * 1024)
+    except (IOError, ValueError) as e:
+        eprint('*** dblkz: {}'.format(e))
+        sys.exit(1)
+    print('{} -> {}: {} raw bytes, {} bytes'.format(
+        src, dst, size, os.path.getsize(dst)))
+
+
+if __name__ == '__main__':
+    main()
@@ -58,6 +58,7 @@ __all__ = [
     'DTR_OBJ',
     'DTR_NAME',
     'DTR_OBJ_NAME',
+    'DTR_FLAT',
 
     # dt record types
     'DT_NONE',
@@ -124,6 +125,9 @@ __all__ = [
 #          the record
 # object:  a pointer to an object descriptor for this record.
 # name:    a string denoting the printable name for this record.
+# flat:    True if the decoder is nothing more than obj.set(buf).  The
+#          record can then be unpacked via obj.flat (see flat_aggie)
+#          without running the decoder.
 #
 #
 # when decoder code is imported, it is required to populate its entry
@@ -143,6 +147,7 @@ DTR_EMITTERS = 2                        # emitters for said record struct
 DTR_OBJ      = 3                        # rtype obj descriptor
 DTR_NAME     = 4                        # rtype name
 DTR_OBJ_NAME = 5                        # object name
+DTR_FLAT     = 6                        # decoder is a plain obj.set
 
 
 # all dt parts are native and little endian
@@ -230,8 +235,8 @@ def secsFromHour_str(rtctime):
     '''
     rt = rtctime
     rt_secs  = rt['min'].val * 60 + rt['sec'].val
-    rt_subsecs = (rt['sub_sec'].val * 1000000) / 32768
-    return '{:d}.{:06d}'.format(rt_secs, rt_subsecs)
+    rt_subsecs = (rt['sub_sec'].val * 1000000) // 32768
+    return '%d.%06d' % (rt_secs, rt_subsecs)
 
 
 last_rt = {'year': 0, 'mon': 0, 'day': 0, 'hr': 0}
@@ -34,6 +34,8 @@ Includes:
                  numeric level for how much to display
     - mr_emitters: False, nope
                    True, use machine readable emitters
+    - columnar:  None, nope
+                 directory to write columnar export tables to
 '''
 
 verbose   = 0
@@ -43,3 +45,4 @@ quiet     = 0
 pretty    = 0
 gps_level = None
 mr_emitters = False
+columnar  = None
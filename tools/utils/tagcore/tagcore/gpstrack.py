@@ -0,0 +1,332 @@
+# Copyright (c) 2021 Eric B. Decker
+# All rights reserved.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# See COPYING in the top level directory of this source tree.
+#
+# Contact: Eric B. Decker <cire831@gmail.com>
+
+'''compact in memory gps track
+
+GpsTrack pulls the GPS_GEO, GPS_XYZ, and GPS_TRK records out of a dblk
+stream and keeps them in typed arrays (array.array), one column per
+field.  A fix costs ~30 bytes, a month of fixes fits in memory and
+picking out a time range is a bisect.
+
+    from   tagcore.gpstrack import GpsTrack
+
+    trk = GpsTrack()
+    trk.load_dblk('DBLK0001')
+    trk.save('DBLK0001.trk')
+
+    geo = trk.between(t0, t1).geo.decimate(10)
+    for t, lat, lon in zip(geo['t'], geo['lat'], geo['lon']):
+        print(t, lat / 1e7, lon / 1e7)
+
+The records are decoded here (flat unpacks and decode_gps_trk), the
+populators aren't needed.  The columns are arrays, numpy.frombuffer
+takes them as is.
+
+tables, each starts with t (record rtctime, secs since the epoch, float)
+and recnum:
+
+    geo     GPS_GEO     lat, lon (deg * 1e7), alt_msl (mm), hacc (mm,
+                        ehpe), pdop (* 100), fixtype, nsats
+    xyz     GPS_XYZ     x, y, z, week_x, tow100 (secs * 100),
+                        hdop5 (hdop * 5), nsats
+    trk     GPS_TRK     one row per channel, week, tow100, chan, svid,
+                        state, cno_avg
+
+file layout (little endian):
+
+    header:  magic 'GTRK', version (H), table count (H)
+    table:   name (8s), column count (H), row count (I)
+             per column: name (8s), array typecode (c)
+             then the columns, row count * itemsize bytes each
+'''
+
+from   __future__         import print_function
+
+__version__ = '0.4.10.dev0'
+
+__all__ = [
+    'GpsTrack',
+    'track_table',
+]
+
+import sys
+import struct
+from   array       import array
+from   bisect      import bisect_left, bisect_right
+from   collections import OrderedDict
+from   operator    import itemgetter
+
+from   .dt_defs      import *
+from   .core_headers import obj_dt_gps_geo, obj_dt_gps_xyz
+from   .core_headers import obj_dt_gps_trk, decode_gps_trk
+from   .misc_utils   import rtc_secs
+from   .misc_utils   import eprint
+from   .tagrecs      import TagRecords
+
+TRK_MAJIK               = b'GTRK'
+TRK_VERSION             = 1
+
+trk_hdr_struct          = struct.Struct('<4sHH')
+trk_table_struct        = struct.Struct('<8sHI')
+trk_col_struct          = struct.Struct('<8sc')
+
+geo_columns = [
+    ('t',       'd'), ('recnum',  'I'),
+    ('lat',     'i'), ('lon',     'i'), ('alt_msl', 'i'),
+    ('hacc',    'I'), ('pdop',    'H'),
+    ('fixtype', 'B'), ('nsats',   'B'),
+]
+
+xyz_columns = [
+    ('t',       'd'), ('recnum',  'I'),
+    ('x',       'i'), ('y',       'i'), ('z',       'i'),
+    ('week_x',  'H'), ('tow100',  'I'),
+    ('hdop5',   'B'), ('nsats',   'B'),
+]
+
+trk_columns = [
+    ('t',       'd'), ('recnum',  'I'),
+    ('week',    'H'), ('tow100',  'I'),
+    ('chan',    'B'), ('svid',    'H'), ('state',   'H'),
+    ('cno_avg', 'f'),
+]
+
+# decoders, shared by all GpsTracks.  GEO and XYZ are unpacked in one go
+# and the row picked out of the values (see flat_aggie.index).
+geo_flat = obj_dt_gps_geo().flat
+xyz_flat = obj_dt_gps_xyz().flat
+trk_obj  = obj_dt_gps_trk()
+
+rt_fields = [ 'year', 'mon', 'day', 'hr', 'min', 'sec', 'sub_sec' ]
+
+def picker(flat, fields):
+    '''itemgetter for the rtctime fields, recnum, then fields'''
+    hdr = ('gps_hdr', 'hdr')
+    idx = [ flat.index(*(hdr + ('rt', f))) for f in rt_fields ]
+    idx.append(flat.index(*(hdr + ('recnum',))))
+    idx.extend([ flat.index(f) for f in fields ])
+    return itemgetter(*idx)
+
+geo_pick = picker(geo_flat, [ n for n, c in geo_columns[2:] ])
+xyz_pick = picker(xyz_flat, [ n for n, c in xyz_columns[2:] ])
+
+
+def rec_time(year, mon, day, hr, xmin, sec, sub_sec):
+    '''record rtctime as secs since the epoch (float)'''
+    return rtc_secs(year, mon, day, hr, xmin, sec) + sub_sec / 32768.
+
+
+class track_table(object):
+    '''
+    one table of a GpsTrack, a typed array per column.
+
+    columns are (name, array typecode).  Rows are expected in time
+    order (t), if one shows up out of order between() falls back to a
+    linear scan.
+
+    methods:    add         append a row (sequence in column order)
+                between     new table, rows with t0 <= t <= t1
+                decimate    new table, every n'th row
+                rows        iterator, one tuple per row
+    '''
+
+    def __init__(self, name, columns):
+        super(track_table, self).__init__()
+        self.name        = name
+        self.columns     = list(columns)
+        self.cols        = OrderedDict([ (n, array(c)) for n, c in columns ])
+        self.arrays      = self.cols.values()
+        self.time_sorted = True
+
+    def __len__(self):
+        return len(self.cols['t'])
+
+    def __getitem__(self, name):
+        return self.cols[name]
+
+    def add(self, row):
+        t = self.arrays[0]
+        if t and row[0] < t[-1]:
+            self.time_sorted = False
+        for a, v in zip(self.arrays, row):
+            a.append(v)
+
+    def take(self, pick):
+        '''new table from this one, pick(col) returns the new column'''
+        new = track_table(self.name, self.columns)
+        for n in self.cols:
+            new.cols[n] = pick(self.cols[n])
+        new.arrays      = new.cols.values()
+        new.time_sorted = self.time_sorted
+        return new
+
+    def between(self, t0 = None, t1 = None):
+        t = self.cols['t']
+        if self.time_sorted:
+            lo = 0      if t0 is None else bisect_left(t, t0)
+            hi = len(t) if t1 is None else bisect_right(t, t1)
+            return self.take(lambda a: a[lo:hi])
+        keep = [ i for i, x in enumerate(t)
+                 if (t0 is None or x >= t0) and (t1 is None or x <= t1) ]
+        return self.take(lambda a: array(a.typecode, [ a[i] for i in keep ]))
+
+    def decimate(self, n):
+        return self.take(lambda a: a[::n])
+
+    def rows(self):
+        return zip(*self.cols.values())
+
+    def write(self, fd):
+        fd.write(trk_table_struct.pack(self.name, len(self.cols), len(self)))
+        for n, c in self.columns:
+            fd.write(trk_col_struct.pack(n, c))
+        for a in self.cols.values():
+            if sys.byteorder == 'big':
+                a = array(a.typecode, a)
+                a.byteswap()
+            a.tofile(fd)
+
+    @classmethod
+    def read(cls, buf, offset):
+        '''returns (table, next offset), struct.error if buf is short'''
+        name, ncols, nrows = trk_table_struct.unpack_from(buf, offset)
+        offset += trk_table_struct.size
+        columns = []
+        for i in range(ncols):
+            n, c = trk_col_struct.unpack_from(buf, offset)
+            offset += trk_col_struct.size
+            columns.append((n.rstrip(b'\0'), c))
+        table = cls(name.rstrip(b'\0'), columns)
+        for n, c in columns:
+            a = table.cols[n]
+            size = nrows * a.itemsize
+            if offset + size > len(buf):
+                raise struct.error('column {} truncated'.format(n))
+            a.fromstring(buf[offset:offset + size])
+            if sys.byteorder == 'big':
+                a.byteswap()
+            offset += size
+        return table, offset
+
+
+class GpsTrack(object):
+    '''gps fixes, positions, and tracking data in typed arrays
+
+    tables:     geo, xyz, trk       track_tables, see the module doc
+
+    methods:    feed        add one record, (rtype, buf), others ignored
+                load_dblk   feed all the gps records of a dblk stream,
+                            takes the same arguments as TagRecords
+                between     new GpsTrack, all tables cut to [t0, t1]
+                save/load   binary track file
+    '''
+
+    def __init__(self):
+        super(GpsTrack, self).__init__()
+        self.geo = track_table('geo', geo_columns)
+        self.xyz = track_table('xyz', xyz_columns)
+        self.trk = track_table('trk', trk_columns)
+
+    def tables(self):
+        return [ self.geo, self.xyz, self.trk ]
+
+    def feed(self, rtype, buf, offset = 0):
+        '''
+        add a record.  buf holds the entire record.  Returns False if
+        the record isn't one of ours.
+        '''
+        if rtype == DT_GPS_GEO:
+            v = geo_pick(geo_flat.s_rec.unpack_from(buf))
+            self.geo.add((rec_time(*v[:7]),) + v[7:])
+        elif rtype == DT_GPS_XYZ:
+            v = xyz_pick(xyz_flat.s_rec.unpack_from(buf))
+            self.xyz.add((rec_time(*v[:7]),) + v[7:])
+        elif rtype == DT_GPS_TRK:
+            obj = trk_obj
+            decode_gps_trk(0, offset, buf, obj)
+            hdr = obj['gps_hdr']['hdr']
+            rt  = hdr['rt']
+            t   = rec_time(*[ rt[f].val for f in rt_fields ])
+            for n in range(obj['chans'].val):
+                ch = obj[n]
+                self.trk.add((t, hdr['recnum'].val, obj['week'].val,
+                              obj['tow100'].val, n, ch['svid'],
+                              ch['state'], ch['cno_avg']))
+        else:
+            return False
+        return True
+
+    def load_dblk(self, input, **kwargs):
+        '''
+        feed every GPS_GEO, GPS_XYZ, and GPS_TRK record of input.  input
+        and kwargs as for TagRecords (rtypes and decode are ours).
+        returns the number of records fed.
+        '''
+        kwargs['rtypes'] = [ DT_GPS_GEO, DT_GPS_XYZ, DT_GPS_TRK ]
+        kwargs['decode'] = False
+        recs  = TagRecords(input, **kwargs)
+        count = 0
+        for rec in recs:
+            try:
+                self.feed(rec.rtype, rec.buf, rec.offset)
+                count += 1
+            except struct.error as e:
+                eprint('*** gpstrack: rtype {} @{}: {}'.format(
+                    rec.rtype, rec.offset, e))
+        recs.close()
+        return count
+
+    def between(self, t0 = None, t1 = None):
+        new = GpsTrack()
+        new.geo = self.geo.between(t0, t1)
+        new.xyz = self.xyz.between(t0, t1)
+        new.trk = self.trk.between(t0, t1)
+        return new
+
+    def save(self, path):
+        tables = self.tables()
+        with open(path, 'wb') as fd:
+            fd.write(trk_hdr_struct.pack(TRK_MAJIK, TRK_VERSION, len(tables)))
+            for t in tables:
+                t.write(fd)
+
+    def load(self, path):
+        '''replace our tables with those in path, False if unusable'''
+        try:
+            with open(path, 'rb') as fd:
+                buf = fd.read()
+        except IOError:
+            return False
+        try:
+            majik, ver, count = trk_hdr_struct.unpack_from(buf, 0)
+            if majik != TRK_MAJIK or ver != TRK_VERSION:
+                eprint('*** gpstrack: {} not a track file (v{})'.format(path, ver))
+                return False
+            offset = trk_hdr_struct.size
+            tables = []
+            for i in range(count):
+                table, offset = track_table.read(buf, offset)
+                tables.append(table)
+        except struct.error as e:
+            eprint('*** gpstrack: {} truncated: {}'.format(path, e))
+            return False
+        for table in tables:
+            if table.name in ('geo', 'xyz', 'trk'):
+                setattr(self, table.name, table)
+        return True
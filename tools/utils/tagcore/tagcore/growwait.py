@@ -0,0 +1,145 @@
+# Copyright (c) 2021 Eric B. Decker
+# All rights reserved.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# See COPYING in the top level directory of this source tree.
+#
+# Contact: Eric B. Decker <cire831@gmail.com>
+
+'''wait for a file to grow
+
+Used when following (tailing) a dblk file.  Rather than sleeping a fixed
+amount at EOF, GrowWait.wait returns as soon as the file is longer than
+what we've read.
+
+On Linux inotify (through libc, ctypes) wakes us when the file is
+written.  Without it, or if asked not to (files on the tag's FUSE
+mount don't generate events), the size is polled starting at POLL_MIN
+and backing off to POLL_MAX.  With inotify the size is still checked
+every POLL_MAX in case an event gets missed.
+
+The size can say there is more than a read will hand back (the tag's
+FUSE mount, reads returning ENODATA).  wait then returns right away,
+every time.  dry() says a wake produced no data and sleeps, again
+backing off from POLL_MIN to POLL_MAX, until got_data().
+'''
+
+from   __future__         import print_function
+
+__version__ = '0.4.10.dev0'
+
+__all__ = [
+    'GrowWait',
+]
+
+import os
+import time
+import errno
+import select
+
+POLL_MIN                = 0.01          # secs
+POLL_MAX                = 1.0
+
+IN_MODIFY               = 0x00000002
+IN_ATTRIB               = 0x00000004
+IN_CLOSE_WRITE          = 0x00000008
+IN_NONBLOCK             = 0o4000
+IN_CLOEXEC              = 0o2000000
+
+try:
+    import ctypes
+    import ctypes.util
+    libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                       use_errno = True)
+    inotify_init1     = libc.inotify_init1
+    inotify_add_watch = libc.inotify_add_watch
+except (ImportError, OSError, AttributeError):
+    inotify_init1     = None
+
+
+def inotify_watch(path):
+    '''inotify fd watching path for writes, None if we can't'''
+    if inotify_init1 is None:
+        return None
+    ifd = inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    if ifd < 0:
+        return None
+    mask = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE
+    if inotify_add_watch(ifd, path.encode('utf-8'), mask) < 0:
+        os.close(ifd)
+        return None
+    return ifd
+
+
+class GrowWait(object):
+    '''wait for path to get longer
+
+    inputs:     path        file to watch
+                inotify     False, poll only
+
+    methods:    wait        wait(pos, timeout), True once the file is
+                            longer than pos, False after timeout secs
+                dry         the last wake didn't get any data, back off
+                got_data    data showed up, no more backing off
+                close       release the inotify fd
+    '''
+
+    def __init__(self, path, inotify = True):
+        super(GrowWait, self).__init__()
+        self.path  = path
+        self.ifd   = inotify_watch(path) if inotify else None
+        self.delay = 0                  # dry() backoff, 0 not backing off
+
+    def size(self):
+        try:
+            return os.stat(self.path).st_size
+        except OSError:
+            return 0
+
+    def drain(self):
+        try:
+            while os.read(self.ifd, 4096):
+                pass
+        except OSError as e:
+            if e.errno != errno.EAGAIN:
+                raise
+
+    def wait(self, pos, timeout):
+        deadline = time.time() + timeout
+        delay    = POLL_MIN
+        while True:
+            if self.size() > pos:
+                return True
+            left = deadline - time.time()
+            if left <= 0:
+                return False
+            if self.ifd is not None:
+                r, w, x = select.select([ self.ifd ], [], [], min(left, POLL_MAX))
+                if r:
+                    self.drain()
+            else:
+                time.sleep(min(left, delay))
+                delay = min(delay * 2, POLL_MAX)
+
+    def dry(self):
+        self.delay = min(self.delay * 2, POLL_MAX) if self.delay else POLL_MIN
+        time.sleep(self.delay)
+
+    def got_data(self):
+        self.delay = 0
+
+    def close(self):
+        if self.ifd is not None:
+            os.close(self.ifd)
+            self.ifd = None
@@ -124,8 +124,8 @@ class ImageInfo:
     def getTLV(self, tlv_type):
         for k, tlv in self.im_plus.get_tlv_rows():
             if tlv_type == k:
-                return tlv.tlv_value
-        return false
+                return tlv['tlv_value'].val
+        return None
 
     def getByteLength(self):
         return self.im_byte_len
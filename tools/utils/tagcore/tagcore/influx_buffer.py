@@ -0,0 +1,272 @@
+# Copyright (c) 2021 Eric B. Decker
+# All rights reserved.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# See COPYING in the top level directory of this source tree.
+#
+# Contact: Eric B. Decker <cire831@gmail.com>
+
+'''buffered, batched point export for InfluxDB
+
+InfluxBuffer sits between the emitters and the database.  Emitters add
+points (the dicts handed to InfluxDBClient.write_points), a background
+thread collects them and writes them in batches.  A batch goes out when
+batch_size points have been collected or flush_secs have gone by since
+the first point of the batch arrived.
+
+back-pressure:  at most max_pending points are queued.  add() blocks
+                when the writer falls behind.
+
+retry:          a write failing with a connection error is retried,
+                retries times with the delay doubling from retry_secs.
+                Any other error (client/server errors, a bad point) is
+                logged and the batch spilled, the writer keeps going.
+
+spill:          a batch that still can't be written is appended to the
+                spill file (one json list of points per line) and the
+                database is considered down.  While down, batches go
+                straight to the spill file and every down_secs we try
+                again.  Once a write goes through the spill file is
+                replayed and removed.
+
+The writer is any callable taking a list of points, normally
+InfluxDBClient(...).write_points, which is what makes it easy to point
+at a stand-in.  close() must be called to flush what's left and stop
+the thread.  If the thread is gone anyway, add() drops (and counts) the
+points and flush()/close() return right away rather than wait on it.
+'''
+
+from   __future__         import print_function
+
+__version__ = '0.4.10.dev0'
+
+__all__ = [
+    'InfluxBuffer',
+]
+
+import os
+import json
+import time
+import threading
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+from   requests.exceptions import ConnectionError
+from   .misc_utils         import eprint
+
+BATCH_SIZE      = 5000
+FLUSH_SECS      = 1.0
+MAX_PENDING     = 50000
+RETRIES         = 3
+RETRY_SECS      = 0.5
+DOWN_SECS       = 30.0
+ALIVE_SECS      = 1.0           # how often a blocked caller checks the thread
+
+
+class flush_req(object):
+    '''queued by flush(), set once everything ahead of it is written'''
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class InfluxBuffer(object):
+    '''batched background writer for influx points
+
+    inputs:     writer      callable, writer(points)
+                spill       path of the spill file, None no spilling
+                            (batches that can't be written are dropped)
+                batch_size, flush_secs, max_pending, retries,
+                retry_secs, down_secs   see above
+
+    methods:    add         queue a point (or list of points)
+                flush       write out anything collected, waits
+                close       flush and stop the writer thread
+
+    counters:   written, spilled, replayed, dropped, retries_done
+    '''
+
+    def __init__(self, writer, spill = None,
+                 batch_size  = BATCH_SIZE,  flush_secs = FLUSH_SECS,
+                 max_pending = MAX_PENDING, retries    = RETRIES,
+                 retry_secs  = RETRY_SECS,  down_secs  = DOWN_SECS):
+        super(InfluxBuffer, self).__init__()
+        self.writer       = writer
+        self.spill        = spill
+        self.batch_size   = batch_size
+        self.flush_secs   = flush_secs
+        self.retries      = retries
+        self.retry_secs   = retry_secs
+        self.down_secs    = down_secs
+
+        self.written      = 0
+        self.spilled      = 0
+        self.replayed     = 0
+        self.dropped      = 0
+        self.retries_done = 0
+
+        self.down_until   = 0           # db down, don't bother till then
+        self.q            = queue.Queue(max_pending)
+        self.thread       = threading.Thread(target = self.run,
+                                             name = 'influx_buffer')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def alive(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def put(self, item):
+        '''queue item, blocks while full.  False if the writer is gone'''
+        while self.alive():
+            try:
+                self.q.put(item, timeout = ALIVE_SECS)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def add(self, points):
+        '''queue points, blocks if max_pending are already queued'''
+        if isinstance(points, dict):
+            points = [ points ]
+        for n, p in enumerate(points):
+            if not self.put(p):
+                self.dropped += len(points) - n
+                return
+
+    def flush(self):
+        '''write out everything queued so far and wait for it'''
+        req = flush_req()
+        if not self.put(req):
+            return
+        while not req.done.wait(ALIVE_SECS):
+            if not self.alive():
+                return
+
+    def close(self):
+        if self.thread is None:
+            return
+        if self.put(None):
+            self.thread.join()
+        self.thread = None
+
+    def run(self):
+        batch    = []
+        deadline = None
+        while True:
+            timeout = None
+            if deadline is not None:
+                timeout = max(0, deadline - time.time())
+            try:
+                p = self.q.get(timeout = timeout)
+            except queue.Empty:
+                p = False               # timed out, flush
+
+            if isinstance(p, dict):
+                batch.append(p)
+                if deadline is None:
+                    deadline = time.time() + self.flush_secs
+                if len(batch) < self.batch_size:
+                    continue
+
+            if batch:
+                try:
+                    self.write_batch(batch)
+                except Exception as e:
+                    eprint('*** influx: {} points lost: {}: {}'.format(
+                        len(batch), type(e).__name__, e))
+                    self.dropped += len(batch)
+            batch    = []
+            deadline = None
+            if p is None:
+                return                  # close
+            if isinstance(p, flush_req):
+                p.done.set()
+
+    def write(self, points):
+        '''
+        write points with retries.  returns True if written, False if the
+        database looks to be down.
+        '''
+        delay = self.retry_secs
+        for attempt in range(self.retries + 1):
+            try:
+                self.writer(points)
+                return True
+            except ConnectionError as e:
+                if attempt == self.retries:
+                    eprint('*** influx: write failed, {} points: {}'.format(
+                        len(points), e))
+                    return False
+                self.retries_done += 1
+                time.sleep(delay)
+                delay *= 2
+        return False
+
+    def write_batch(self, batch):
+        if time.time() < self.down_until:
+            self.spill_batch(batch)
+            return
+        try:
+            ok = self.write(batch)
+        except Exception as e:
+            # not the database being down, something about the batch
+            eprint('*** influx: write failed, {} points: {}: {}'.format(
+                len(batch), type(e).__name__, e))
+            self.spill_batch(batch)
+            return
+        if not ok:
+            self.down_until = time.time() + self.down_secs
+            self.spill_batch(batch)
+            return
+        self.down_until = 0
+        self.written   += len(batch)
+        self.replay()
+
+    def spill_batch(self, batch):
+        if not self.spill:
+            self.dropped += len(batch)
+            return
+        with open(self.spill, 'a') as fd:
+            fd.write(json.dumps(batch))
+            fd.write('\n')
+        self.spilled += len(batch)
+
+    def replay(self):
+        '''database is up, push out anything spilled earlier'''
+        if not self.spill or not os.path.exists(self.spill):
+            return
+        with open(self.spill) as fd:
+            lines = fd.readlines()
+        for n, line in enumerate(lines):
+            points = json.loads(line)
+            try:
+                ok = self.write(points)
+            except Exception as e:
+                # won't ever go, don't let it hold up the rest
+                eprint('*** influx: spilled batch dropped, {} points: {}: {}'.format(
+                    len(points), type(e).__name__, e))
+                self.dropped += len(points)
+                continue
+            if not ok:
+                # down again, keep what's left for next time
+                self.down_until = time.time() + self.down_secs
+                with open(self.spill, 'w') as fd:
+                    fd.writelines(lines[n:])
+                return
+            self.replayed += len(points)
+            self.written  += len(points)
+        os.remove(self.spill)
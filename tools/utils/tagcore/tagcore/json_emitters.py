@@ -21,12 +21,15 @@
 
 from   __future__         import print_function
 
-__version__ = '0.4.6'
+__version__ = '0.4.10.dev0'
 
 TEST = False
 
+import os
 import sys
+import atexit
 from time     import sleep
+from functools import partial
 from binascii import hexlify
 from requests.exceptions import ConnectionError
 
@@ -36,12 +39,14 @@ pp = pprint.PrettyPrinter(indent=4)
 from base_objs   import atom
 from dt_defs     import dt_records
 from dt_defs     import secsFromHour_str
-from misc_utils  import rtctime_iso
+from misc_utils  import rtctime_us
 from core_events import event_name
+from misc_utils  import eprint
+from influx_buffer import InfluxBuffer
 
 import tagcore.globals
 
-__all__ = [ 'emit_influx' ]
+__all__ = [ 'emit_influx', 'influx_close' ]
 versions_ok = [ '1.5.2', '1.7.0' ]
 
 
@@ -51,6 +56,14 @@ user     = 'root'
 password = 'root'
 dbname   = 'test'
 
+# points are handed to a background writer (see influx_buffer) and written
+# in batches.  batches that can't be written while the database is down
+# are spilled here and written once it comes back.
+batch_size = 5000
+flush_secs = 1.0
+spill      = os.path.expanduser('~/.tag_influx_spill')
+influx_out = None
+
 
 def influx_print():
     if tagcore.globals.verbose > 0 or tagcore.globals.export:
@@ -91,6 +104,12 @@ try:
             if (no_db):
                 print("### Influxdb creating database: {}".format(dbname))
                 influx_db.create_database(dbname)
+            # point times are integer epoch microseconds (rtctime_us)
+            influx_out = InfluxBuffer(partial(influx_db.write_points,
+                                              time_precision = 'u'),
+                                      spill = spill,
+                                      batch_size = batch_size,
+                                      flush_secs = flush_secs)
         else:
             print('### influxdb not correct version: {}', influxdb_version)
             influxdb_saved_version = influxdb_version
@@ -113,6 +132,23 @@ except ImportError:
         sys.exit()
 
 
+def influx_close():
+    '''write out anything still buffered and stop the writer'''
+    global influx_out
+    if influx_out is None:
+        return
+    influx_out.close()
+    if influx_print():
+        eprint('### influx: written: {}  spilled: {}  replayed: {}  '
+               'dropped: {}  retries: {}'.format(
+                   influx_out.written, influx_out.spilled,
+                   influx_out.replayed, influx_out.dropped,
+                   influx_out.retries_done))
+    influx_out = None
+
+atexit.register(influx_close)
+
+
 def int32(x):
   if x>0xFFFFFFFF:
     raise OverflowError
@@ -183,7 +219,7 @@ _example_output = [
                'hdr_recsum': 2061,
                'hdr_type': 3,
                'prev_sync': 6171560},
-    'time': '2018-09-12T22:33:48.825531',
+    'time': 1536791628825531,
     'tags': {'app': 'tagdump'},
 ]
 '''
@@ -221,13 +257,13 @@ def emit_influx(level, offset, buf, obj):
                 return
         # zzz pp.pprint(obj)
         # zzz print('### emit_influx name: {}, num: {}, xtype: {}, xlen: {}, brt: {}, utc: {}'.format(
-        # dt_records[int(xtype)][4], recnum, xtype, xlen, brt, rtctime_iso(rtctime)))
+        # dt_records[int(xtype)][4], recnum, xtype, xlen, brt, rtctime_us(rtctime)))
         # zzz print('### emit_influx {}'.format(flatten_dict(obj, '')))
         json_rec =influx_record(dt_records[int(xtype)][4],
-                                rtctime_iso(rtctime),
+                                rtctime_us(rtctime),
                                 flatten_dict(obj, ''),
                                 build_tags(obj))
         # zzz print('### influx JSON:', json_rec)
-        influx_db.write_points(json_rec)
+        influx_out.add(json_rec)
     else:
         print('### emit_influx error level: {}, offset: {}, buf: {}'.format(hexlify(buf)))
@@ -22,6 +22,7 @@
 
 from   __future__ import print_function
 from   datetime   import datetime
+import calendar
 import binascii
 import sys
 
@@ -79,11 +80,106 @@ def rtc2datetime(rtc_obj):
        (rtc_obj['sub_sec'].val* 1000000) / 32768,
     )
 
+##
+# rtc_secs: convert broken out rtc fields to seconds since the epoch (UTC)
+#
+# an unset rtc (year 0) or garbage fields give 0.
+#
+def rtc_secs(year, mon, day, hr, xmin, sec):
+    if year == 0:
+        return 0
+    try:
+        return calendar.timegm((year, mon, day, hr, xmin, sec))
+    except ValueError:
+        return 0
+
+def rtc2secs(rtc_obj):
+    return rtc_secs(rtc_obj['year'].val, rtc_obj['mon'].val,
+                    rtc_obj['day'].val,  rtc_obj['hr'].val,
+                    rtc_obj['min'].val,  rtc_obj['sec'].val)
+
+##
+# rtc_cache: rtctime conversions, the date/hour part computed once per hour
+#
+# building a datetime and running strftime for every record adds up when
+# every record gets a time stamp (mr output, influx export).  Records come
+# in time order so the date and hour rarely change.  rtc_cache keeps the
+# last hour seen (epoch microseconds and the formatted prefixes) and only
+# redoes it when the hour changes, the rest is integer arithmetic.
+#
+# epoch_us gives integer microseconds since the epoch (UTC), strings are
+# only built when asked for (iso, full).  Output matches
+# rtc2datetime(rt).isoformat() and .strftime(utc_str(pretty)), an unset
+# rtc (year 0) is 1970-01-01 00:00:00.
+#
+class rtc_cache(object):
+    def __init__(self):
+        self.key      = None                # (year, mon, day, hr)
+        self.hr_us    = 0                   # top of the hour, epoch us
+        self.iso_pfx  = ''                  # 2018-05-17T17:
+        self.full_pfx = ('', '')            # compact, pretty
+
+    def fields(self, rt):
+        '''rtctime to (year, mon, day, hr, min, sec, us)'''
+        year = rt['year'].val
+        if year == 0:
+            return (1970, 1, 1, 0, 0, 0, 0)
+        return (year, rt['mon'].val, rt['day'].val, rt['hr'].val,
+                rt['min'].val, rt['sec'].val,
+                (rt['sub_sec'].val * 1000000) // 32768)
+
+    def hour(self, key):
+        year, mon, day, hr = key
+        dt = datetime(year, mon, day, hr)
+        self.hr_us    = calendar.timegm(dt.timetuple()) * 1000000
+        self.iso_pfx  = dt.isoformat()[:14]
+        self.full_pfx = (dt.strftime('%Y%m%dT%H'),
+                         dt.strftime('%Y/%m/%dT%H:'))
+        self.key      = key
+
+    def epoch_us(self, rt):
+        if rt['year'].val == 0:
+            return 0
+        year, mon, day, hr, xmin, sec, us = self.fields(rt)
+        key = (year, mon, day, hr)
+        if key != self.key:
+            self.hour(key)
+        return self.hr_us + (xmin * 60 + sec) * 1000000 + us
+
+    def iso(self, rt):
+        year, mon, day, hr, xmin, sec, us = self.fields(rt)
+        key = (year, mon, day, hr)
+        if key != self.key:
+            self.hour(key)
+        if us:
+            return '%s%02d:%02d.%06d' % (self.iso_pfx, xmin, sec, us)
+        return '%s%02d:%02d' % (self.iso_pfx, xmin, sec)
+
+    def full(self, rt, pretty = 1):
+        year, mon, day, hr, xmin, sec, us = self.fields(rt)
+        key = (year, mon, day, hr)
+        if key != self.key:
+            self.hour(key)
+        if pretty:
+            return '%s%02d:%02d.%06d' % (self.full_pfx[1], xmin, sec, us)
+        return '%s%02d%02d.%06d' % (self.full_pfx[0], xmin, sec, us)
+
+
+rtc_conv = rtc_cache()
+
+
+def rtctime_us(rtctime):
+    '''
+    convert a rtctime into integer microseconds since the epoch (UTC).
+    '''
+    return rtc_conv.epoch_us(rtctime)
+
+
 def rtctime_iso(rtctime):
     '''
     convert a rtctime into an ISO-8601 formatted string displaying the time.
     '''
-    return rtc2datetime(rtctime).isoformat()
+    return rtc_conv.iso(rtctime)
 
 
 def rtctime_full(rtctime, pretty=1):
@@ -91,7 +187,7 @@ def rtctime_full(rtctime, pretty=1):
     convert a rtctime into a full ISO-8601 formatted string displaying the time.
     Full means all digits are spaced out.
     '''
-    return rtc2datetime(rtctime).strftime(utc_str(pretty))
+    return rtc_conv.full(rtctime, pretty)
 
 def expand_datetime(dt, pretty=1):
     return dt.strftime(utc_str(pretty))
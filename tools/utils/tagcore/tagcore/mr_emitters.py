@@ -166,11 +166,11 @@ def emit_event_mr(level, offset, buf, obj):
 
 def emit_gps_raw_mr(level, offset, buf, obj):
     hdr   = obj['gps_hdr']['hdr']
-    index = len(obj) - len(obj['ubx_hdr'])
-    if buf[index] != ord('$'):
+    msg   = obj.msg                     # framed by decode_gps_raw
+    if not msg or msg.kind != 'nmea':
         return
     c = OrderedDict()
-    c['nmea_string'] = buf[index:].rstrip('\r\n\x00')
+    c['nmea_string'] = msg.msg
     mr_display(offset, hdr, c, 'NEMA')
 
 def emit_gps_time_mr(level, offset, buf, obj):
@@ -9,4 +9,4 @@ def decode_default(level, offset, buf, obj):
     return obj.set(buf)
 
 #
-dtd.dt_records[DT_TAGNET]           = (  0, decode_default, [ emit_tagnet ],      obj_dt_tagnet(),    'TAGNET',       'obj_dt_tagnet'   )
+dtd.dt_records[DT_TAGNET]           = (  0, decode_default, [ emit_tagnet ],      obj_dt_tagnet(),    'TAGNET',       'obj_dt_tagnet', True  )
@@ -0,0 +1,130 @@
+# Copyright (c) 2021 Eric B. Decker
+# All rights reserved.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# See COPYING in the top level directory of this source tree.
+#
+# Contact: Eric B. Decker <cire831@gmail.com>
+
+'''buffered output sink for the emitters
+
+The emitters build a record's display out of many print(..., end = '')
+calls.  Each of those is a write to sys.stdout, a trip through the file
+layer (and a lock release/grab) per piece.  OutSink is a file-like
+object that collects the pieces in memory and hands them to the real
+destination in large writes.
+
+    sink = OutSink('dump.txt.gz')
+    sys.stdout = sink                   # emitters print into the sink
+    for each record:
+        ... decode, emit ...
+        sink.check()                    # write out if bufsize collected
+    sink.close()
+    sys.stdout = sys.__stdout__
+
+write() is the buffer's own (C) write, the size check is left to the
+caller, once per record is the intent.  check() with live set writes out
+every time, for output someone is watching (tailing, net io, a terminal).
+
+destinations:   None or '-'     sys.stdout (as it was when the sink was
+                                built)
+                path            a file, .gz and .bz2 are compressed
+                list            written chunks are appended, for tests
+                file object     anything with a write method
+'''
+
+from   __future__         import print_function
+
+__version__ = '0.4.10.dev0'
+
+__all__ = [
+    'OutSink',
+]
+
+import sys
+
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from io        import StringIO
+
+OUT_BUF_SIZE    = 64 * 1024
+
+
+class OutSink(object):
+    '''file-like buffered writer, see the module doc
+
+    methods:    write       buffer a piece of output
+                check       write out if bufsize or more is buffered
+                flush       write out whatever is buffered
+                close       flush, close the destination if we opened it
+    '''
+
+    softspace = 0                       # py2 print statement
+
+    def __init__(self, dest = None, bufsize = OUT_BUF_SIZE, live = False):
+        super(OutSink, self).__init__()
+        self.bufsize = bufsize
+        self.live    = live
+        self.fd      = None             # what we opened, closed by close
+        self.dest_fd = None             # file-like destination
+        if dest is None or dest == '-':
+            self.dest_fd = sys.stdout
+            self.out     = sys.stdout.write
+        elif isinstance(dest, list):
+            self.out     = dest.append
+        elif isinstance(dest, str):
+            if dest.endswith('.gz'):
+                import gzip
+                self.fd = gzip.open(dest, 'wb')
+            elif dest.endswith('.bz2'):
+                import bz2
+                self.fd = bz2.BZ2File(dest, 'w')
+            else:
+                self.fd = open(dest, 'w')
+            self.dest_fd = self.fd
+            self.out     = self.fd.write
+        else:
+            self.dest_fd = dest
+            self.out     = dest.write
+        self.reset()
+
+    def reset(self):
+        self.buf   = StringIO()
+        self.write = self.buf.write
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def check(self):
+        if self.live or self.buf.tell() >= self.bufsize:
+            self.flush()
+
+    def flush(self):
+        if self.buf.tell():
+            data = self.buf.getvalue()
+            self.reset()
+            self.out(data)
+        if self.dest_fd is not None:
+            self.dest_fd.flush()
+
+    def close(self):
+        self.flush()
+        if self.fd is not None:
+            self.fd.close()
+            self.fd = None
+
+    def isatty(self):
+        return self.dest_fd is not None and self.dest_fd.isatty()
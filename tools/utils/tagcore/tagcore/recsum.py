@@ -0,0 +1,255 @@
+# Copyright (c) 2021 Eric B. Decker
+# All rights reserved.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# See COPYING in the top level directory of this source tree.
+#
+# Contact: Eric B. Decker <cire831@gmail.com>
+
+'''batch record checksum (recsum) verification
+
+Every dblk record carries a 16 bit recsum, the byte sum of the entire
+record computed with the recsum field itself zero.  Rather than summing
+each record as it is read, a window of records (RECSUM_WINDOW bytes) is
+located by walking the header chain and all of the sums are computed in
+one go.
+
+If numpy is available the sums come from one cumulative sum over a
+uint8 view of the window.  Otherwise we fall back to summing each record
+with struct, which is still better than slicing out a bytearray.
+
+    hdr_chain       walk record headers, returns (offset, rlen, recsum)
+    recsums         computed checksums for a list of records
+    verify_window   hdr_chain + recsums, returns the records and failures
+
+Record validation.  Everybody that pulls records out of a dblk stream
+(tagdump's get_record, TagMap.records, TagRecords.stream_records, the
+monitor's framer) applies the same rules, they live here:
+
+    hdr_check       header sanity, size and recnum
+    rec_chksum      checksum of one record, recsum bytes removed
+    rec_check       checksum and required length, once the record is in
+    req_len         required length of an rtype, 0 if variable
+    next_rec        where the following record starts
+    rec_errors      printable forms of the REC_ codes
+'''
+
+from   __future__         import print_function
+
+__version__ = '0.4.10.dev0'
+
+__all__ = [
+    'RECSUM_WINDOW',
+    'REC_OK',
+    'REC_TOO_SMALL',
+    'REC_TOO_LARGE',
+    'REC_ZERO_RECNUM',
+    'REC_CHKSUM',
+    'REC_REQ_LEN',
+    'rec_errors',
+    'rec_sum',
+    'hdr_check',
+    'rec_chksum',
+    'rec_check',
+    'req_len',
+    'next_rec',
+    'hdr_chain',
+    'recsums',
+    'verify_window',
+]
+
+import struct
+
+from   .dt_defs    import DT_SYNC_FLUSH, DTR_REQ_LEN
+import tagcore.dt_defs as dtd
+
+# numpy is optional, only used to speed things up.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+RECSUM_WINDOW           = 64 * 1024
+RLEN_MAX_SIZE           = 2048
+SECTOR_SIZE             = 512
+
+# dt_hdr, only the pieces needed to walk records.  see obj_dt_hdr
+#   len (H), type (B), hdr_crc8 (x), recnum (I), rt (10x), recsum (H)
+dt_hdr_struct           = struct.Struct('<HBxI10xH')
+DT_HDR_SIZE             = dt_hdr_struct.size
+
+# record check results, see hdr_check and rec_check
+REC_OK                  = 0
+REC_TOO_SMALL           = 1
+REC_TOO_LARGE           = 2
+REC_ZERO_RECNUM         = 3
+REC_CHKSUM              = 4
+REC_REQ_LEN             = 5
+
+# rec_errors[err].format(rlen, offset, required)
+rec_errors = {
+    REC_TOO_SMALL:      '*** record size too small: {0} @{1}',
+    REC_TOO_LARGE:      '*** record size too large: {0} @{1}',
+    REC_ZERO_RECNUM:    '*** zero record number @{1} - resyncing',
+    REC_REQ_LEN:        '*** len violation, required: {2} got {0} @{1}',
+}
+
+
+# struct objects used to sum a record in place, keyed by record length.
+sum_structs = {}
+
+def rec_sum(buf, offset, rlen):
+    '''byte sum rlen bytes of buf starting at offset, without copying'''
+    s = sum_structs.get(rlen)
+    if s is None:
+        s = struct.Struct('{}B'.format(rlen))
+        sum_structs[rlen] = s
+    return sum(s.unpack_from(buf, offset))
+
+
+def hdr_check(rlen, recnum):
+    '''
+    sanity check a record header, before the rest of the record is
+    looked at.  returns REC_OK or REC_TOO_SMALL, REC_TOO_LARGE,
+    REC_ZERO_RECNUM (zero is never a valid recnum).
+    '''
+    if rlen < DT_HDR_SIZE:
+        return REC_TOO_SMALL
+    if rlen > RLEN_MAX_SIZE:
+        return REC_TOO_LARGE
+    if recnum == 0:
+        return REC_ZERO_RECNUM
+    return REC_OK
+
+
+def rec_chksum(buf, offset, rlen, recsum):
+    '''
+    checksum of the rlen byte record at offset.  recsum was computed
+    with the recsum field 0, so its bytes are removed before handing
+    back the bottom 16 bits, directly comparable to recsum.
+    '''
+    chksum  = rec_sum(buf, offset, rlen)
+    chksum -= (recsum & 0xff00) >> 8
+    chksum -= (recsum & 0x00ff)
+    return chksum & 0xffff
+
+
+def rec_check(rtype, rlen, recsum, chksum):
+    '''
+    check a record whose header passed hdr_check.  chksum is from
+    rec_chksum (or recsums).  returns REC_OK, REC_CHKSUM or REC_REQ_LEN
+    (rtype has a required length, see dt_records, and rlen isn't it).
+    '''
+    if chksum != recsum:
+        return REC_CHKSUM
+    required = req_len(rtype)
+    if required and required != rlen:
+        return REC_REQ_LEN
+    return REC_OK
+
+
+def req_len(rtype):
+    '''required length of rtype records, 0 if variable or unknown'''
+    v = dtd.dt_records.get(rtype)
+    return v[DTR_REQ_LEN] if v else 0
+
+
+def next_rec(offset, rlen, rtype):
+    '''
+    offset of the record following the one at offset.  Records start on
+    a quad boundary, SYNC_FLUSH says the rest of the sector was flushed
+    and the next record is in the next sector.
+    '''
+    if rtype == DT_SYNC_FLUSH:
+        return (offset + SECTOR_SIZE) & ~(SECTOR_SIZE - 1)
+    return (offset + rlen + 3) & ~3
+
+
+def hdr_chain(buf, offset, end, window = RECSUM_WINDOW):
+    '''
+    walk the record headers starting at offset.
+
+    input:  buf         bytearray, mmap, or anything struct can unpack from
+            offset      where the first record starts (quad aligned)
+            end         end of valid data in buf
+            window      stop with the first record starting window
+                        bytes or more past offset
+
+    output: list of (offset, rlen, recsum), one per record
+
+    The walk stops at the first header that looks bad (same checks as
+    get_record, size and recnum) or that runs past end.  SYNC_FLUSH
+    records move on to the next sector.  Nothing is checksummed.
+    '''
+    recs  = []
+    limit = offset + window
+    while offset < limit and offset + DT_HDR_SIZE <= end:
+        rlen, rtype, recnum, recsum = dt_hdr_struct.unpack_from(buf, offset)
+        if hdr_check(rlen, recnum) != REC_OK:
+            break
+        if offset + rlen > end:
+            break
+        recs.append((offset, rlen, recsum))
+        offset = next_rec(offset, rlen, rtype)
+    return recs
+
+
+def recsums(buf, recs):
+    '''
+    compute the checksum of each record in recs, (offset, rlen, recsum).
+
+    returns a list of computed checksums, 16 bits, with the recsum bytes
+    already removed, ie. directly comparable to each record's recsum.
+    '''
+    if not recs:
+        return []
+    if np is None:
+        out = []
+        for offset, rlen, recsum in recs:
+            out.append(rec_chksum(buf, offset, rlen, recsum))
+        return out
+
+    lo  = recs[0][0]
+    hi  = max([ offset + rlen for offset, rlen, recsum in recs ])
+    win = np.frombuffer(buf, dtype = np.uint8, count = hi - lo, offset = lo)
+
+    # cs[n] is the sum of the first n bytes of the window.  uint32 wraps
+    # but we only care about the bottom 16 bits of each difference.
+    cs  = np.zeros(len(win) + 1, dtype = np.uint32)
+    np.cumsum(win, dtype = np.uint32, out = cs[1:])
+
+    r       = np.array(recs, dtype = np.int64)
+    starts  = r[:, 0] - lo
+    ends    = starts + r[:, 1]
+    recsum  = r[:, 2].astype(np.uint32)
+    chksums = cs[ends] - cs[starts]
+    chksums -= (recsum >> 8) + (recsum & 0xff)
+    return (chksums & 0xffff).tolist()
+
+
+def verify_window(buf, offset, end, window = RECSUM_WINDOW):
+    '''
+    checksum a window of records in one call.
+
+    returns (recs, failures)
+        recs        list of (offset, rlen, recsum), see hdr_chain
+        failures    list of (offset, recsum, chksum) for each record
+                    whose checksum doesn't match.
+    '''
+    recs     = hdr_chain(buf, offset, end, window)
+    failures = []
+    for rec, chksum in zip(recs, recsums(buf, recs)):
+        if chksum != rec[2]:
+            failures.append((rec[0], rec[2], chksum))
+    return recs, failures
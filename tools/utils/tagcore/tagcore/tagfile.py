@@ -37,6 +37,8 @@ import struct
 
 from   .dt_defs    import *
 from   .misc_utils import eprint
+from   .dblkz      import DblkZFile
+from   .growwait   import GrowWait
 
 # negative offset indicates file i/o error
 EODATA = -14
@@ -61,20 +63,26 @@ def int32(x):
 TF_SEEK_END = os.SEEK_END
 
 MAX_ZERO_SIGS           = 1024          # 1024 quads, 4K bytes of zero
+RESYNC_BLOCK            = 1024 * 1024   # local resync reads this much at a time
 
 class TagFile(object):
     '''TagDump File Class
 
-    inputs:     input   FileType, input file stream
+    inputs:     input   FileType, input file stream, or a DblkZFile
+                        (compressed dblk, see dblkz.py)
                 net_io  true if doing network i/o
                 tail    true if hang at the tail of input, keep trying
-                        waiting for more network i/o.  Forces net_io.
+                        waiting for more data.  With net_io this is the
+                        tag's file (--tail), without it a local file that
+                        is being written (--follow).
                 verbose vebosity level (see tagdump.py)
                 timeout timeout value (default 60 secs) for --tail/net_io
 
-    methods:    read    reads CNT bytes from the input stream.  If doing
-                        network i/o (net_io true) and --tail is set will
-                        repeated try for additional reads when at eof.
+    methods:    read    reads CNT bytes from the input stream.  If tail
+                        is set will wait for the file to grow when at eof
+                        (see growwait.py, up to timeout secs at a time)
+                        and keep going, a partial read is picked up where
+                        it left off.
 
                 tell    will return current stream position in bytes.
 
@@ -86,8 +94,10 @@ class TagFile(object):
                  verbose = 0, timeout = 60):
         super( TagFile, self ).__init__()
 
-        if not isinstance(input, types.FileType):
+        if not isinstance(input, (types.FileType, DblkZFile)):
             raise IOError('not expected file type {}'.format(input))
+        if (net_io or tail) and isinstance(input, DblkZFile):
+            raise IOError('compressed (dblkz) input, no net io or tailing')
 
         self.net_io = net_io
         self.tail   = tail
@@ -100,12 +110,25 @@ class TagFile(object):
         if (self.net_io):
             self.fd.close()
             self.fileno   = os.open(self.name, os.O_DIRECT | os.O_RDONLY)
+        elif (self.tail):
+            # following a local file, go unbuffered, reads at eof have to
+            # see what the writer adds.
+            self.fileno   = self.fd.fileno()
+            os.lseek(self.fileno, self.fd.tell(), os.SEEK_SET)
+
+        # net_io and tail both read/seek the fileno directly
+        self.raw_io = self.net_io or self.tail
+        self.waiter = None
+        if (self.tail):
+            # no inotify events for the tag's files
+            self.waiter = GrowWait(self.name, inotify = not self.net_io)
 
     def read(self, cnt):
-        buf = ''
+        buf    = ''
+        waited = False                  # tail, waited on the last pass
         while True:
             try:
-                if (self.net_io):
+                if (self.raw_io):
                     new = os.read(self.fileno, cnt - len(buf))
                 else:
                     new = self.fd.read(cnt - len(buf))
@@ -117,6 +140,9 @@ class TagFile(object):
 
                 if new == '':
                     raise OSError(errno.ENODATA, os.strerror(errno.ENODATA))
+                if waited:
+                    self.waiter.got_data()
+                    waited = False
                 buf += new
                 if (len(buf) != cnt):
                     continue
@@ -126,7 +152,12 @@ class TagFile(object):
                     if (self.tail):
                         if self.verbose >= 5:
                             eprint('*** TF.read: buf len: ', len(buf))
-                        time.sleep(self.timeout)
+                        if waited:
+                            # woke up but still no data, the size can
+                            # be ahead of what reads return, don't spin
+                            self.waiter.dry()
+                        self.waiter.wait(self.tell(), self.timeout)
+                        waited = True
                         continue
                     eprint('*** data stream EOF sorry')
                     eprint('*** use --tail to wait for data at EOF')
@@ -139,13 +170,13 @@ class TagFile(object):
                 raise
 
     def tell(self):
-        if (self.net_io):
+        if (self.raw_io):
             return os.lseek(self.fileno, 0, os.SEEK_CUR)
         else:
             return self.fd.tell()
 
     def seek(self, pos, how=os.SEEK_SET):
-        if (self.net_io):
+        if (self.raw_io):
             return os.lseek(self.fileno, pos, how)
         else:
             return self.fd.seek(pos, how)
@@ -169,9 +200,11 @@ class TagFile(object):
         by the negative offset value.
 
         Otherwise the search will be conducted on file by reading
-        the byte stream to look for a valid sync record. This is
-        done by advancing one quad-aligned word and inspecting the
-        byte stream for a valid SYNC record. There are three possible
+        the byte stream to look for a valid sync record.  Local files
+        are read a block at a time and searched for the sync majik
+        (see resync_local).  When tailing we advance one quad-aligned
+        word at a time and inspect the byte stream for a valid SYNC
+        record, waiting for data as needed.  There are three possible
         SYNC record types that all share the same record format and
         only differ in type. (SYNC, SYNC_FLUSH, SYNC_REBOOT). A valid
         record has the correct type, length, majik value, and header
@@ -219,6 +252,9 @@ class TagFile(object):
                 raise EOFError
             raise IOError
 
+        if not self.tail:
+            return self.resync_local(offset)
+
         # else search file byte stream for sync record
         #
         record = dt_records[DT_SYNC][DTR_OBJ]
@@ -275,3 +311,75 @@ class TagFile(object):
                     sys.exc_info()[0], offset))
                 raise
         return -1
+
+    def resync_local(self, offset):
+        '''block search for the next SYNC record, local files
+
+        offset is quad aligned.  Read RESYNC_BLOCK bytes at a time and
+        find() the sync majik.  A candidate is where the majik would sit
+        in a sync record starting on a quad boundary, it is checked in
+        memory the same way as the quad walk in resync does.
+
+        Runs of zeros (erased or unwritten gaps) are just more bytes
+        without the majik, find() goes right over them.  We only give
+        up (EODATA) at the end of the file.
+
+        The tail of each block (enough for a sync record) is carried
+        over so nothing straddling a block boundary gets missed.
+        '''
+        record    = dt_records[DT_SYNC][DTR_OBJ]
+        rec_len   = dt_records[DT_SYNC][DTR_REQ_LEN]
+        majik_off = rec_len - 4
+        majik     = struct.pack('<I', dt_sync_majik)
+
+        base = offset                   # file offset of buf[0]
+        buf  = ''
+        pos  = 0                        # next candidate, rel to base
+        while (True):
+            try:
+                self.fd.seek(base + len(buf))
+                new = self.fd.read(RESYNC_BLOCK)
+            except IOError:
+                eprint('*** resync: file io error @{}'.format(base + len(buf)))
+                raise
+            buf += new
+            while (True):
+                majik_at = buf.find(majik, pos + majik_off)
+                if majik_at < 0:
+                    # no candidates at or past pos that fit in buf
+                    pos = max(pos, (len(buf) - rec_len + 4) & ~3)
+                    break
+                cand = majik_at - majik_off
+                if (cand & 3):
+                    pos = (cand + 3) & ~3
+                    continue
+                if cand + rec_len > len(buf):
+                    pos = cand          # need more data
+                    break
+                record.set(bytearray(buf[cand:cand + rec_len]))
+                if ((record['hdr']['len'].val == rec_len) and
+                    ((record['hdr']['type'].val == DT_SYNC) or
+                     (record['hdr']['type'].val == DT_SYNC_FLUSH) or
+                     (record['hdr']['type'].val == DT_SYNC_REBOOT))):
+                    self.seek(base + cand)
+                    return base + cand
+                if (self.verbose >= 5):
+                    resync2 = '*** resync: failed record @{} (0x{:x}): ' + \
+                              'len: {}, type: {}, rec: {}'
+                    eprint(resync2.format(base + cand, base + cand,
+                                          record['hdr']['len'].val,
+                                          record['hdr']['type'].val,
+                                          record['hdr']['recnum'].val))
+                pos = cand + 4
+
+            if not new:
+                if (self.verbose >= 4):
+                    eprint('*** resync: no sync record found, end of file @{}'.format(
+                        base + len(buf)))
+                return EODATA
+
+            # toss what has been looked at
+            drop = min(pos, len(buf)) & ~3
+            buf  = buf[drop:]
+            base += drop
+            pos  -= drop
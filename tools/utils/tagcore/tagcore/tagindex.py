@@ -0,0 +1,243 @@
+# Copyright (c) 2021 Eric B. Decker
+# All rights reserved.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# See COPYING in the top level directory of this source tree.
+#
+# Contact: Eric B. Decker <cire831@gmail.com>
+
+'''persistent offset/recnum/rtctime index for local dblk files
+
+A dblk index is a sidecar file (<dblk file>.idx) that maps record
+numbers, rtctimes, and rtypes to byte offsets in the dblk file.  By
+default an entry is made for every SYNC record (SYNC, SYNC_FLUSH,
+SYNC_REBOOT), optionally for every record.
+
+Lookups bisect the index and return an offset at or before the record
+wanted, the caller seeks there and scans forward.  The index only covers
+the part of the file that existed when it was built, if the file has
+grown update() picks up where the last build stopped.
+
+file layout (little endian):
+
+    header:  magic 'TIDX', version (H), flags (H), file size (Q),
+             resume offset (Q), entry count (I)
+    entries: offset (Q), recnum (I), secs (I), sub_sec (H), rtype (B), pad
+'''
+
+from   __future__         import print_function
+
+__version__ = '0.4.10.dev0'
+
+__all__ = [
+    'TagIndex',
+    'index_path',
+]
+
+import os
+import struct
+from   bisect      import bisect_left, bisect_right
+
+from   .dt_defs    import *
+from   .misc_utils import rtc_secs
+from   .misc_utils import eprint
+
+IDX_MAJIK               = b'TIDX'
+IDX_VERSION             = 1
+IDX_ALL_RECS            = 0x0001        # flags: every record indexed
+
+idx_hdr_struct          = struct.Struct('<4sHHQQI')
+idx_entry_struct        = struct.Struct('<QIIHBx')
+
+# full dt_hdr: len, type, hdr_crc8 (x), recnum, rtctime (sub_sec, sec,
+# min, hr, dow, day, mon, year), recsum
+dt_hdr_rt_struct        = struct.Struct('<HBxIHBBBBBBHH')
+
+sync_types              = (DT_SYNC, DT_SYNC_FLUSH, DT_SYNC_REBOOT)
+
+
+def index_path(name):
+    return name + '.idx'
+
+
+class TagIndex(object):
+    '''dblk sidecar index
+
+    inputs:     path        path of the sidecar (see index_path)
+
+    methods:    load        read the sidecar, False if missing/unusable
+                update      (re)build or extend from a TagMap
+                find_recnum offset to start scanning for a recnum
+                find_time   offset to start scanning for a rtctime (secs)
+                end_recnum  offset past which all recnums are larger
+                end_time    offset past which all times are later
+                rtype_offsets
+                            offsets of all indexed records of an rtype
+    '''
+
+    def __init__(self, path):
+        super(TagIndex, self).__init__()
+        self.path       = path
+        self.flags      = 0
+        self.file_size  = 0
+        self.resume     = 0
+        self.offsets    = []
+        self.recnums    = []
+        self.secs       = []
+        self.sub_secs   = []
+        self.rtypes     = []
+        self.time_sorted = True
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def clear(self):
+        self.flags      = 0
+        self.file_size  = 0
+        self.resume     = 0
+        self.offsets    = []
+        self.recnums    = []
+        self.secs       = []
+        self.sub_secs   = []
+        self.rtypes     = []
+        self.time_sorted = True
+
+    def load(self, file_size = None):
+        '''
+        load the sidecar.  If file_size is given and is smaller than
+        what was indexed, the dblk file isn't what we indexed and the
+        index is tossed.
+        '''
+        self.clear()
+        try:
+            with open(self.path, 'rb') as fd:
+                buf = fd.read()
+        except IOError:
+            return False
+        if len(buf) < idx_hdr_struct.size:
+            return False
+        majik, ver, flags, fsize, resume, count = \
+                idx_hdr_struct.unpack_from(buf, 0)
+        if majik != IDX_MAJIK or ver != IDX_VERSION:
+            eprint('*** index: {} not an index (v{})'.format(self.path, ver))
+            return False
+        if len(buf) < idx_hdr_struct.size + count * idx_entry_struct.size:
+            eprint('*** index: {} truncated'.format(self.path))
+            return False
+        if file_size is not None and file_size < fsize:
+            eprint('*** index: {} stale, file shrank'.format(self.path))
+            return False
+        self.flags     = flags
+        self.file_size = fsize
+        self.resume    = resume
+        pos = idx_hdr_struct.size
+        for i in xrange(count):
+            self.add(*idx_entry_struct.unpack_from(buf, pos))
+            pos += idx_entry_struct.size
+        return True
+
+    def add(self, offset, recnum, secs, sub_sec, rtype):
+        if self.secs and secs < self.secs[-1]:
+            self.time_sorted = False
+        self.offsets.append(offset)
+        self.recnums.append(recnum)
+        self.secs.append(secs)
+        self.sub_secs.append(sub_sec)
+        self.rtypes.append(rtype)
+
+    def update(self, tagmap, all_recs = False, start = 0):
+        '''
+        build or extend the index from tagmap (a TagMap).
+
+        picks up from the last resume point if the existing index is
+        still good and was built the same way (all_recs), otherwise
+        rebuilds from start.  Writes the sidecar.
+
+        returns the number of entries added.
+        '''
+        flags = IDX_ALL_RECS if all_recs else 0
+        if not self.load(len(tagmap)) or self.flags != flags:
+            self.clear()
+            self.flags  = flags
+            self.resume = start
+        first = len(self.offsets)
+        if self.file_size == len(tagmap) and first:
+            return 0                    # nothing new
+
+        mm = tagmap.mm
+        tagmap.seek(self.resume)
+        for offset, hdr, payload in tagmap.records():
+            rlen, rtype, recnum, sub_sec, sec, xmin, hr, dow, day, mon, year, \
+                recsum = dt_hdr_rt_struct.unpack_from(mm, offset)
+            if all_recs or rtype in sync_types or not self.offsets:
+                self.add(offset, recnum,
+                         rtc_secs(year, mon, day, hr, xmin, sec), sub_sec,
+                         rtype)
+            self.resume = tagmap.tell()
+        self.file_size = len(tagmap)
+        self.write(first)
+        return len(self.offsets) - first
+
+    def write(self, first = 0):
+        '''
+        write the sidecar.  Entries before first are already on disk,
+        only the header gets rewritten and the new entries appended.
+        '''
+        mode = 'r+b' if first and os.path.exists(self.path) else 'wb'
+        if mode == 'wb':
+            first = 0
+        with open(self.path, mode) as fd:
+            fd.write(idx_hdr_struct.pack(IDX_MAJIK, IDX_VERSION, self.flags,
+                        self.file_size, self.resume, len(self.offsets)))
+            fd.seek(idx_hdr_struct.size + first * idx_entry_struct.size)
+            out = bytearray()
+            for i in xrange(first, len(self.offsets)):
+                out += idx_entry_struct.pack(self.offsets[i], self.recnums[i],
+                        self.secs[i], self.sub_secs[i], self.rtypes[i])
+            fd.write(out)
+            fd.truncate()
+
+    def find_recnum(self, recnum):
+        '''offset of the last indexed record with recnum <= recnum'''
+        i = bisect_right(self.recnums, recnum) - 1
+        return self.offsets[i] if i >= 0 else None
+
+    def end_recnum(self, recnum):
+        '''offset of the first indexed record with recnum > recnum'''
+        i = bisect_right(self.recnums, recnum)
+        return self.offsets[i] if i < len(self.offsets) else None
+
+    def find_time(self, secs):
+        '''
+        offset of the last indexed record before secs.  rtctime can go
+        backward (reboots, time fixes) in which case the index isn't
+        sorted by time and we look for the first entry at or past secs
+        and back up one.
+        '''
+        if self.time_sorted:
+            i = bisect_left(self.secs, secs) - 1
+        else:
+            i = next((n for n, s in enumerate(self.secs) if s >= secs),
+                     len(self.secs)) - 1
+        return self.offsets[i] if i >= 0 else None
+
+    def end_time(self, secs):
+        '''offset of the first indexed record after secs, sorted only'''
+        if not self.time_sorted:
+            return None
+        i = bisect_right(self.secs, secs)
+        return self.offsets[i] if i < len(self.offsets) else None
+
+    def rtype_offsets(self, rtype):
+        return [ o for o, t in zip(self.offsets, self.rtypes) if t == rtype ]
@@ -0,0 +1,290 @@
+# Copyright (c) 2021 Eric B. Decker
+# All rights reserved.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# See COPYING in the top level directory of this source tree.
+#
+# Contact: Eric B. Decker <cire831@gmail.com>
+
+'''memory mapped, zero copy record scanner for local dblk files
+
+TagMap mmaps an entire local dblk file and walks the typed data records
+in place.  Records are handed back as views into the mapping, no per
+record buffers are built and no seek/read syscalls are issued.
+
+The scanner follows the same rules as tagdump.get_record and
+TagFile.resync:
+
+    - records start on a quad boundary, the next record starts at the
+      next quad boundary past the end of the current record.
+    - obviously bad headers, bad record sums, and required length
+      violations force a resync to the next SYNC record.
+    - a SYNC_FLUSH record forces a move to the next sector boundary.
+'''
+
+from   __future__         import print_function
+
+__version__ = '0.4.10.dev0'
+
+__all__ = [
+    'TagMap',
+    'rec_view',
+]
+
+import os
+import mmap
+import struct
+
+from   .dt_defs    import *
+import tagcore.dt_defs as dtd
+from   .misc_utils import eprint
+from   .recsum     import dt_hdr_struct, DT_HDR_SIZE
+from   .recsum     import RECSUM_WINDOW, hdr_chain, recsums
+from   .recsum     import REC_OK, REC_CHKSUM, rec_errors
+from   .recsum     import hdr_check, rec_check, req_len, next_rec
+
+# negative offset indicates a problem, same as tagfile
+EODATA                  = -14
+
+RESYNC_HDR_OFFSET       = 28            # how to move past the majik
+
+# dt_sync: hdr followed by prev_sync and majik.  majik lives at +24.
+SYNC_MAJIK_OFFSET       = DT_HDR_SIZE + 4
+SYNC_REC_SIZE           = SYNC_MAJIK_OFFSET + 4
+sync_majik_bytes        = struct.pack('<I', dt_sync_majik)
+sync_types              = (DT_SYNC, DT_SYNC_FLUSH, DT_SYNC_REBOOT)
+
+
+try:
+    # python 2, mmap doesn't do the new buffer interface.  buffer()
+    # gives us a zero copy window onto the mapping.
+    _buffer = buffer
+    def rec_view(obj, offset, size):
+        return _buffer(obj, offset, size)
+except NameError:
+    def rec_view(obj, offset, size):
+        return memoryview(obj)[offset:offset + size]
+
+
+class TagMap(object):
+    '''memory mapped dblk file
+
+    inputs:     input     file object or path of a local dblk file, or
+                          a bytearray/mmap already holding dblk data
+                verbose   verbosity level (see tagdump.py)
+                chksum_err
+                          optional callable, chksum_err(offset, view,
+                          recsum, chksum), called for any record failing
+                          its checksum.  Used for display.
+
+    methods:    records   generator, walks the records starting at the
+                          current position, yielding
+                            (offset, hdr_view, payload_view)
+                resync    find the next SYNC record
+                view      zero copy view of a piece of the file
+                tell/seek same as TagFile, used to position records()
+
+    counters:   num_resyncs, chksum_errors
+    '''
+
+    def __init__(self, input, verbose = 0, chksum_err = None):
+        super(TagMap, self).__init__()
+
+        self.verbose    = verbose
+        self.chksum_err = chksum_err
+        if isinstance(input, (bytearray, mmap.mmap)):
+            # caller's buffer, we don't own it (see close)
+            self.fd     = None
+            self.name   = '<buffer>'
+            self.size   = len(input)
+            self.mm     = input if self.size else None
+        else:
+            if isinstance(input, str):
+                input = open(input, 'rb')
+            self.fd     = input
+            self.name   = input.name
+            self.size   = os.fstat(input.fileno()).st_size
+            self.mm     = None
+            if self.size:
+                self.mm = mmap.mmap(input.fileno(), 0,
+                                    access = mmap.ACCESS_READ)
+        self.pos        = 0
+        self.sums       = {}            # offset -> chksum, current window
+        self.num_resyncs   = 0
+        self.chksum_errors = 0
+
+    def __len__(self):
+        return self.size
+
+    def close(self):
+        if self.mm and self.fd:
+            self.mm.close()
+        self.mm = None
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, pos, how = os.SEEK_SET):
+        if how == os.SEEK_END:
+            pos += self.size
+        elif how == os.SEEK_CUR:
+            pos += self.pos
+        self.pos = max(0, min(pos, self.size))
+        return self.pos
+
+    def view(self, offset, size):
+        return rec_view(self.mm, offset, size)
+
+    def chksum(self, offset):
+        '''
+        computed checksum of the record at offset.
+
+        checksums are done a window at a time (see recsum.py).  When we
+        land on a record outside of the current window (first time, after
+        a resync, etc.) the next window starting at offset is summed.
+        '''
+        chksum = self.sums.get(offset)
+        if chksum is None:
+            recs      = hdr_chain(self.mm, offset, self.size, RECSUM_WINDOW)
+            self.sums = dict(zip([ r[0] for r in recs ],
+                                 recsums(self.mm, recs)))
+            chksum    = self.sums.get(offset)
+        return chksum
+
+    def resync(self, offset):
+        '''resync to the next SYNC record, in memory
+
+        same contract as TagFile.resync.  returns the offset of the next
+        valid SYNC/SYNC_FLUSH/SYNC_REBOOT record or EODATA.
+
+        we look for the majik with find() and then check the rest of the
+        sync record at the candidate.  find() jumps any run of zeros
+        (unwritten gaps), only the end of the file stops us.
+        '''
+        self.num_resyncs += 1
+        if (self.verbose >= 2):
+            eprint()
+            eprint('*** resync started @{0} (0x{0:x})'.format(offset))
+        if (offset & 3 != 0):
+            resync0 = '*** resync: unaligned offset: {0} (0x{0:x}) -> {1} (0x{1:x})'
+            eprint(resync0.format(offset, (offset/4)*4))
+            offset = (offset / 4) * 4
+
+        mm   = self.mm
+        size = self.size
+        find = offset + SYNC_MAJIK_OFFSET
+        while mm and offset + SYNC_REC_SIZE <= size:
+            majik = mm.find(sync_majik_bytes, find)
+            if majik < 0:
+                break
+            cand = majik - SYNC_MAJIK_OFFSET
+            find = majik + 1
+            if cand & 3:
+                continue
+            rlen, rtype, recnum, recsum = dt_hdr_struct.unpack_from(mm, cand)
+            if rlen == SYNC_REC_SIZE and rtype in sync_types:
+                self.pos = cand
+                return cand
+            offset = cand + 4
+            if (self.verbose >= 5):
+                resync2 = '*** resync: failed record @{} (0x{:x}): ' + \
+                          'len: {}, type: {}, rec: {}'
+                eprint(resync2.format(cand, cand, rlen, rtype, recnum))
+        if (self.verbose >= 4):
+            eprint('*** resync: no sync record found @{}'.format(offset))
+        return EODATA
+
+    def records(self, skip = None):
+        '''walk records starting at the current position
+
+        yields (offset, hdr_view, payload_view) for each good record.
+        hdr_view covers the dt_hdr, payload_view the remaining rlen bytes
+        of the record.  The position (tell) is past the record (quad
+        aligned) when the record is yielded.  Callers may seek() between
+        records.
+
+        skip, optional skip(rtype, recnum).  True says the record isn't
+        wanted, only its header is sanity checked (no checksum) and it is
+        yielded with payload_view None.
+        '''
+        mm          = self.mm
+        size        = self.size
+        hdr_len     = DT_HDR_SIZE
+        last_offset = -1
+
+        align0 = '*** aligning offset {0} (0x{0:x}) -> {1} (0x{1:x}) [{2} bytes]'
+
+        while mm:
+            offset = self.pos
+            if (offset & 3):
+                new_offset = ((offset/4) + 1) * 4
+                eprint(align0.format(offset, new_offset, new_offset - offset))
+                offset = new_offset
+            if (offset == last_offset):
+                # resync landed us back on the same record, move past the
+                # majik and look for the next one.
+                offset += RESYNC_HDR_OFFSET
+                eprint('*** resyncing: moving past current majik to: @{0} (0x{0:x})'.format(
+                    offset))
+                if self.resync(offset) < 0:
+                    break
+                continue
+            last_offset = offset
+            if offset + hdr_len > size:
+                if offset < size:
+                    eprint('*** record header read too short: wanted {}, got {}, @{}'.format(
+                        hdr_len, size - offset, offset))
+                self.pos = size
+                break
+
+            rlen, rtype, recnum, recsum = dt_hdr_struct.unpack_from(mm, offset)
+            err = hdr_check(rlen, recnum)
+            if err != REC_OK:
+                eprint(rec_errors[err].format(rlen, offset))
+                if self.resync(offset) < 0:
+                    break
+                continue
+
+            if offset + rlen > size:
+                eprint('*** record read too short: wanted {} got {} @{}'.format(
+                    rlen, size - offset, offset))
+                self.pos = size
+                break
+
+            if skip and skip(rtype, recnum):
+                self.pos = (offset + rlen + 3) & ~3
+                yield (offset, rec_view(mm, offset, hdr_len), None)
+                continue
+
+            # chksum() comes out of the current window, see recsums
+            chksum = self.chksum(offset)
+            err    = rec_check(rtype, rlen, recsum, chksum)
+            if err == REC_CHKSUM:
+                self.chksum_errors += 1
+                chksum1 = '*** checksum failure @{0} (0x{0:x}) ' + \
+                          '[wanted: 0x{1:x} got: 0x{2:x}]'
+                eprint(chksum1.format(offset, recsum, chksum))
+                if self.chksum_err:
+                    self.chksum_err(offset, rec_view(mm, offset, rlen),
+                                    recsum, chksum)
+            elif err != REC_OK:
+                eprint(rec_errors[err].format(rlen, offset, req_len(rtype)))
+            if err != REC_OK:
+                if self.resync(offset) < 0:
+                    break
+                continue
+
+            self.pos = next_rec(offset, rlen, rtype)
+            yield (offset, rec_view(mm, offset, hdr_len),
+                   rec_view(mm, offset + hdr_len, rlen - hdr_len))
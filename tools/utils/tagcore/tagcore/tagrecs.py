@@ -0,0 +1,255 @@
+# Copyright (c) 2021 Eric B. Decker
+# All rights reserved.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# See COPYING in the top level directory of this source tree.
+#
+# Contact: Eric B. Decker <cire831@gmail.com>
+
+'''streaming record iteration for library users
+
+TagRecords walks a dblk data stream and yields one tag_rec per record,
+no printing, no globals.  Usage:
+
+    import tagcore.core_populate            # install decoders
+    from   tagcore.tagrecs import TagRecords
+
+    for rec in TagRecords('DBLK0001', rtypes = [ 'GPS_GEO' ]):
+        print(rec.recnum, rec.obj['lat'], rec.obj['lon'])
+
+The input can be a path, a file object, a TagFile, a TagMap, or a
+bytearray/mmap holding dblk data.  Local files are memory mapped and
+scanned in place (see tagmap.py).  A net_io/tail TagFile is read record
+by record.
+
+Filters:    rtypes      list of rtype numbers and/or names
+            rec_low     first recnum wanted (inclusive)
+            rec_high    last recnum wanted (inclusive), stops iteration
+            start       file offset to start at (default: just past the
+                        directory for files, 0 for buffers)
+            end         file offset, records starting past end stop
+                        iteration
+            filters     list of callables, filter(offset, hdr), the
+                        record is kept only if all of them return True.
+
+Each tag_rec holds:
+
+    offset, rtype, recnum, name
+    hdr         dt header, a flat record (independent of later records)
+    buf         bytearray, the entire record
+    obj         decoded record (None if decode = False).  For fixed
+                layout records this is a flat record and belongs to the
+                caller.  Otherwise the decoder's object from dt_records
+                is handed back, it gets reused by the next record of the
+                same type.
+
+Counters on the TagRecords object: total_records, total_bytes, dt_count,
+num_resyncs, chksum_errors.
+'''
+
+from   __future__         import print_function
+
+__version__ = '0.4.10.dev0'
+
+__all__ = [
+    'TagRecords',
+    'tag_rec',
+]
+
+import struct
+from   collections import namedtuple
+
+from   .dt_defs      import *
+import tagcore.dt_defs as dtd
+from   .core_headers import obj_dt_hdr
+from   .misc_utils   import eprint
+from   .tagfile      import TagFile
+from   .tagmap       import TagMap
+from   .recsum       import dt_hdr_struct, DT_HDR_SIZE
+from   .recsum       import REC_OK, REC_CHKSUM
+from   .recsum       import hdr_check, rec_chksum, rec_check, next_rec
+
+DBLK_DIR_SIZE           = 0x200
+RESYNC_HDR_OFFSET       = 28
+
+tag_rec = namedtuple('tag_rec', 'offset rtype recnum name hdr buf obj')
+
+dt_hdr_flat = obj_dt_hdr().flat
+
+
+class TagRecords(object):
+    '''iterator over the records of a dblk data stream
+
+    see the module doc for inputs.  decode = False skips the decoders,
+    obj is None, which is what you want if only the headers or the raw
+    records are interesting.
+    '''
+
+    def __init__(self, input, rtypes = None, rec_low = 0, rec_high = 0,
+                 start = None, end = None, filters = None, decode = True,
+                 verbose = 0):
+        self.rtypes   = None
+        if rtypes:
+            names = dict([ (v[DTR_NAME], k) for k, v in dtd.dt_records.items() ])
+            self.rtypes = set()
+            for r in rtypes:
+                if isinstance(r, str):
+                    name = r
+                    r = int(r) if r.isdigit() else names.get(r.upper())
+                    if r is None:
+                        raise ValueError('TagRecords: unknown rtype {}'.format(name))
+                self.rtypes.add(r)
+        self.rec_low  = rec_low
+        self.rec_high = rec_high
+        self.end      = end
+        self.filters  = filters or []
+        self.decode   = decode
+        self.verbose  = verbose
+
+        self.total_records = 0
+        self.total_bytes   = 0
+        self.dt_count      = {}
+        self.resyncs       = 0          # stream (TagFile) only
+        self.chksums       = 0
+
+        self.tfile = None               # stream input
+        self.tmap  = None               # mapped input
+        if isinstance(input, TagFile) and not input.net_io:
+            input = input.fd            # local, map it
+        if isinstance(input, TagFile):
+            self.tfile = input
+        elif isinstance(input, TagMap):
+            self.tmap  = input
+        else:
+            self.tmap  = TagMap(input, verbose = verbose)
+
+        if start is None:
+            start = 0 if self.tmap and self.tmap.fd is None else DBLK_DIR_SIZE
+        self.src = self.tmap or self.tfile
+        self.src.seek(start)
+
+    @property
+    def num_resyncs(self):
+        return self.resyncs + (self.tmap.num_resyncs if self.tmap else 0)
+
+    @property
+    def chksum_errors(self):
+        return self.chksums + (self.tmap.chksum_errors if self.tmap else 0)
+
+    def close(self):
+        if self.tmap:
+            self.tmap.close()
+
+    def __iter__(self):
+        return self.records()
+
+    def records(self):
+        if self.tmap:
+            raw = self.map_records()
+        else:
+            raw = self.stream_records()
+        for offset, buf in raw:
+            hdr    = dt_hdr_flat.unpack(buf)
+            rtype  = hdr.type
+            recnum = hdr.recnum
+            if self.end is not None and offset > self.end:
+                return
+            if self.rec_high and recnum > self.rec_high:
+                return
+            if self.rtypes is not None and rtype not in self.rtypes:
+                continue
+            if self.rec_low and recnum < self.rec_low:
+                continue
+            if not all([ f(offset, hdr) for f in self.filters ]):
+                continue
+
+            buf = bytearray(buf)
+            v   = dtd.dt_records.get(rtype, (0, None, None, None, 'dt/' + str(rtype)))
+            obj = None
+            if self.decode and v[DTR_DECODER] and v[DTR_OBJ] is not None:
+                obj = v[DTR_OBJ]
+                if len(v) > DTR_FLAT and v[DTR_FLAT] and \
+                        getattr(obj, 'flat', None):
+                    obj = obj.flat.unpack(buf)
+                else:
+                    try:
+                        v[DTR_DECODER](0, offset, buf, obj)
+                    except struct.error as e:
+                        eprint('*** decoder struct error: rtype {} {} @{}: {}'.format(
+                            rtype, v[DTR_NAME], offset, e))
+                        obj = None
+
+            self.total_records += 1
+            self.total_bytes   += len(buf)
+            self.dt_count[rtype] = self.dt_count.get(rtype, 0) + 1
+            yield tag_rec(offset, rtype, recnum, v[DTR_NAME], hdr, buf, obj)
+
+    def map_records(self):
+        tmap = self.tmap
+        for offset, hdr_view, payload_view in tmap.records():
+            rlen = len(hdr_view) + len(payload_view)
+            yield offset, tmap.view(offset, rlen)
+
+    def stream_records(self):
+        '''
+        records from a TagFile doing net io (or tailing).  Same rules as
+        tagdump.get_record, minus the displays.
+        '''
+        tf          = self.tfile
+        last_offset = -1
+        while True:
+            offset = tf.tell()
+            if (offset & 3):
+                offset = ((offset/4) + 1) * 4
+                tf.seek(offset)
+            if (offset == last_offset):
+                # resync put us back on the same sync, move past it
+                if self.resync(offset + RESYNC_HDR_OFFSET) < 0:
+                    return
+                continue
+            last_offset = offset
+            buf = bytearray(tf.read(DT_HDR_SIZE))
+            if len(buf) < DT_HDR_SIZE:
+                return
+            rlen, rtype, recnum, recsum = dt_hdr_struct.unpack_from(buf)
+            if hdr_check(rlen, recnum) != REC_OK:
+                if self.resync(offset) < 0:
+                    return
+                continue
+
+            # read out to the next quad alignment, see get_record
+            dlen = ((offset + rlen + 3) & ~3) - offset - DT_HDR_SIZE
+            if dlen > 0:
+                buf.extend(bytearray(tf.read(dlen)))
+            if len(buf) < rlen:
+                return
+
+            err = rec_check(rtype, rlen, recsum,
+                            rec_chksum(buf, 0, rlen, recsum))
+            if err != REC_OK:
+                if err == REC_CHKSUM:
+                    self.chksums += 1
+                    if self.verbose:
+                        eprint('*** checksum failure @{0} (0x{0:x})'.format(offset))
+                if self.resync(offset) < 0:
+                    return
+                continue
+
+            if rtype == DT_SYNC_FLUSH:
+                tf.seek(next_rec(offset, rlen, rtype))
+            yield offset, buf[:rlen]
+
+    def resync(self, offset):
+        self.resyncs += 1
+        return self.tfile.resync(offset)
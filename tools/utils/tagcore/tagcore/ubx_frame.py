@@ -0,0 +1,463 @@
+# Copyright (c) 2021 Eric B. Decker
+# All rights reserved.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# See COPYING in the top level directory of this source tree.
+#
+# Contact: Eric B. Decker <cire831@gmail.com>
+
+'''block oriented ubxbin framing
+
+Rather than hunting a byte at a time and checksumming each packet as it
+is read, a block of the input is framed in one pass:
+
+o   SOP candidates are found with buf.find (b5 62), each candidate's
+    length is taken from its header and the next search starts just
+    past the candidate.  This gives a chain of packets.
+o   the fletcher checksums of the whole chain are computed in one go and
+    compared with what the packets carry.
+o   a packet with a bad checksum is hunted through, starting one byte
+    past its SOP, up to the next packet in the chain.
+
+If numpy is available the checksums come from two cumulative sums over
+a uint8 view of the block (see ubx_chksums).  Otherwise each packet is
+summed on its own, still without a python loop per byte.
+
+    ubx_scan        chain SOP candidates, no checksums
+    ubx_chksums     computed checksums for a list of candidates
+    frame_block     ubx_scan + ubx_chksums, returns packets and errors
+    ubx_packets     generator, (offset, cid, payload view) for each
+                    good packet in a buffer
+    GpsFramer       incremental ubx/nmea framer.  Bytes are pushed in
+                    chunks of any size, partial messages are carried
+                    over to the next push.  Used for ubx streams
+                    (ubxdump) and the contents of DT_GPS_RAW records.
+'''
+
+from   __future__         import print_function
+
+__version__ = '0.4.10.dev0'
+
+__all__ = [
+    'UBX_FRAME_BLOCK',
+    'GpsFramer',
+    'gps_msg',
+    'ubx_err',
+    'ubx_chk',
+    'ubx_scan',
+    'ubx_chksums',
+    'frame_block',
+    'ubx_packets',
+]
+
+import struct
+from   operator    import mul, xor
+from   collections import namedtuple
+
+from   .ubx_defs   import *
+
+# numpy is optional, only used to speed things up.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+UBX_FRAME_BLOCK         = 1024 * 1024
+UBX_SOP                 = b'\xb5\x62'
+UBX_NP_MIN              = 16            # fewer candidates, skip numpy
+
+NMEA_SOP                = b'$'
+NMEA_MAX                = 256           # longest sentence we'll wait for
+
+# class/id is big endian, len little endian.  chka/chkb taken as one
+# big endian short, (ck_a << 8) | ck_b.
+ubx_cid_struct          = struct.Struct('>H')
+ubx_len_struct          = struct.Struct('<H')
+ubx_chk_struct          = struct.Struct('>H')
+
+# kind: 'len'       want: UBX_MAX_PAYLOAD, got: len from the header
+#       'chksum'    want: checksum carried, got: checksum computed
+#       'short'     want: bytes needed, got: bytes left (input ends
+#                   part way through a packet)
+#       'nmea'      want: checksum carried, got: checksum computed
+#                   (None if the sentence is garbled rather than
+#                   failing its checksum)
+# msg:  copy of the offending packet (chksum), what's left (short) or
+#       line (nmea), else None
+ubx_err = namedtuple('ubx_err', 'offset kind want got msg')
+
+# a framed message.  kind 'ubx' or 'nmea', cid None for nmea.
+# msg is a bytearray of the entire message, ubx from the SOP through
+# the checksum, nmea from the $ up to the line ending (not included).
+gps_msg = namedtuple('gps_msg', 'offset kind cid msg')
+
+
+# struct objects used to pull bytes out in place, keyed by length.
+chk_structs = {}
+
+def ubx_chk(buf, offset, n):
+    '''fletcher checksum of n bytes of buf at offset, (ck_a << 8) | ck_b'''
+    s = chk_structs.get(n)
+    if s is None:
+        s = struct.Struct('{}B'.format(n))
+        chk_structs[n] = s
+    data = s.unpack_from(buf, offset)
+    # ck_b is the sum of the running ck_a's, ie. byte i counts n - i times.
+    ck_a = sum(data) & 0xff
+    ck_b = sum(map(mul, data, xrange(n, 0, -1))) & 0xff
+    return ck_a << 8 | ck_b
+
+
+def ubx_scan(buf, offset, end, stop = None):
+    '''
+    chain SOP candidates from offset.
+
+    input:  buf         bytearray, mmap, str, anything with find and
+                        struct can unpack from
+            offset      where to start looking
+            end         end of valid data in buf
+            stop        only look for SOPs in front of stop (default end)
+
+    output: (cands, errs, next)
+            cands       list of (offset, cid, plen, chksum), chksum is
+                        what the packet carries
+            errs        ubx_err for each SOP with a bad length
+            next        where framing should pick up.  The start of a
+                        packet that runs past end, or where an SOP could
+                        still start.  With a stop, stop itself or the
+                        end of a packet that ran past stop.
+    '''
+    cands = []
+    errs  = []
+    if stop is None:
+        stop = end
+    while True:
+        if offset >= stop:
+            return cands, errs, offset
+        sop = buf.find(UBX_SOP, offset, min(stop + 1, end))
+        if sop < 0:
+            if stop < end:
+                return cands, errs, stop
+            # a trailing b5 might be the first half of an SOP
+            if buf[end-1:end] == UBX_SOP[:1]:
+                return cands, errs, end - 1
+            return cands, errs, end
+        if sop + UBX_HDR_SIZE > end:
+            return cands, errs, sop
+        cid  = ubx_cid_struct.unpack_from(buf, sop + UBX_CLASS_OFFSET)[0]
+        plen = ubx_len_struct.unpack_from(buf, sop + UBX_LEN_OFFSET)[0]
+        if plen > UBX_MAX_PAYLOAD:
+            errs.append(ubx_err(sop, 'len', UBX_MAX_PAYLOAD, plen, None))
+            offset = sop + 1
+            continue
+        pend = sop + UBX_HDR_SIZE + plen
+        if pend + UBX_CHK_SIZE > end:
+            return cands, errs, sop
+        cands.append((sop, cid, plen, ubx_chk_struct.unpack_from(buf, pend)[0]))
+        offset = pend + UBX_CHK_SIZE
+
+
+def ubx_chksums(buf, cands):
+    '''
+    compute the fletcher checksum of each candidate, (offset, cid, plen,
+    ...).  The checksum covers class, id, len and the payload.
+
+    returns a list of (ck_a << 8) | ck_b, comparable to what ubx_scan
+    hands back as the packet's chksum.
+    '''
+    if not cands:
+        return []
+    if np is None or len(cands) < UBX_NP_MIN:
+        return [ ubx_chk(buf, off + UBX_CLASS_OFFSET,
+                         UBX_HDR_SIZE - UBX_CLASS_OFFSET + plen)
+                 for off, cid, plen, chksum in cands ]
+
+    lo  = cands[0][0] + UBX_CLASS_OFFSET
+    hi  = cands[-1][0] + UBX_HDR_SIZE + cands[-1][2]
+    win = np.frombuffer(buf, dtype = np.uint8, count = hi - lo, offset = lo)
+
+    # c1[n] is the sum of the first n bytes, c2[n] the sum of c1[1..n].
+    # over a packet [s, e):
+    #   ck_a = c1[e] - c1[s]
+    #   ck_b = sum of the running ck_a = c2[e] - c2[s] - (e - s) * c1[s]
+    # everything wraps at 32 bits, only the bottom 8 matter.
+    c1  = np.zeros(len(win) + 1, dtype = np.uint32)
+    np.cumsum(win, dtype = np.uint32, out = c1[1:])
+    c2  = np.zeros(len(win) + 1, dtype = np.uint32)
+    np.cumsum(c1[1:], dtype = np.uint32, out = c2[1:])
+
+    c      = np.array([ (off, plen) for off, cid, plen, chksum in cands ],
+                      dtype = np.int64)
+    starts = c[:, 0] + UBX_CLASS_OFFSET - lo
+    ends   = c[:, 0] + UBX_HDR_SIZE + c[:, 1] - lo
+    span   = (ends - starts).astype(np.uint32)
+    ck_a   = (c1[ends] - c1[starts]) & 0xff
+    ck_b   = (c2[ends] - c2[starts] - span * c1[starts]) & 0xff
+    return (ck_a << 8 | ck_b).tolist()
+
+
+def frame_block(buf, offset, end, stop = None):
+    '''
+    frame the packets in buf[offset:end] (stop, see ubx_scan).
+
+    returns (pkts, errs, next)
+        pkts        list of (offset, cid, plen) for each good packet
+        errs        list of ubx_err, bad lengths and checksums, in order
+        next        where the next block should start, see ubx_scan
+
+    A packet with a bad checksum is hunted through on its own, from one
+    byte past its SOP up to where the chain picks up again.  Normally
+    nothing is found and the rest of the chain stands.  If the hunt
+    turns up a packet running past that point the chain behind it is
+    suspect and is framed again.
+    '''
+    pkts = []
+    errs = []
+    cands, bad, nxt = ubx_scan(buf, offset, end, stop)
+    sums = ubx_chksums(buf, cands)
+    n = 0
+    while n < len(cands):
+        off, cid, plen, chksum = cands[n]
+        if sums[n] == chksum:
+            pkts.append((off, cid, plen))
+            n += 1
+            continue
+        errs.append(ubx_err(off, 'chksum', chksum, sums[n],
+            bytearray(buf[off:off + UBX_HDR_SIZE + plen + UBX_CHK_SIZE])))
+        resume = cands[n + 1][0] if n + 1 < len(cands) else nxt
+        p, e, x = frame_block(buf, off + 1, end, resume)
+        pkts.extend(p)
+        errs.extend(e)
+        if x != resume:
+            bad = [ b for b in bad if b.offset < off ]
+            p, e, nxt = frame_block(buf, x, end, stop)
+            pkts.extend(p)
+            errs.extend(e)
+            break
+        # the hunt covered anything bad between the two
+        bad = [ b for b in bad if not off < b.offset < resume ]
+        n += 1
+    errs.extend(bad)
+    errs.sort()
+    return pkts, errs, nxt
+
+
+def ubx_packets(buf, offset = 0, end = None, err = None,
+                block = UBX_FRAME_BLOCK):
+    '''
+    generator, frames buf[offset:end] a block at a time.
+
+    yields (offset, cid, payload) for each good packet, payload is a
+    zero copy view of the packet's payload (no checksum, see rec_view).
+    err, if given, is called with each ubx_err in stream order (before
+    the packet that follows it is yielded).
+
+    Framing stops at end or with a packet that runs past end.
+    '''
+    # not at the top, core_headers -> ubx_frame -> tagmap -> dt_defs
+    # would loop back to core_headers.
+    from   .tagmap     import rec_view
+
+    if end is None:
+        end = len(buf)
+    nxt = offset
+    while offset < end:
+        blk_end = min(offset + block, end)
+        pkts, errs, nxt = frame_block(buf, offset, blk_end)
+        e = 0
+        for off, cid, plen in pkts:
+            while err and e < len(errs) and errs[e].offset < off:
+                err(errs[e])
+                e += 1
+            yield off, cid, rec_view(buf, off + UBX_HDR_SIZE, plen)
+        if err:
+            for x in errs[e:]:
+                err(x)
+        if blk_end == end or nxt <= offset:
+            break
+        offset = nxt
+    if err and nxt < end:
+        want = UBX_HDR_SIZE
+        if end - nxt >= UBX_HDR_SIZE:
+            want += ubx_len_struct.unpack_from(buf, nxt + UBX_LEN_OFFSET)[0] \
+                + UBX_CHK_SIZE
+        err(ubx_err(nxt, 'short', want, end - nxt, bytearray(buf[nxt:end])))
+
+
+def nmea_frame(buf, offset, end, final):
+    '''
+    frame the nmea sentence starting at offset ($).
+
+    returns (next, ok)
+        next        just past the sentence's line ending, None if the
+                    sentence isn't complete yet.
+        ok          True, sentence is good.  False, the $ doesn't start
+                    a sentence (no address field), just junk.  Otherwise
+                    a ubx_err.
+
+    A sentence starts with a 5 character address (GPGGA, PUBX,), is
+    printable ascii, ends with \\n (or \\r\\n), and if it carries a *hh
+    checksum the checksum must match.  final says no more bytes are
+    coming, the end of the buffer (or a nul) ends the line.
+    '''
+    addr = buf[offset + 1:min(end, offset + 6)]
+    if len(addr) < 5 and not final:
+        return None, None
+    if len(addr) < 5 or not bytearray(addr).replace(b',', b'0').isalnum():
+        return offset + 1, False
+    limit = min(end, offset + NMEA_MAX)
+    eol   = buf.find(b'\n', offset, limit)
+    if eol < 0:
+        if not final and limit == end:
+            return None, None
+        nxt = eol = limit
+        nul = buf.find(b'\x00', offset, limit)
+        if nul >= 0:
+            eol = nul
+    else:
+        nxt = eol + 1
+    line = bytearray(buf[offset:eol]).rstrip(b'\r')
+    if len(line) < 2 or max(line) > 0x7e or min(line) < 0x20:
+        return offset + 1, ubx_err(offset, 'nmea', None, None, line)
+    star = line.rfind(b'*')
+    if star >= 0:
+        try:
+            want = int(str(line[star + 1:]), 16)
+        except ValueError:
+            return offset + 1, ubx_err(offset, 'nmea', None, None, line)
+        got = reduce(xor, line[1:star], 0)
+        if want != got:
+            return offset + 1, ubx_err(offset, 'nmea', want, got, line)
+    return nxt, True
+
+
+class GpsFramer(object):
+    '''incremental ubx/nmea framer
+
+    inputs:     err         optional callable, err(ubx_err), called for
+                            each problem in stream order.
+                nmea        False, only frame ubx (nmea sentences are
+                            skipped like any other junk).
+
+    methods:    push        hand the framer the next chunk of the stream,
+                            generator, yields a gps_msg for each message
+                            completed.  Any size chunk, partial messages
+                            are held until the rest shows up.
+                close       end of stream, reports a partial message
+                            still being held and returns a list of any
+                            gps_msg found behind it.  The framer can be
+                            reused.
+                frame       frame a complete buffer, ie. the contents of
+                            a DT_GPS_RAW record.  Returns a list of
+                            gps_msg, offsets are relative to buf.
+                            Doesn't touch the stream state.
+
+    counters:   ubx_msgs, nmea_msgs, errors (dict, kind -> count)
+
+    offsets in the stream are counted from the first byte pushed (see
+    base).
+    '''
+
+    def __init__(self, err = None, nmea = True, base = 0):
+        super(GpsFramer, self).__init__()
+        self.err       = err
+        self.nmea      = nmea
+        self.buf       = bytearray()
+        self.base      = base           # stream offset of buf[0]
+        self.ubx_msgs  = 0
+        self.nmea_msgs = 0
+        self.errors    = {}
+
+    def push(self, data):
+        self.buf += data
+        items, nxt = self.scan(self.buf, 0, len(self.buf), self.base, False)
+        del self.buf[:nxt]
+        self.base += nxt
+        return self.deliver(items)
+
+    def close(self):
+        msgs = []
+        if self.buf:
+            items, nxt = self.scan(self.buf, 0, len(self.buf), self.base, True)
+            msgs = list(self.deliver(items))
+        self.base += len(self.buf)
+        self.buf   = bytearray()
+        return msgs
+
+    def frame(self, buf, offset = 0, end = None):
+        if end is None:
+            end = len(buf)
+        items, nxt = self.scan(buf, offset, end, 0, True)
+        return list(self.deliver(items))
+
+    def deliver(self, items):
+        for x in items:
+            if isinstance(x, ubx_err):
+                self.errors[x.kind] = self.errors.get(x.kind, 0) + 1
+                if self.err:
+                    self.err(x)
+                continue
+            if x.kind == 'ubx':
+                self.ubx_msgs  += 1
+            else:
+                self.nmea_msgs += 1
+            yield x
+
+    def scan(self, buf, offset, end, base, final):
+        '''
+        frame buf[offset:end].  returns (items, next), items are gps_msgs
+        and ubx_errs in stream order (offsets + base), next is where the
+        first incomplete message starts.  final, nothing more is coming,
+        a partial ubx packet is reported short and skipped.
+        '''
+        items = []
+        while offset < end:
+            dollar = buf.find(NMEA_SOP, offset, end) if self.nmea else -1
+            if dollar >= 0 and buf.find(UBX_SOP, offset, dollar) < 0:
+                nxt, ok = nmea_frame(buf, dollar, end, final)
+                if nxt is None:
+                    offset = dollar
+                    break
+                if ok is True:
+                    items.append(gps_msg(base + dollar, 'nmea', None,
+                                         bytearray(buf[dollar:nxt]).rstrip(b'\r\n\x00')))
+                elif ok is not False:
+                    items.append(ok._replace(offset = base + ok.offset))
+                offset = nxt
+                continue
+
+            # ubx up to the next $.  A packet may run over it, the $ was
+            # part of the packet.
+            stop = dollar if dollar >= 0 else None
+            pkts, errs, nxt = frame_block(buf, offset, end, stop)
+            run = [ gps_msg(base + off, 'ubx', cid,
+                            bytearray(buf[off:off + UBX_HDR_SIZE + plen + UBX_CHK_SIZE]))
+                    for off, cid, plen in pkts ]
+            run.extend([ e._replace(offset = base + e.offset) for e in errs ])
+            run.sort(key = lambda x: x.offset)
+            items.extend(run)
+            if nxt < (end if stop is None else stop):
+                # partial packet (or a trailing b5)
+                if not final:
+                    offset = nxt
+                    break
+                want = UBX_HDR_SIZE
+                if end - nxt >= UBX_HDR_SIZE:
+                    want += ubx_len_struct.unpack_from(buf, nxt + UBX_LEN_OFFSET)[0] \
+                        + UBX_CHK_SIZE
+                items.append(ubx_err(base + nxt, 'short', want, end - nxt,
+                                      bytearray(buf[nxt:end])))
+                nxt += 1
+            offset = nxt
+        return items, offset
@@ -63,6 +63,7 @@ setup(
         'ctl_main': [
             'can    = tagctl.tagctl:Can',
             'cmd    = tagctl.tagctl:Cmd',
+            'monitor = tagctl.monitor:Monitor',
             'note   = tagctl.tagctl:Note',
             'send   = tagctl.tagctl:Send',
             'show   = tagctl.tagctl:Show',
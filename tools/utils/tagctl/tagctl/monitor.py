@@ -0,0 +1,590 @@
+# Copyright (c) 2021 Eric B. Decker
+# All rights reserved.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# See COPYING in the top level directory of this source tree.
+#
+# Contact: Eric B. Decker <cire831@gmail.com>
+
+'''follow the dblk streams of many tags at once
+
+tagctl monitor [options] [node ...]
+
+Follows <root>/<node_id>/tag/sd/0/dblk/byte for each node (default: all
+of the [nodes] section of tagctl_cfg), decodes the records as they show
+up, and sends the results to the sinks:
+
+    display     the normal tagdump text (or --mr, machine readable), one
+                file per node (--out DIR, <DIR>/<name>.txt or .mr), else
+                stdout with each line tagged with the node name.
+    influx      --export, each record is written to influxdb (see
+                tagcore.json_emitters), tagged with node = <name>.
+
+Every --stats secs a line per node is logged and, with --metrics FILE,
+written as json (FILE is replaced each time):
+
+    records, bytes      since the monitor started
+    rec_rate, byte_rate over the last stats interval
+    lag                 wall clock - rtctime of the last record (secs),
+                        how far behind the tag we are
+    behind              bytes in the file we haven't read yet
+    resyncs, chksum_errors
+    online              node's dblk file exists and is open
+
+One thread, one loop.  Each pass reads whatever each node has (reads
+that come back with ENODATA, the tag hasn't any more yet, are taken as
+no data) then, if nothing showed up anywhere, waits: select on inotify
+fds for local files (--local), otherwise a backoff sleep (POLL_MIN ..
+POLL_MAX).  Nodes that aren't there yet are looked for every OPEN_RETRY
+secs.
+
+By default each node starts at the current end of its stream and hunts
+for the next SYNC record, --start reads each stream from the beginning.
+
+Testing: --root pointing at a directory of <node_id>/tag/sd/0/dblk/byte
+files that something appends to, with --local (plain files, no
+O_DIRECT, inotify wakeups).
+'''
+
+from   __future__         import print_function
+
+__all__ = [
+    'Monitor',
+    'TagMonitor',
+    'NodeStream',
+    'dblk_framer',
+]
+
+import os
+import sys
+import time
+import json
+import errno
+import struct
+import select
+import logging
+import importlib
+
+import tagcore.globals    as     g
+import tagcore.dt_defs    as     dtd
+from   tagcore.dt_defs    import *
+from   tagcore.core_headers import obj_dt_hdr
+from   tagcore.recsum     import dt_hdr_struct, DT_HDR_SIZE
+from   tagcore.recsum     import REC_OK, REC_CHKSUM
+from   tagcore.recsum     import hdr_check, rec_chksum, rec_check, next_rec
+from   tagcore.tagmap     import SYNC_MAJIK_OFFSET, SYNC_REC_SIZE
+from   tagcore.tagmap     import sync_majik_bytes, sync_types
+from   tagcore.misc_utils import rtc_secs
+from   tagcore.outsink    import OutSink
+from   tagcore.growwait   import inotify_watch, POLL_MIN, POLL_MAX
+
+from   ctl_config           import *
+import ctl_config           as     cfg
+
+from   cliff.command        import Command
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+DBLK_DIR_SIZE           = 0x200
+READ_SIZE               = 64 * 1024
+STATS_SECS              = 10
+OPEN_RETRY              = 5.0           # secs, looking for missing nodes
+
+dt_hdr_flat = obj_dt_hdr().flat
+
+
+def rec_secs(rt):
+    '''record rtctime (flat) as secs since the epoch, 0 if not set'''
+    secs = rtc_secs(rt.year, rt.mon, rt.day, rt.hr, rt.min, rt.sec)
+    return secs + rt.sub_sec / 32768. if secs else 0
+
+
+class dblk_framer(object):
+    '''
+    cut a growing dblk byte stream into records.
+
+    push() the bytes as they are read, it returns [(offset, record)]
+    for every complete record, the tail of a record is kept until the
+    rest shows up.  The checks are tagcore.recsum's, the same ones
+    tagdump.get_record uses (header, checksum, required length, quad
+    alignment, SYNC_FLUSH skips to the next sector).  A bad record
+    drops us into hunting for the next SYNC, as does starting in the
+    middle of a stream (synced False).
+    '''
+
+    def __init__(self, offset, synced = True):
+        super(dblk_framer, self).__init__()
+        self.buf     = bytearray()
+        self.base    = offset           # stream offset of buf[0]
+        self.skip    = 0                # bytes to toss (SYNC_FLUSH)
+        self.synced  = synced
+        self.resyncs = 0
+        self.chksum_errors = 0
+
+    def lost(self):
+        if self.synced:
+            self.resyncs += 1
+        self.synced = False
+
+    def find_sync(self, pos):
+        '''
+        position of the next SYNC record at or past pos, None if there
+        isn't one yet.  Second value is where to keep the buffer from.
+        '''
+        buf = self.buf
+        while True:
+            m = buf.find(sync_majik_bytes, pos + SYNC_MAJIK_OFFSET)
+            if m < 0:
+                return None, max(pos, (len(buf) - SYNC_REC_SIZE) & ~3)
+            cand = m - SYNC_MAJIK_OFFSET
+            if cand & 3:
+                pos = (cand + 3) & ~3
+                continue
+            if cand + SYNC_REC_SIZE > len(buf):
+                return None, cand
+            rlen, rtype, recnum, recsum = dt_hdr_struct.unpack_from(buf, cand)
+            if rlen == SYNC_REC_SIZE and rtype in sync_types:
+                return cand, cand
+            pos = cand + 4
+
+    def push(self, data):
+        if self.skip:
+            n = min(self.skip, len(data))
+            self.skip -= n
+            self.base += n
+            data = data[n:]
+        self.buf.extend(data)
+        return self.records()
+
+    def records(self):
+        buf  = self.buf
+        recs = []
+        pos  = 0                        # base and pos stay quad aligned
+        while True:
+            if not self.synced:
+                cand, keep = self.find_sync(pos)
+                if cand is None:
+                    pos = keep
+                    break
+                pos = cand
+                self.synced = True
+            if len(buf) - pos < DT_HDR_SIZE:
+                break
+            rlen, rtype, recnum, recsum = dt_hdr_struct.unpack_from(buf, pos)
+            if hdr_check(rlen, recnum) != REC_OK:
+                self.lost()
+                pos += 4
+                continue
+            if len(buf) - pos < rlen:
+                break                   # rest of it isn't here yet
+            err = rec_check(rtype, rlen, recsum,
+                            rec_chksum(buf, pos, rlen, recsum))
+            if err != REC_OK:
+                if err == REC_CHKSUM:
+                    self.chksum_errors += 1
+                self.lost()
+                pos += 4
+                continue
+            offset = self.base + pos
+            recs.append((offset, buf[pos:pos + rlen]))
+            pos = next_rec(offset, rlen, rtype) - self.base
+
+        if pos > len(buf):
+            self.skip = pos - len(buf)
+            pos = len(buf)
+        del buf[:pos]
+        self.base += pos
+        return recs
+
+
+class line_prefix(object):
+    '''file-like, tags each line written with prefix'''
+
+    def __init__(self, prefix, out = None):
+        super(line_prefix, self).__init__()
+        self.prefix = prefix
+        self.out    = out or sys.stdout
+        self.bol    = True
+
+    def write(self, data):
+        for line in data.splitlines(True):
+            if self.bol:
+                self.out.write(self.prefix)
+            self.out.write(line)
+            self.bol = line.endswith('\n')
+
+    def flush(self):
+        self.out.flush()
+
+    def isatty(self):
+        return self.out.isatty()
+
+
+class NodeStream(object):
+    '''
+    one node's dblk stream being followed.
+
+    inputs:     name        what we call it (tagctl_cfg [nodes] name)
+                node_id     directory under root
+                path        the node's dblk byte file
+                out         OutSink the display goes to
+                from_start  read the stream from the beginning, else
+                            from the end
+                local       plain file (no O_DIRECT), inotify wakeups
+    '''
+
+    log = logging.getLogger(__name__ + '.node')
+
+    def __init__(self, name, node_id, path, out, from_start = False,
+                 local = False):
+        super(NodeStream, self).__init__()
+        self.name       = name
+        self.node_id    = node_id
+        self.path       = path
+        self.out        = out
+        self.from_start = from_start
+        self.local      = local
+
+        self.fd         = None
+        self.ifd        = None          # inotify, local only
+        self.framer     = None
+        self.offset     = 0             # next byte to read
+        self.next_open  = 0
+
+        self.records    = 0
+        self.bytes      = 0
+        self.last_rt    = 0             # rtctime of the last record, secs
+        self.mark       = (time.time(), 0, 0)   # stats interval start
+
+    def open(self, now):
+        if now < self.next_open:
+            return False
+        self.next_open = now + OPEN_RETRY
+        flags = os.O_RDONLY if self.local else os.O_RDONLY | os.O_DIRECT
+        try:
+            self.fd = os.open(self.path, flags)
+        except OSError:
+            return False
+        size   = self.size()
+        framer = self.framer
+        if framer and size >= framer.base + framer.skip:
+            # back after a read error.  Pick up with the first byte the
+            # framer hasn't made a record out of, nothing it has already
+            # handed out is seen (displayed, sent to influx) again.
+            start  = framer.base + framer.skip
+            synced = framer.synced
+        elif self.from_start or size <= DBLK_DIR_SIZE or framer:
+            start  = DBLK_DIR_SIZE      # framer, the stream started over
+            synced = True
+        else:
+            start  = size & ~3
+            synced = start == DBLK_DIR_SIZE
+        os.lseek(self.fd, start, os.SEEK_SET)
+        self.offset = start
+        self.framer = dblk_framer(start, synced = synced)
+        if framer:
+            self.framer.resyncs       = framer.resyncs
+            self.framer.chksum_errors = framer.chksum_errors
+        if self.local:
+            self.ifd = inotify_watch(self.path)
+        self.log.info('{}: following {} @{}'.format(self.name, self.path, start))
+        return True
+
+    def close(self):
+        if self.ifd is not None:
+            os.close(self.ifd)
+            self.ifd = None
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def size(self):
+        try:
+            return os.fstat(self.fd).st_size
+        except (OSError, TypeError):
+            return 0
+
+    def read(self):
+        '''
+        read what's there, returns [(offset, record)], None if nothing
+        was read.  ENODATA is the tag saying it hasn't any more yet.
+        '''
+        if self.fd is None and not self.open(time.time()):
+            return None
+        recs = []
+        got  = False
+        while True:
+            try:
+                data = os.read(self.fd, READ_SIZE)
+            except OSError as e:
+                if e.errno in (errno.ENODATA, errno.EAGAIN):
+                    break
+                self.log.error('{}: read @{}: {}'.format(self.name, self.offset, e))
+                self.close()
+                break
+            if not data:
+                break
+            got = True
+            self.offset += len(data)
+            recs.extend(self.framer.push(data))
+            if len(data) < READ_SIZE:
+                break
+        return recs if got else None
+
+    def stats(self, now):
+        t0, recs0, bytes0 = self.mark
+        dt = (now - t0) or 1
+        self.mark = (now, self.records, self.bytes)
+        online = self.fd is not None
+        return {
+            'node_id':       self.node_id,
+            'online':        online,
+            'offset':        self.offset,
+            'behind':        max(self.size() - self.offset, 0) if online else 0,
+            'records':       self.records,
+            'bytes':         self.bytes,
+            'rec_rate':      round((self.records - recs0) / dt, 2),
+            'byte_rate':     round((self.bytes - bytes0) / dt, 1),
+            'lag':           round(now - self.last_rt, 3) if self.last_rt else None,
+            'resyncs':       self.framer.resyncs if self.framer else 0,
+            'chksum_errors': self.framer.chksum_errors if self.framer else 0,
+        }
+
+
+class influx_sink(object):
+    '''records to influxdb through tagcore.json_emitters, node tagged'''
+
+    def __init__(self):
+        super(influx_sink, self).__init__()
+        import tagcore.json_emitters as je
+        self.je = je
+
+    @property
+    def up(self):
+        return self.je.influx_out is not None
+
+    def emit(self, node, rtype, obj):
+        je  = self.je
+        hdr = obj['hdr']
+        tags = je.build_tags(obj)
+        tags['node'] = node.name
+        je.influx_out.add(je.influx_record(dtd.dt_records[rtype][DTR_NAME],
+                                           je.rtctime_us(hdr['rt']),
+                                           je.flatten_dict(obj, ''), tags))
+
+    def close(self):
+        self.je.influx_close()
+
+
+class TagMonitor(object):
+    '''
+    follow a set of NodeStreams, see the module doc.
+
+    inputs:     nodes       list of NodeStreams
+                stats_secs  how often to report
+                metrics     file the json metrics are written to
+                influx      influx_sink or None
+                display     False, decode only for influx
+    '''
+
+    log = logging.getLogger(__name__ + '.mon')
+
+    def __init__(self, nodes, stats_secs = STATS_SECS, metrics = None,
+                 influx = None, display = True):
+        super(TagMonitor, self).__init__()
+        self.nodes      = nodes
+        self.stats_secs = stats_secs
+        self.metrics    = metrics
+        self.influx     = influx
+        self.display    = display
+
+    def emit(self, node, offset, rec):
+        hdr = dt_hdr_flat.unpack(rec)
+        node.records += 1
+        node.bytes   += len(rec)
+        node.last_rt  = rec_secs(hdr.rt) or node.last_rt
+        v = dtd.dt_records.get(hdr.type, (0, None, None, None, ''))
+        decoder  = v[DTR_DECODER]
+        emitters = v[DTR_EMITTERS] if self.display else None
+        obj      = v[DTR_OBJ]
+        if not decoder:
+            return
+        stdout = sys.stdout
+        sys.stdout = node.out
+        try:
+            decoder(g.verbose, offset, rec, obj)
+            for e in emitters or []:
+                e(g.verbose, offset, rec, obj)
+            if g.verbose >= 1 and self.display:
+                print()
+        except Exception as e:
+            # one bad record (or emitter) doesn't take the monitor down
+            self.log.warning('{}: decode error, rtype {} {} @{}: {}'.format(
+                node.name, hdr.type, v[DTR_NAME], offset, e))
+            return
+        finally:
+            sys.stdout = stdout
+        node.out.check()
+        if self.influx and obj is not None and 'hdr' in obj:
+            self.influx.emit(node, hdr.type, obj)
+
+    def report(self, now):
+        stats = {}
+        for node in self.nodes:
+            s = node.stats(now)
+            stats[node.name] = s
+            lag = '{:.1f}'.format(s['lag']) if s['lag'] is not None else '-'
+            self.log.info('{:8} {:>8} recs {:8.1f}/s {:10.1f} B/s  lag {:>8}  '
+                          'behind {:8}{}'.format(
+                              node.name, s['records'], s['rec_rate'],
+                              s['byte_rate'], lag, s['behind'],
+                              '' if s['online'] else '  (offline)'))
+        if self.metrics:
+            tmp = self.metrics + '.tmp'
+            with open(tmp, 'w') as fd:
+                json.dump({ 'time': now, 'nodes': stats }, fd,
+                          indent = 2, sort_keys = True)
+            os.rename(tmp, self.metrics)
+
+    def wait(self, timeout):
+        ifds = [ n.ifd for n in self.nodes if n.ifd is not None ]
+        if len(ifds) < len(self.nodes):
+            time.sleep(timeout)         # someone has to poll
+            return
+        r, w, x = select.select(ifds, [], [], timeout)
+        for fd in r:
+            try:
+                while os.read(fd, 4096):
+                    pass
+            except OSError as e:
+                if e.errno != errno.EAGAIN:
+                    raise
+
+    def run(self, duration = None):
+        start      = time.time()
+        next_stats = start + self.stats_secs
+        delay      = POLL_MIN
+        while True:
+            busy = False
+            for node in self.nodes:
+                recs = node.read()
+                if recs is None:
+                    continue
+                busy = True
+                for offset, rec in recs:
+                    self.emit(node, offset, rec)
+                node.out.flush()
+            now = time.time()
+            if now >= next_stats:
+                self.report(now)
+                next_stats = now + self.stats_secs
+            if duration and now - start >= duration:
+                break
+            if busy:
+                delay = POLL_MIN
+                continue
+            self.wait(min(delay, max(next_stats - now, 0)))
+            delay = min(delay * 2, POLL_MAX)
+
+    def close(self):
+        self.report(time.time())
+        for node in self.nodes:
+            node.out.close()
+            node.close()
+        if self.influx:
+            self.influx.close()
+
+
+class Monitor(Command):
+    '''follow the dblk streams of many nodes, see tagctl.monitor'''
+
+    log = logging.getLogger(__name__ + '.monitor')
+
+    def get_parser(self, prog_name):
+        parser = super(Monitor, self).get_parser(prog_name)
+        parser.add_argument('nodes', nargs = '*',
+            help = 'node names or ids, default all of [nodes]')
+        parser.add_argument('--out', metavar = 'DIR',
+            help = 'one display file per node in DIR, default stdout')
+        parser.add_argument('--mr', action = 'store_true',
+            help = 'machine readable display')
+        parser.add_argument('--export', action = 'store_true',
+            help = 'write the records to influxdb')
+        parser.add_argument('--nodisplay', action = 'store_true',
+            help = 'no display output (export and metrics only)')
+        parser.add_argument('--stats', type = float, default = STATS_SECS,
+            metavar = 'SECS',
+            help = 'metrics interval, default {}'.format(STATS_SECS))
+        parser.add_argument('--metrics', metavar = 'FILE',
+            help = 'write the metrics (json) to FILE')
+        parser.add_argument('--start', action = 'store_true',
+            help = 'read the streams from the beginning, not the end')
+        parser.add_argument('--local', action = 'store_true',
+            help = 'root is a plain directory (testing), not tagfuse')
+        parser.add_argument('--duration', type = float, metavar = 'SECS',
+            help = 'stop after SECS')
+        return parser
+
+    def take_action(self, parsed_args):
+        args = parsed_args
+        self.log.debug('args: {}'.format(args))
+        if not cfg.root_str:
+            raise TagCtlNoRootError('root not set')
+        known = (cfg.config or {}).get('nodes', {})
+        names = args.nodes or list(known.keys())
+        if not names:
+            print('*** monitor: no nodes, name some or configure [nodes]')
+            return
+
+        g.mr_emitters = args.mr
+        importlib.import_module('tagcore.mr_populate' if args.mr
+                                else 'tagcore.core_populate')
+        importlib.import_module('tagcore.sensor_populate')
+        importlib.import_module('tagcore.ubx_populate')
+        dtd.cfg_print_hourly = False    # interleaved nodes, no banners
+
+        influx = None
+        if args.export:
+            influx = influx_sink()
+            if not influx.up:
+                self.log.warning('influxdb not available, no export')
+                influx = None
+
+        if args.out and not os.path.isdir(args.out):
+            os.makedirs(args.out)
+        ext   = '.mr' if args.mr else '.txt'
+        nodes = []
+        for name in names:
+            node_id = known.get(name, name)
+            path    = os.path.join(cfg.root_str, node_id, DBLK_BYTE)
+            if args.out:
+                out = OutSink(os.path.join(args.out, name + ext))
+            else:
+                out = OutSink(line_prefix('{:8} '.format(name)))
+            if not args.mr and not args.nodisplay:
+                print(dtd.rec_title_str, file = out)
+            nodes.append(NodeStream(name, node_id, path, out,
+                                    from_start = args.start,
+                                    local = args.local))
+
+        mon = TagMonitor(nodes, stats_secs = args.stats,
+                         metrics = args.metrics, influx = influx,
+                         display = not args.nodisplay)
+        try:
+            mon.run(args.duration)
+        except KeyboardInterrupt:
+            print()
+            print('*** user stop')
+        finally:
+            mon.close()
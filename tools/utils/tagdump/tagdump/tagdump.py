@@ -37,14 +37,23 @@ usage: tagdump.py [-h] [-v] [-V] [-H] [-j JUMP] [-e EndFilePos]
                   [-x | --export]
                   [-s START_TIME] [-e END_TIME]
                   [-r START_REC]  [-l LAST_REC]
+                  [--index | --index_all]
                   [-g GPS_EVAL]
                   [-p | --pretty]
+                  [--mmap] [--jobs N]
+                  [--columnar DIR]
                   input
 '''
 
 from   __future__         import print_function
 
+import os
+import sys
 import struct
+import shutil
+import tempfile
+import multiprocessing
+from   collections         import deque
 
 # parse arguments and import result
 from   tagdumpargs         import args
@@ -56,7 +65,14 @@ from   tagcore.dt_defs     import *
 import tagcore.dt_defs     as     dtd
 import tagcore.ubx_defs    as     ubx
 from   tagcore.tagfile     import *
+from   tagcore.tagmap      import TagMap
+from   tagcore.recsum      import REC_OK, REC_CHKSUM, REC_REQ_LEN, rec_errors
+from   tagcore.recsum      import hdr_check, rec_chksum, rec_check, req_len
+from   tagcore.tagindex    import TagIndex, index_path
+from   tagcore.outsink     import OutSink
+from   tagcore.dblkz       import DblkZFile, is_dblkz
 from   tagcore.misc_utils  import eprint
+from   tagcore.misc_utils  import rtc2secs
 from   tagcore.mr_emitters import mr_chksum_err
 
 import tagdump_config                   # populate configuration
@@ -83,10 +99,14 @@ rec_last                = 0            # last rec num looked at
 
 # 1st sector of the first is the directory
 DBLK_DIR_SIZE           = 0x200
-RLEN_MAX_SIZE           = 2048
 RESYNC_HDR_OFFSET       = 28            # how to get back to the start
                                         # or how to move past the majik
 
+# --jobs, chunks per worker and smallest chunk worth handing out
+JOBS_CHUNKS             = 4
+JOBS_MIN_CHUNK          = 256 * 1024
+OUT_COPY_SIZE           = 64 * 1024     # chunk output copied this much at a time
+
 # global stat counters
 num_resyncs             = 0             # how often we've resync'd
 chksum_errors           = 0             # checksum errors seen
@@ -95,6 +115,9 @@ total_records           = 0
 total_bytes             = 0
 dt_hdr                  = obj_dt_hdr()
 
+# display output, sys.stdout points at this while dumping
+out_sink                = None
+
 
 def init_globals():
     global rec_low, rec_high, rec_last
@@ -123,7 +146,50 @@ def resync(fd, offset):
     return fd.resync(offset)
 
 
-def get_record(fd):
+def chksum_fail(offset, rec_buf, recsum, chksum):
+    '''
+    display a record that failed its checksum.
+    '''
+    if g.mr_emitters:
+        mr_chksum_err(offset, recsum, chksum)
+    else:
+        rec_buf = bytearray(rec_buf)
+        if not dump_hdr(offset, rec_buf, '*** ') or g.verbose >= 3:
+            print()
+            dump_buf(rec_buf, '    ')
+
+
+def header_skip():
+    """
+    build the fast skip filter (--fast).  Records the --rtypes and -r
+    filters in dump_records are going to toss only need their header,
+    the rest of the record doesn't get read and its checksum isn't
+    checked.
+
+    returns skip(rtype, recnum), True if the record isn't wanted, or
+    None if everything has to be read (the default, no filters, or net
+    io or --tail where we can't just seek past data that may not be
+    there yet).
+    """
+    if not args.fast or args.net or args.tail or not (args.rtypes or rec_low):
+        return None
+
+    wanted = {}                         # rtype -> bool
+    def skip(rtype, recnum):
+        if rec_low and recnum < rec_low:
+            return True
+        if not args.rtypes:
+            return False
+        want = wanted.get(rtype)
+        if want is None:
+            # same test dump_records uses
+            want = wanted[rtype] = ((str(rtype)   in args.rtypes) or
+                                    (dt_name(rtype) in args.rtypes))
+        return not want
+    return skip
+
+
+def get_record(fd, skip = None):
     """
     Generate valid typed-data records one at a time until no more bytes
     can be read from the input file.
@@ -132,6 +198,10 @@ def get_record(fd):
         dt_hdr_obj: (len, type, recnum, rtctime, recsum)
 
     Input:   fd:         file descriptor we are reading from
+             skip:       optional, skip(rtype, recnum) (see header_skip).
+                         True, only the header is used, the record is
+                         returned with rec_buf None and fd is left past
+                         the record.
     Output:  rec_offset: byte offset of the record from start of file
              hdr         obj_dt_hdr (see above)
              rec_buf:    bytearray with entire record
@@ -192,37 +262,21 @@ def get_record(fd):
         recsum = hdr['recsum'].val
 
         # check for obvious errors
-        if (rlen < hdr_len):
-            eprint('*** record size too small: {} @{}'.format(rlen, offset))
-            offset = resync(fd, offset)
-            if (offset < 0):
-                break
-            continue
-
-        if (rlen > RLEN_MAX_SIZE):
-            eprint('*** record size too large: {} @{}'.format(rlen, offset))
-            offset = resync(fd, offset)
-            if (offset < 0):
-                break
-            continue
-
-        if (recnum == 0):               # zero is never allowed
-            eprint('*** zero record number @{} - resyncing'.format(offset))
+        err = hdr_check(rlen, recnum)
+        if err != REC_OK:
+            eprint(rec_errors[err].format(rlen, offset))
             offset = resync(fd, offset)
             if (offset < 0):
                 break
             continue
 
-        # now see if we have any data payload
-        # if dlen is negative, that says we are below min header size
+        # hdr_check says rlen covers at least the header
         dlen = rlen - hdr_len
-        if (dlen < 0):                  # major oops, rlen is screwy
-            eprint('*** record header too short: wanted {} got {} @{}'.format(
-                hdr_len, rlen, offset))
-            offset = resync(fd, offset)
-            if (offset < 0):
-                break
-            continue
+
+        if skip and skip(rtype, recnum):
+            # header looks sane, that's all we check for unwanted records.
+            fd.seek((offset + rlen + 3) & ~3)
+            return offset, hdr, None
 
         # make sure to read bytes to the next quad alignment.  This helps
         # to keep the tagfuse sparse file implementation happier.
@@ -242,46 +296,31 @@ def get_record(fd):
                 rlen, len(rec_buf), offset))
             break                       # oops, bail
 
-        # verify checksum.
-        #
-        # sum the entire record (byte by byte) and then remove the bytes from recsum.
-        # recsum was computed with the field being 0 and then layed down
-        # so we need to remove it before comparing.  Recsum is 16 bits wide so can not
-        # simply be added in as part of the checksum computation.
-        #
-        chksum = sum(rec_buf[:rlen])
-        chksum -= (recsum & 0xff00) >> 8
-        chksum -= (recsum & 0x00ff)
-        chksum &= 0xffff                # force to 16 bits vs. 16 bit recsum
-        if (chksum != recsum):
+        # verify checksum and required length.  recsum was computed with
+        # the field being 0 and then layed down, rec_chksum removes it.
+        chksum = rec_chksum(rec_buf, 0, rlen, recsum)
+        err    = rec_check(rtype, rlen, recsum, chksum)
+        if (err == REC_CHKSUM):
             chksum_errors += 1
             chksum1 = '*** checksum failure @{0} (0x{0:x}) ' + \
                       '[wanted: 0x{1:x} got: 0x{2:x}]'
             eprint(chksum1.format(offset, recsum, chksum))
-            if g.mr_emitters:
-                mr_chksum_err(offset, recsum, chksum)
-            else:
-                if not dump_hdr(offset, rec_buf, '*** ') or g.verbose >= 3:
-                    print()
-                    dump_buf(rec_buf, '    ')
+            chksum_fail(offset, rec_buf, recsum, chksum)
             offset = resync(fd, offset)
             if (offset < 0):
                 break
             continue                    # try again
 
-        v = dtd.dt_records.get(rtype, (0, None, None, None, ''))
-        required_len = v[DTR_REQ_LEN]
-        if (required_len):
-            if (required_len != rlen):
-                print('*** len violation, required: {} got {}'.format(
-                    required_len, rlen))
-                dump_hdr(offset, rec_buf, '*** ')
-                print()
-                dump_buf(rec_buf, '    ')
-                offset = resync(fd, offset)
-                if (offset < 0):
-                    break
-                continue            # try again
+        if (err == REC_REQ_LEN):
+            print('*** len violation, required: {} got {}'.format(
+                req_len(rtype), rlen))
+            dump_hdr(offset, rec_buf, '*** ')
+            print()
+            dump_buf(rec_buf, '    ')
+            offset = resync(fd, offset)
+            if (offset < 0):
+                break
+            continue                    # try again
 
         # life is good.  return actual record.
         return offset, hdr, rec_buf
@@ -290,10 +329,452 @@ def get_record(fd):
     return -1, hdr, ''
 
 
+def get_record_mm(records):
+    """
+    get the next record from a TagMap records() generator.
+
+    same outputs as get_record, but rec_buf is returned as None.  The
+    record is still sitting in the mapping and is only copied out
+    (see TagMap.view) when it is actually going to be decoded.
+    """
+    hdr = dt_hdr
+    try:
+        offset, hdr_view, payload_view = next(records)
+    except StopIteration:
+        return -1, hdr, ''
+    hdr.set(hdr_view)
+    return offset, hdr, None
+
+
 def process_dir(fd):
     fd.seek(DBLK_DIR_SIZE)
 
 
+def build_index():
+    '''
+    build or extend the sidecar index for the input file (--index).
+    '''
+    tmap  = TagMap(args.input, verbose = g.verbose)
+    idx   = TagIndex(index_path(args.input.name))
+    added = idx.update(tmap, all_recs = args.index_all,
+                       start = DBLK_DIR_SIZE)
+    eprint('*** index: {}  entries: {} (+{})  indexed to: @{} (0x{:x})'.format(
+        idx.path, len(idx), added, idx.resume, idx.resume))
+    tmap.close()
+
+
+def use_index(infile):
+    '''
+    if the input has a sidecar index, use it to seek close to the first
+    record wanted (-r, --start) and to bound the end (-l, --end).
+
+    returns True if the index was used.
+    '''
+    if args.dblkz:
+        return False                    # index offsets are raw file offsets
+    idx = TagIndex(index_path(args.input.name))
+    if not idx.load(os.path.getsize(args.input.name)):
+        return False
+
+    starts = []
+    if rec_low:
+        starts.append(idx.find_recnum(rec_low))
+    if args.start:
+        starts.append(idx.find_time(args.start))
+    starts = [ s for s in starts if s is not None ]
+    if starts and max(starts) > infile.tell():
+        infile.seek(max(starts))
+
+    if not args.endpos:
+        ends = []
+        if rec_high:
+            ends.append(idx.end_recnum(rec_high))
+        if args.end:
+            ends.append(idx.end_time(args.end))
+        ends = [ e for e in ends if e is not None ]
+        if ends:
+            args.endpos = min(ends)
+
+    if g.debug:
+        eprint('*** index: {} entries, start @{}, endpos: {}'.format(
+            len(idx), infile.tell(), args.endpos))
+    return True
+
+
+def count_dt(rtype):
+    """
+    increment counter in dict of rtypes, create new entry if needed
+    also check for existence of dtd.dt_records entry.  If not known
+    count it as unknown.
+    """
+    global unk_rtypes
+
+    try:
+        dtd.dt_records[rtype]
+    except KeyError:
+        unk_rtypes += 1
+
+    try:
+        dtd.dt_count[rtype] += 1
+    except KeyError:
+        dtd.dt_count[rtype] = 1
+
+
+def dump_records(infile, end = None):
+    """
+    main record loop.  pull records from infile starting at its current
+    position, apply the filters, decode, and emit.
+
+    end:    stop with the first record at or beyond this offset.  Used
+            by --jobs, each worker owns [start, end) of the file.
+
+    returns (first, done)
+        first   (recnum, offset) of the first record seen, offset is -1
+                if nothing was seen.
+        done    True if we stopped on a -l, --end, -e, or -n bound, or
+                the input gave out (get_record -1, no more sync),
+                nothing past this point is wanted.
+    """
+
+    global rec_last, total_records, total_bytes
+
+    first    = (0, -1)
+    done     = False
+    skip     = header_skip()
+    records  = infile.records(skip) if args.mmap else None
+
+    # extract record from input file and output decoded results
+    while(True):
+        if out_sink:
+            out_sink.check()
+        if records:
+            rec_offset, hdr, rec_buf = get_record_mm(records)
+        else:
+            rec_offset, hdr, rec_buf = get_record(infile, skip)
+
+        if (rec_offset < 0):
+            done = True
+            break
+        if (end is not None and rec_offset >= end):
+            break                       # next chunk owns this one
+
+        # hdr was populated (.set) by get_record
+        rlen     = hdr['len'].val
+        rtype    = hdr['type'].val
+        recnum   = hdr['recnum'].val
+
+        if (first[1] < 0):
+            first = (recnum, rec_offset)
+        if (recnum < rec_last):
+            eprint('*** recnum went backwards.  last: {}, new: {}, @{}'.format(
+                rec_last, recnum, rec_offset))
+        if (rec_last and recnum > rec_last + 1):
+            eprint('*** record gap: ({}) records @{}'.format(
+                recnum - rec_last, rec_offset))
+        rec_last = recnum
+
+        # apply any filters (inclusion)
+        if (args.rtypes):
+            # either the number rtype must be in the search list
+            # or the name of the rtype must be in the search list
+            if ((str(rtype)       not in args.rtypes) and
+                  (dt_name(rtype) not in args.rtypes)):
+                continue                   # not an rtype of interest
+
+        # look to see if record number bounds
+        if (rec_low and recnum < rec_low):
+            continue
+        if (rec_high and recnum > rec_high):
+            done = True
+            break                       # all done
+
+        # and time bounds, secs since the epoch
+        if (args.start or args.end):
+            secs = rtc2secs(hdr['rt'])
+            if (args.start and secs < args.start):
+                continue
+            if (args.end and secs > args.end):
+                done = True
+                break                   # all done
+
+        # look to see if past file position bound
+        if (args.endpos and rec_offset > args.endpos):
+            done = True
+            break                       # all done
+
+        if rec_buf is None:
+            rec_buf = bytearray(infile.view(rec_offset, rlen))
+
+        count_dt(rtype)
+        v = dtd.dt_records.get(rtype, (0, None, None, None, ''))
+        decoder  = v[DTR_DECODER]           # dt function
+        emitters = v[DTR_EMITTERS]          # emitter list
+        obj      = v[DTR_OBJ]               # dt object
+        if (decoder):                       # BRK
+            try:
+                decoder(g.verbose, rec_offset, rec_buf, obj)
+                if emitters and len(emitters):
+                    for e in emitters:
+                        e(g.verbose, rec_offset, rec_buf, obj)
+            except struct.error as e:
+                eprint('*** decoder/emitter struct/obj error: (len: {}, '
+                      'rtype: {} {}, wanted: {}), @{}'.format(
+                          rlen, rtype, dt_name(rtype),
+                          len(obj) if obj else 0, rec_offset))
+                eprint('*** {}'.format(e[0]))
+        else:
+            if g.debug or not g.quiet or g.verbose >= 5:
+                eprint('*** no decoder installed for rtype {}, @{}'.format(
+                    rtype, rec_offset))
+        if (g.verbose >= 3):
+            print()
+            dump_hdr(rec_offset, rec_buf, '    ')
+            dump_buf(rec_buf, '    ')
+        if g.verbose >= 1 and not g.quiet and not g.mr_emitters \
+                          and not g.columnar:
+            print()
+        total_records += 1
+        total_bytes   += rlen
+        if (args.num and total_records >= args.num):
+            done = True
+            break
+        #
+        # if we have a SYNC_FLUSH then advance to the next sector
+        # boundary.  System_Flush and we should have a reboot record
+        # in the next sector.
+        #
+        if rtype == DT_SYNC_FLUSH:
+            new_offset = rec_offset + 512
+            new_offset &= 0xfffffe00
+            eprint()
+            eprint('*** SYNC_FLUSH: @{} advancing to next '
+                   'sector @{}'.format(rec_offset, new_offset))
+            eprint()
+            infile.seek(new_offset)
+    return first, done
+
+
+def open_input(input):
+    '''
+    create file object that handles both buffered and direct io
+    or map the whole file if asked to.
+    '''
+    if args.mmap:
+        return TagMap(input, verbose = g.verbose, chksum_err = chksum_fail)
+    if args.dblkz:
+        input = DblkZFile(input)
+    return TagFile(input, net_io = args.net, tail = args.tail,
+                   verbose = g.verbose, timeout = args.timeout)
+
+
+def dump_chunk(chunk):
+    """
+    --jobs worker, runs in a worker process.  Dump the records of one
+    chunk, [start, end), of the input file.
+
+    stdout and stderr go to files in tmp_dir, their names are handed
+    back along with the counters so the parent can stream the chunks
+    out in file order and fold the counts together (see merge_chunk).
+    """
+
+    global rec_low, rec_high
+    global num_resyncs, chksum_errors
+    global out_sink
+
+    start, end, tmp_dir = chunk
+    init_globals()
+    dtd.dt_count.clear()
+    ubx.cid_count.clear()
+    dtd.last_rt.update(year = 0, mon = 0, day = 0, hr = 0)
+    if (args.start_rec):
+        rec_low  = args.start_rec
+    if (args.last_rec):
+        rec_high = args.last_rec
+
+    out_name = os.path.join(tmp_dir, '{}.out'.format(start))
+    err_name = os.path.join(tmp_dir, '{}.err'.format(start))
+    out_sink = OutSink(out_name)
+    err      = open(err_name, 'w')
+    sys.stdout, sys.stderr = out_sink, err
+    try:
+        infile = open_input(open(args.input.name, 'rb'))
+        infile.seek(start)
+        first, done = dump_records(infile, end)
+        offset = infile.tell()
+        if args.mmap:
+            num_resyncs   += infile.num_resyncs
+            chksum_errors += infile.chksum_errors
+            infile.close()
+    finally:
+        sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+        out_sink.close()
+        out_sink = None
+        err.close()
+
+    return {
+        'out':           out_name,
+        'err':           err_name,
+        'first':         first,
+        'done':          done,
+        'offset':        offset,
+        'rec_last':      rec_last,
+        'num_resyncs':   num_resyncs,
+        'chksum_errors': chksum_errors,
+        'unk_rtypes':    unk_rtypes,
+        'total_records': total_records,
+        'total_bytes':   total_bytes,
+        'dt_count':      dict(dtd.dt_count),
+        'cid_count':     dict(ubx.cid_count),
+        'last_rt':       dict(dtd.last_rt),
+    }
+
+
+def copy_out(name, dest, skip_line = None):
+    '''
+    stream the file name to dest a block at a time and remove it.  If
+    its first line is skip_line, that line is dropped.
+    '''
+    with open(name) as fd:
+        if skip_line is not None:
+            line = fd.readline()
+            if not line.startswith(skip_line):
+                dest.write(line)
+        while True:
+            data = fd.read(OUT_COPY_SIZE)
+            if not data:
+                break
+            dest.write(data)
+            if dest is out_sink:
+                out_sink.check()
+    os.remove(name)
+
+
+def merge_chunk(res):
+    '''
+    emit a chunk's captured output and fold its counts into ours.  Chunks
+    must be merged in file order.
+
+    a worker doesn't know what record preceded its chunk, the recnum
+    gap/backwards checks across chunk boundaries are done here.  Same
+    for the hourly banner, a worker always starts with one, which gets
+    dropped if we are still in the same hour.
+    '''
+
+    global rec_last
+    global num_resyncs, chksum_errors, unk_rtypes
+    global total_records, total_bytes
+
+    recnum, offset = res['first']
+    if (offset >= 0):
+        if (recnum < rec_last):
+            eprint('*** recnum went backwards.  last: {}, new: {}, @{}'.format(
+                rec_last, recnum, offset))
+        if (rec_last and recnum > rec_last + 1):
+            eprint('*** record gap: ({}) records @{}'.format(
+                recnum - rec_last, offset))
+        rec_last = res['rec_last']
+
+    lrt  = dtd.last_rt
+    hour = None
+    if lrt['year']:
+        hour = '---                      0.000000 {:4d}{:02d}{:02d} T {:02d}:00'.format(
+            lrt['year'], lrt['mon'], lrt['day'], lrt['hr'])
+    if res['last_rt']['year']:
+        lrt.update(res['last_rt'])
+
+    copy_out(res['out'], sys.stdout, hour)
+    sys.stdout.flush()
+    copy_out(res['err'], sys.stderr)
+    sys.stderr.flush()
+
+    num_resyncs   += res['num_resyncs']
+    chksum_errors += res['chksum_errors']
+    unk_rtypes    += res['unk_rtypes']
+    total_records += res['total_records']
+    total_bytes   += res['total_bytes']
+    for counts, new in ((dtd.dt_count,  res['dt_count']),
+                        (ubx.cid_count, res['cid_count'])):
+        for k, v in new.items():
+            counts[k] = counts.get(k, 0) + v
+
+
+def chunk_ranges(start, end, jobs):
+    '''
+    split [start, end) of the input into chunks for --jobs.
+
+    chunk boundaries are snapped forward to the next SYNC record with the
+    normal resync, so every chunk starts on a record a sequential scan
+    would also land on.
+
+    returns a list of (start, end).  The last chunk's end is None, it
+    runs to EOF (or --endpos).
+    '''
+    infile  = TagFile(open(args.input.name, 'rb'), verbose = g.verbose)
+    span    = end - start
+    nchunks = min(jobs * JOBS_CHUNKS, max(1, span / JOBS_MIN_CHUNK))
+    bounds  = [ start ]
+    for i in range(1, nchunks):
+        offset = infile.resync((start + (span * i) / nchunks) & ~3)
+        if (offset < 0 or offset >= end):
+            break
+        if (offset > bounds[-1]):
+            bounds.append(offset)
+    return list(zip(bounds, bounds[1:] + [ None ]))
+
+
+def dump_parallel(infile):
+    '''
+    --jobs N.  split the rest of the input into SYNC delimited chunks and
+    dump them using N worker processes.  Output is emitted in file order.
+
+    only N chunks are out at a time, the next one is handed out as one
+    gets merged.  Once a chunk says it's done (an end bound or the end of
+    the data) nothing more is handed out and what is still running is
+    tossed.  returns the offset processing stopped at.
+    '''
+    start  = infile.tell()
+    end    = os.path.getsize(args.input.name)
+    if (args.endpos and args.endpos < end):
+        end = args.endpos + 1
+    tmp_dir = tempfile.mkdtemp(prefix = 'tagdump.')
+    chunks  = [ (c_start, c_end, tmp_dir) for c_start, c_end in
+                chunk_ranges(start, end, args.jobs) ]
+    if g.debug:
+        eprint('*** jobs: {}  chunks: {}  @{} - @{}'.format(
+            args.jobs, len(chunks), start, end))
+
+    offset  = start
+    pool    = multiprocessing.Pool(args.jobs)
+    pending = deque()
+    todo    = iter(chunks)
+    try:
+        for chunk in todo:
+            pending.append(pool.apply_async(dump_chunk, (chunk,)))
+            if len(pending) >= args.jobs:
+                break
+        while pending:
+            res = pending.popleft().get()
+            merge_chunk(res)
+            offset = res['offset']
+            if res['done']:
+                break
+            for chunk in todo:
+                pending.append(pool.apply_async(dump_chunk, (chunk,)))
+                break
+        if pending:
+            pool.terminate()            # done early, rest not wanted
+        else:
+            pool.close()
+        pool.join()
+    except BaseException:
+        pool.terminate()
+        pool.join()
+        raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors = True)
+    return offset
+
+
 def dump():
     """
     Reads records and prints out details
@@ -312,6 +793,7 @@ def dump():
     global rec_low, rec_high, rec_last
     global num_resyncs, chksum_errors, unk_rtypes
     global total_records, total_bytes
+    global out_sink
 
     init_globals()
 
@@ -328,27 +810,11 @@ def dump():
             vers.snsd_ver, vers.snse_ver, vers.snsh_ver))
         eprint()
 
-    def count_dt(rtype):
-        """
-        increment counter in dict of rtypes, create new entry if needed
-        also check for existence of dtd.dt_records entry.  If not known
-        count it as unknown.
-        """
-        global unk_rtypes
-
-        try:
-            dtd.dt_records[rtype]
-        except KeyError:
-            unk_rtypes += 1
-
-        try:
-            dtd.dt_count[rtype] += 1
-        except KeyError:
-            dtd.dt_count[rtype] = 1
-
     # Any -s argument (walk syncs backward) or -r -1 (last_rec) forces net io
     if (args.sync is not None or args.start_rec == -1 or args.tail):
         args.net = True
+    if (args.follow and not args.net):
+        args.tail = True                # local tail, see TagFile
 
     if g.debug:
         tail_str = ' (tailing)'  if args.tail else ''
@@ -373,9 +839,32 @@ def dump():
         eprint()
 
 
-    # create file object that handles both buffered and direct io
-    infile  = TagFile(args.input, net_io = args.net, tail = args.tail,
-                      verbose = g.verbose, timeout = args.timeout)
+    if args.index or args.index_all:
+        if args.net or is_dblkz(args.input):
+            eprint('*** --index only works with local uncompressed files')
+            return
+        build_index()
+        return
+
+    if args.mmap and (args.net or args.tail):
+        eprint('*** --mmap only works with local files, no --net/--tail/--follow/-s')
+        return
+
+    # compressed input (see tagcore/dblkz.py) is read through a DblkZFile,
+    # seeks work but there is no file to map or hand to workers.
+    args.dblkz = not args.net and is_dblkz(args.input)
+    if args.dblkz and (args.mmap or args.jobs > 1 or args.tail):
+        eprint('*** compressed (dblkz) input, --mmap/--jobs/--follow ignored')
+        args.mmap = False
+        args.jobs = 0
+        args.tail = False
+
+    if args.jobs > 1 and (args.net or args.tail or args.num or args.columnar):
+        eprint('*** --jobs only works with local files and without -n '
+               'or --columnar, ignored')
+        args.jobs = 0
+
+    infile = open_input(args.input)
 
     if (args.start_rec):
         rec_low  = args.start_rec
@@ -392,103 +881,49 @@ def dump():
             infile.seek(args.jump, how = TF_SEEK_END)
         else:
             infile.seek(args.jump)
-
-    no_header = args.quiet or args.mr_emitters
-    if not no_header:
-        print(dtd.rec_title_str)
-
-    # extract record from input file and output decoded results
+    elif not args.net and (rec_low or rec_high or args.start or args.end):
+        use_index(infile)
+
+    # emitters print, sys.stdout is the sink while dumping.  Someone is
+    # watching net/tail output or a terminal, don't sit on it.  Diagnostics
+    # (eprint) then come out in order with the records they are about.
+    stdout     = sys.stdout
+    to_tty     = args.output in (None, '-') and stdout.isatty()
+    out_sink   = OutSink(args.output, live = args.net or args.tail or to_tty)
+    sys.stdout = out_sink
+
+    end_offset = None
     try:
-        while(True):
-            rec_offset, hdr, rec_buf = get_record(infile)
-
-            if (rec_offset < 0):
-                break
-
-            # hdr was populated (.set) by get_record
-            rlen     = hdr['len'].val
-            rtype    = hdr['type'].val
-            recnum   = hdr['recnum'].val
-
-            if (recnum < rec_last):
-                eprint('*** recnum went backwards.  last: {}, new: {}, @{}'.format(
-                    rec_last, recnum, rec_offset))
-            if (rec_last and recnum > rec_last + 1):
-                eprint('*** record gap: ({}) records @{}'.format(
-                    recnum - rec_last, rec_offset))
-            rec_last = recnum
-
-            # apply any filters (inclusion)
-            if (args.rtypes):
-                # either the number rtype must be in the search list
-                # or the name of the rtype must be in the search list
-                if ((str(rtype)       not in args.rtypes) and
-                      (dt_name(rtype) not in args.rtypes)):
-                    continue                   # not an rtype of interest
-
-            # look to see if record number bounds
-            if (rec_low and recnum < rec_low):
-                continue
-            if (rec_high and recnum > rec_high):
-                break                       # all done
-
-            # look to see if past file position bound
-            if (args.endpos and rec_offset > args.endpos):
-                break                       # all done
-
-            count_dt(rtype)
-            v = dtd.dt_records.get(rtype, (0, None, None, None, ''))
-            decoder  = v[DTR_DECODER]           # dt function
-            emitters = v[DTR_EMITTERS]          # emitter list
-            obj      = v[DTR_OBJ]               # dt object
-            if (decoder):                       # BRK
-                try:
-                    decoder(g.verbose, rec_offset, rec_buf, obj)
-                    if emitters and len(emitters):
-                        for e in emitters:
-                            e(g.verbose, rec_offset, rec_buf, obj)
-                except struct.error as e:
-                    eprint('*** decoder/emitter struct/obj error: (len: {}, '
-                          'rtype: {} {}, wanted: {}), @{}'.format(
-                              rlen, rtype, dt_name(rtype),
-                              len(obj) if obj else 0, rec_offset))
-                    eprint('*** {}'.format(e[0]))
-            else:
-                if g.debug or not g.quiet or g.verbose >= 5:
-                    eprint('*** no decoder installed for rtype {}, @{}'.format(
-                        rtype, rec_offset))
-            if (g.verbose >= 3):
-                print()
-                dump_hdr(rec_offset, rec_buf, '    ')
-                dump_buf(rec_buf, '    ')
-            if g.verbose >= 1 and not g.quiet and not g.mr_emitters:
-                print()
-            total_records += 1
-            total_bytes   += rlen
-            if (args.num and total_records >= args.num):
-                break
-            #
-            # if we have a SYNC_FLUSH then advance to the next sector
-            # boundary.  System_Flush and we should have a reboot record
-            # in the next sector.
-            #
-            if rtype == DT_SYNC_FLUSH:
-                new_offset = rec_offset + 512
-                new_offset &= 0xfffffe00
-                eprint()
-                eprint('*** SYNC_FLUSH: @{} advancing to next '
-                       'sector @{}'.format(rec_offset, new_offset))
-                eprint()
-                infile.seek(new_offset)
+        no_header = args.quiet or args.mr_emitters or args.columnar
+        if not no_header:
+            print(dtd.rec_title_str)
 
+        if args.jobs > 1:
+            sys.stdout.flush()
+            end_offset = dump_parallel(infile)
+        else:
+            dump_records(infile)
     except KeyboardInterrupt:
         eprint()
         eprint()
         eprint('*** user stop')
+    finally:
+        sys.stdout = stdout
+        out_sink.close()
+        out_sink   = None
+
+    if args.mmap:
+        num_resyncs   += infile.num_resyncs
+        chksum_errors += infile.chksum_errors
+    if args.columnar:
+        from tagcore.col_emitters import col_close
+        col_close()
+    if end_offset is None:
+        end_offset = infile.tell()
 
     eprint()
     eprint('*** end of processing @{}  (0x{:x})  processed: {} records  {} bytes'.format(
-            infile.tell(), infile.tell(), total_records, total_bytes))
+            end_offset, end_offset, total_records, total_bytes))
     eprint('*** reboots: {}  resyncs: {}  chksum_errs: {}  unk_rtypes: {}'.format(
         dtd.dt_count.get(DT_REBOOT, 0), num_resyncs, chksum_errors, unk_rtypes))
     if chksum_errors > 0:
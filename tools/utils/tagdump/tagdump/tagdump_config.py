@@ -8,6 +8,7 @@ import tagcore.globals as g
 
 pop = 'core_populate' if g.gps_level   is None else 'core_populate_ge'
 pop = 'mr_populate'   if g.mr_emitters is True else  pop
+pop = 'col_populate'  if g.columnar          else  pop
 pop = 'tagcore.' + pop
 
 # import populators for core, sensor, and sirf decode/emitters
@@ -62,6 +62,24 @@ optional arguments:
   --net           enable network (tagnet) i/o
                   (args.net, boolean)
 
+  --mmap          memory map a local input file and scan records in
+                  place (zero copy).  Not with --net, --tail, or -s.
+                  (args.mmap, boolean)
+
+  --jobs N        split a local input into SYNC delimited chunks and dump
+                  them using N worker processes.  Output is still in file
+                  order.  Not with --net, --tail, -s, or -n.
+                  (args.jobs, integer)
+
+  --fast          with --rtypes or -r, pass over the records those
+                  filters are going to toss using just their header.
+                  Their payload isn't read and their checksum isn't
+                  checked, so corruption in them isn't reported (and
+                  isn't in chksum_errs).  Only for local files, ignored
+                  with --net or --tail.  Default is to read and checksum
+                  every record.
+                  (args.fast, boolean)
+
   -s SYNC_DELTA   search some number of syncs backward
                   always implies --net, -s 0 says .last_sync
                   -s 1 and -s -1 both say sync one back.
@@ -69,12 +87,22 @@ optional arguments:
 
   --start START_TIME
                   include records with rtctime greater than START_TIME
-  --end END_TIME  (args.{start,end}_time)
+  --end END_TIME  (args.{start,end}, integer, secs since the epoch UTC)
 
   -r START_REC    starting/ending records to dump.
                   -r -1 says start with .last_rec (implies --net)
   -l LAST_REC     (args.{start,last}_rec, integer)
 
+                  if the input has a sidecar index (see --index), -r/-l
+                  and --start/--end use it to seek directly to the
+                  records wanted (unless -j is given).
+
+  --index         build the sidecar index, <input>.idx, and exit.  If an
+                  index already exists and the input has grown, the
+                  index is extended.  Entries are made for SYNC records.
+  --index_all     same as --index but index every record.
+                  (args.index, args.index_all, boolean)
+
   -t, --timeout TIMEOUT
                   set --tail timeout to TIMEOUT seconds, defaults to 60
 
@@ -82,6 +110,12 @@ optional arguments:
                   get new data as it arrives.  (implies --net)
                   (args.tail, boolean)
 
+  --follow        --tail for a local file that is being written, no net
+                  io.  Wakes as soon as the file grows (inotify, or
+                  polling if not available).  -t sets how long a single
+                  wait lasts before looking again.
+                  (args.follow, boolean)
+
   -x              tell tagdump to export records to an external database
   --export        (currently only influxdb export).  If no external linkage
                   available will abort. (args.export), currently disabled.
@@ -105,10 +139,26 @@ optional arguments:
   --gps_eval <n>  switch to gps evaluation emitters with display level <n>
                   9 display all gps entries.
 
+  -o, --output FILE
+                  write the display to FILE instead of stdout, FILE ending
+                  in .gz or .bz2 is compressed.  Output is buffered and
+                  written in large blocks either way, except to a
+                  terminal or with --net/--tail, written per record.
+                  (args.output, string)
+
+  --columnar DIR  export decoded records to columnar tables in DIR, one
+                  table per record type (EVENT, GPS_GEO, GPS_TRK, and
+                  sensors).  parquet if pyarrow is available otherwise
+                  csv.  Nothing is displayed.
+                  (args.columnar, string)
+
 
 positional parameters:
 
   input:          file to process.  (args.input)
+                  may be a compressed dblkz file (see tagcore/dblkz.py,
+                  convert with dblkz).  Seeking works as usual, --mmap,
+                  --jobs, and --index don't.
 
 
 '''
@@ -172,19 +222,30 @@ def parseargs():
                         action='store_true',
                         help='use tag net io, (unbuffered io)')
 
+    parser.add_argument('--mmap',
+                        action='store_true',
+                        help='memory map local input, zero copy scan')
+
+    parser.add_argument('--jobs',
+                        type=int,
+                        default=0,
+                        help='dump using JOBS worker processes')
+
+    parser.add_argument('--fast',
+                        action='store_true',
+                        help='skip filtered records on their header, no checksum')
+
     parser.add_argument('-s', '--sync',
                         type=int,
                         help='sync backward SYNC syncs')
 
-    # not working yet
     parser.add_argument('--start',
                         type=int,
-                        help='include records with rtctime >= than START')
+                        help='include records with rtctime >= than START (epoch secs)')
 
-    # not working yet
     parser.add_argument('--end',
                         type=int,
-                        help='stop with records after END')
+                        help='stop with records after END (epoch secs)')
 
     parser.add_argument('-r', '--start_rec',
                         type=int,
@@ -194,6 +255,14 @@ def parseargs():
                         type=int,
                         help='last record to dump.')
 
+    parser.add_argument('--index',
+                        action='store_true',
+                        help='build/extend the sidecar index and exit')
+
+    parser.add_argument('--index_all',
+                        action='store_true',
+                        help='same as --index, index every record')
+
     parser.add_argument('-t', '--timeout',
                         type=int,
                         default=60,
@@ -203,6 +272,10 @@ def parseargs():
                         action='store_true',
                         help='continue reading data at EOF')
 
+    parser.add_argument('--follow',
+                        action='store_true',
+                        help='follow a local file as it grows')
+
     parser.add_argument('-x', '--export',
                         action='store_true',
                         default=0,
@@ -225,6 +298,14 @@ def parseargs():
                         type=int,
                         help='use gps_eval emitters, at level <GPS_EVAL>')
 
+    parser.add_argument('-o', '--output',
+                        metavar='FILE',
+                        help='write the display to FILE (.gz/.bz2 compressed)')
+
+    parser.add_argument('--columnar',
+                        metavar='DIR',
+                        help='export records to columnar tables in DIR')
+
     parser.add_argument('-v', '--verbose',
                         action='count',
                         default=0,
@@ -244,11 +325,16 @@ tagcore.globals.quiet     = args.quiet
 tagcore.globals.pretty    = args.pretty
 tagcore.globals.gps_level = args.gps_eval
 tagcore.globals.mr_emitters = args.mr_emitters
+tagcore.globals.columnar    = args.columnar
 
 if args.mr_emitters and args.gps_eval:
     print('*** gps_eval and mr_emitters are mutually exclusive')
     sys.exit(1)
 
+if args.columnar and (args.mr_emitters or args.gps_eval):
+    print('*** columnar is exclusive of gps_eval and mr_emitters')
+    sys.exit(1)
+
 if args.noexport:
     tagcore.globals.export = -1
 
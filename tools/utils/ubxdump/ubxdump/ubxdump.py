@@ -31,6 +31,7 @@ Vebosity;
 
 from   __future__               import print_function
 
+import os
 import sys
 import struct
 
@@ -38,7 +39,8 @@ from   tagcore                  import *
 import tagcore.core_rev         as     vers
 from   tagcore.ubx_defs         import *
 import tagcore.ubx_defs         as     ubx
-import tagcore.tagfile          as     tf
+from   tagcore.ubx_frame        import GpsFramer, UBX_FRAME_BLOCK
+from   tagcore.outsink          import OutSink
 
 from   ubxdumpargs              import parseargs
 
@@ -86,6 +88,9 @@ ver_str = '\nubxdump: ' + VERSION
 #   -w              wide summary
 #                   (args.wide)
 #
+#   -o FILE         write the display to FILE (.gz/.bz2 compressed)
+#                   (args.output)
+#
 # positional parameters:
 #
 #   input:          file to process.  (args.input)
@@ -97,7 +102,8 @@ ver_str = '\nubxdump: ' + VERSION
 verbose                 = 0             # how chatty to be
 debug                   = 0             # extra debug chatty
 
-MAX_ZERO_HDRS           = 4096          # 4K bytes of zero
+next_offset             = 0             # just past the last packet
+hunting                 = False         # framer reported a problem
 
 # global stat counters
 num_hunt                = 0             # how often hunting for packet start
@@ -121,156 +127,71 @@ def init_globals():
     total_bytes         = 0
 
 
-def hunt(fd, offset):
+def frame_err(err):
     '''
-    hunt for next start of packet
-
-    input:   fd         file descriptor
-             offset     where to start the hunt
-
-    returns: offset     where we found the new start
+    called by the framer for each problem it runs into, in stream order.
+    the framer has already moved on (hunted) to the next good SOP.
     '''
-
-    global num_hunt
-
-    print('*** hunt started @{0} (0x{0:x})'.format(offset))
-    fd.seek(offset)
+    global num_hunt, chksum_errors, hunting
+
+    offset = err.offset
+    if err.kind == 'chksum':
+        chksum_errors += 1
+        chksum1 = '*** checksum failure @{0} (0x{0:x}) ' + \
+                  '[wanted: 0x{1:x}, got: 0x{2:x}]'
+        print(chksum1.format(offset, err.want, err.got))
+        dump_buf(err.msg)
+    elif err.kind == 'len':
+        print('*** bad len: {}, @{}'.format(err.got, offset))
+    else:
+        print('*** incorrect number of bytes read: wanted {}, got {}, @{}'.format(
+            err.want, err.got, offset))
+        return
     num_hunt += 1
-    zero_hdrs = 0
-    accum     = 0
-    while (True):
-        offset = fd.tell()
-        try:
-            byte   = fd.read(1)          # get next byte
-            accum  = (accum & 0xff) << 8 | ord(byte)
-            if accum == UBX_SOP_SEQ:
-                break
-        except IOError:
-            print('*** hunt: file io error @{}'.format(offset))
-            return -1
-        except EOFError:
-            print('*** hunt: end of file @{}'.format(offset))
-            return -1
-        except:
-            print('*** hunt: exception error: {} @{}'.format(
-                sys.exc_info()[0], offset))
-            raise
-        if (accum == 0):
-            zero_hdrs += 1
-            if (zero_hdrs > MAX_ZERO_HDRS):
-                print('*** hunt: too many zeros ({}), bailing, @{}'.format(
-                    MAX_ZERO_HDRS, offset))
-                return -1
-        else:
-            zero_hdrs = 0
-    fd.seek(-2, 1)                  # back up to beginning of start of packet
-    offset = fd.tell()
+    hunting   = True
     if (verbose >= 4):
-        print('*** hunt: found SOP @{0} (0x{0:x})'.format(offset))
-    return offset
+        print('*** hunt started @{0} (0x{0:x})'.format(offset + 1))
 
 
-def get_record(fd):
-    """get next ubxbin record
+def get_records(fd, start):
+    """get ubxbin records
 
-    generate next valid sirfbin record, one at a time until no
-    more bytes to read from input.
+    generate valid ubxbin records, one at a time, from the input starting
+    at start.  The input is read a block at a time and pushed through a
+    GpsFramer (tagcore.ubx_frame) which does the framing and checksums.
 
-    Yields one record each time (offset, rec_len, cid, rec_buf).
+    Yields one record each time (offset, cid, rec_len, rec_buf).
 
-    Input:   fd:         file descriptor we are reading from
+    Input:   fd:         file we are reading from
+             start:      where to start
     Output:  rec_offset: byte offset of the record from start of file
              cid:        type of packet
              rec_len:    record length
              rec_buf:    byte buffer with entire record
     """
 
-    global chksum_errors
-
-    # output variables
-    offset      = 0
-    last_offset = -1
-    len_val     = 0
-    cid         = 0
-    rec_buf     = bytearray()
-
-    while (True):
-        offset = fd.tell()
-        if offset == last_offset:
-            #
-            # offset/last_offset being equal says we are doing a rehunt
-            # and we ended back at the same record.
-            #
-            # advance our current position to just beyond the last sync we
-            # tried.  Find the next one.
-            #
-            offset += 1                 # move to next possible
-            print('*** rehunt: moving to: @{0} (0x{0:x})'.format(offset))
-            offset = hunt(fd, offset)
-            if (offset < 0):
-                break
-            continue
-        last_offset = offset
-        rec_buf = bytearray(fd.read(UBX_HDR_SIZE))
-        if (len(rec_buf) != UBX_HDR_SIZE):
-            print('*** header read problem: wanted {}, got {}, @{}'.format(
-                UBX_HDR_SIZE, len(rec_buf), offset))
-            break                       # oops
-        hdr, cid = ubx.ubx_cid_struct.unpack(rec_buf[0:UBX_LEN_OFFSET])
-        if hdr != UBX_SOP_SEQ:
-            print('*** bad SOP: x{:04x}, @{}'.format(hdr, offset))
-            offset = hunt(fd, offset)
-            if (offset < 0):
-                break
-            continue
-
-        # little endian
-        len_val = rec_buf[UBX_LEN_OFFSET] | (rec_buf[UBX_LEN_OFFSET + 1] << 8)
-
-        # read len_val payload bytes, check for too big.
-        if len_val > UBX_MAX_PAYLOAD:
-            print('*** bad len: {}, @{}'.format(len_val, offset))
-            offset = hunt(fd, offset)
-            if (offset < 0):
-                break
-            continue
-
-        # read in payload and checksum
-        rec_len = len_val + UBX_CHK_SIZE
-        rec_buf.extend(bytearray(fd.read(rec_len)))
-
-        # account for the header already read in.
-        rec_len += UBX_HDR_SIZE
-        if len(rec_buf) != rec_len:
-            print('*** incorrect number of bytes read: wanted {}, got {}, @{}'.format(
-                rec_len, len(rec_buf), offset))
-            break                       # oops, bail
-
-        # verify checksum.
-        chka = 0
-        chkb = 0
-        for idx in range(UBX_CLASS_OFFSET, rec_len - UBX_CHK_SIZE):
-            chka += rec_buf[idx]
-            chka &= 0xff
-            chkb += chka
-            chkb &= 0xff
-        rec_sum = rec_buf[rec_len - UBX_CHK_SIZE] << 8 | rec_buf[rec_len - UBX_CHK_SIZE + 1]
-        chksum  = chka << 8 | chkb
-        if (chksum != rec_sum):
-            chksum_errors += 1
-            chksum1 = '*** checksum failure @{0} (0x{0:x}) ' + \
-                      '[wanted: 0x{1:x}, got: 0x{2:x}]'
-            print(chksum1.format(offset, rec_sum, chksum))
-            dump_buf(rec_buf)
-            offset = hunt(fd, offset)
-            if (offset < 0):
-                break
-            continue                    # try again
-
-        return offset, cid, rec_len, rec_buf
-
-    # oops.  things blew up.  just return -1 for the offset
-    return -1, 0, 0, ''
+    global num_hunt, next_offset, hunting
+
+    next_offset = start
+    hunting     = False
+    framer = GpsFramer(err = frame_err, nmea = False, base = start)
+    fd.seek(start)
+    while True:
+        data = fd.read(UBX_FRAME_BLOCK)
+        msgs = framer.push(data) if data else framer.close()
+        for msg in msgs:
+            offset = msg.offset
+            if offset != next_offset and not hunting:
+                # junk in front of the packet, not an SOP.
+                num_hunt += 1
+                if (verbose >= 4):
+                    print('*** hunt: skipped {0} bytes, found SOP @{2} (0x{2:x})'.format(
+                        offset - next_offset, next_offset, offset))
+            hunting = False
+            next_offset = offset + len(msg.msg)
+            yield offset, msg.cid, len(msg.msg), msg.msg
+        if not data:
+            break
 
 
 # format for summary
@@ -297,6 +218,7 @@ def dump(args):
     global verbose, debug
     global num_hunt, chksum_errors, unk_cids
     global total_records, total_bytes
+    global next_offset
 
     init_globals()
     verbose = args.verbose if (args.verbose) else 0
@@ -335,96 +257,109 @@ def dump(args):
         print()
 
 
-    # create file object that handles both buffered and direct io
-    infile  = tf.TagFile(args.input)
-
+    size  = os.fstat(args.input.fileno()).st_size
+    start = 0
     if (args.jump):
-        infile.seek(args.jump)
+        if (args.jump == -1):
+            start = size
+        elif (args.jump < 0):
+            start = max(0, size + args.jump)
+        else:
+            start = min(args.jump, size)
+    next_offset = start
 
     wide = ''
     if (args.wide):
         wide = '                                            '
 
-    print(title0.format(wide))
+    # the emitters print, collect it in the sink and write in big blocks
+    stdout     = sys.stdout
+    sink       = OutSink(args.output)
+    sys.stdout = sink
 
-    # extract record from input file and output decoded results
     try:
-        while(True):
-            rec_offset, cid, rlen, rec_buf = get_record(infile)
-            if rec_offset < 0:
-                break
-
-            # look to see if past file position bound
-            if (args.endpos and rec_offset > args.endpos):
-                break                       # all done
+        print(title0.format(wide))
 
-            count_cid(cid)
-
-            # first print the summary
-
-            v = ubx.cid_table.get(cid, (None, None, None, 'unk'))
-            decoder  = v[CID_DECODER]           # cid_table function
-            emitters = v[CID_EMITTERS]          # cid_table emitter list
-            obj      = v[CID_OBJECT]
-            cid_name = v[CID_NAME]              # and the name of the cid
-
-            # first display the summary, then any additional decodes
-            print(summary0.format(rec_offset, rlen, wide, cid, cid_name),
-                  end = '')
-
-            # get_record has verified that we have a proper header and
-            # validated checksum.  All ubx decoders assume we are pointing
-            # at the start of the ubx header (the SOP).
-
-            if (decoder):
-                try:
-                    decoder(verbose, rec_offset, rec_buf, obj)
-                    if not emitters or len(emitters) == 0:
+        # extract record from input file and output decoded results
+        try:
+            for rec_offset, cid, rlen, rec_buf in get_records(args.input, start):
+                sink.check()
+                # look to see if past file position bound
+                if (args.endpos and rec_offset > args.endpos):
+                    break                       # all done
+
+                count_cid(cid)
+
+                # first print the summary
+
+                v = ubx.cid_table.get(cid, (None, None, None, 'unk'))
+                decoder  = v[CID_DECODER]           # cid_table function
+                emitters = v[CID_EMITTERS]          # cid_table emitter list
+                obj      = v[CID_OBJECT]
+                cid_name = v[CID_NAME]              # and the name of the cid
+
+                # first display the summary, then any additional decodes
+                print(summary0.format(rec_offset, rlen, wide, cid, cid_name),
+                      end = '')
+
+                # get_records has verified that we have a proper header and
+                # validated checksum.  All ubx decoders assume we are pointing
+                # at the start of the ubx header (the SOP).
+
+                if (decoder):
+                    try:
+                        decoder(verbose, rec_offset, rec_buf, obj)
+                        if not emitters or len(emitters) == 0:
+                            print()
+                            if (verbose >= 5):
+                                print('*** no emitters defined for cid x{:04x}'.format(cid))
+                        else:
+                            for e in emitters:
+                                e(verbose, rec_offset, rec_buf, obj, -1)
+                    except struct.error:
+                        print()
+                        print('*** decode error: (len: {}, cid: x{:04x} {}, '
+                              'expected: {}), @{}'.format(rlen, cid, cid_name,
+                              len(obj) if obj else 0, rec_offset))
+                else:
+                    print()
+                    if (verbose >= 5):
                         print()
-                        if (verbose >= 5):
-                            print('*** no emitters defined for cid x{:04x}'.format(cid))
-                    else:
-                        for e in emitters:
-                            e(verbose, rec_offset, rec_buf, obj, -1)
-                except struct.error:
+                        print('*** no decoder installed for cid x{:04x} '
+                              '({}), @{}'.format(cid, cid_name, rec_offset),
+                              end = '')
+                if (verbose >= 3):
                     print()
-                    print('*** decode error: (len: {}, cid: x{:04x} {}, '
-                          'expected: {}), @{}'.format(rlen, cid, cid_name,
-                          len(obj) if obj else 0, rec_offset))
-            else:
-                print()
-                if (verbose >= 5):
+                    dump_buf(rec_buf, '    ')
+                if (verbose >= 1):
                     print()
-                    print('*** no decoder installed for cid x{:04x} '
-                          '({}), @{}'.format(cid, cid_name, rec_offset),
-                          end = '')
-            if (verbose >= 3):
-                print()
-                dump_buf(rec_buf, '    ')
-            if (verbose >= 1):
-                print()
-            total_records += 1
-            total_bytes   += rlen
-            if (args.num and total_records >= args.num):
-                break
-    except KeyboardInterrupt:
+                total_records += 1
+                total_bytes   += rlen
+                if (args.num and total_records >= args.num):
+                    break
+        except KeyboardInterrupt:
+            print()
+            print()
+            print('*** user stop')
+
+        print()
+        print('*** end of processing @{} (0x{:x}),  processed: {} records, {} bytes'.format(
+            next_offset, next_offset, total_records, total_bytes))
+        print('*** hunts: {}, chksum_errs: {}, unk_cids: {}'.format(
+            num_hunt, chksum_errors, unk_cids))
         print()
+        out = []
+        for k,v in sorted(ubx.cid_count.iteritems()):
+            out.append(('x{:04x}: {}'.format(k, v)))
+        print('cid/s: { ', end = '')
+        print(*out, sep=', ', end='')
+        print(' }')
         print()
-        print('*** user stop')
-
-    print()
-    print('*** end of processing @{} (0x{:x}),  processed: {} records, {} bytes'.format(
-        infile.tell(), infile.tell(), total_records, total_bytes))
-    print('*** hunts: {}, chksum_errs: {}, unk_cids: {}'.format(
-        num_hunt, chksum_errors, unk_cids))
-    print()
-    out = []
-    for k,v in sorted(ubx.cid_count.iteritems()):
-        out.append(('x{:04x}: {}'.format(k, v)))
-    print('cid/s: { ', end = '')
-    print(*out, sep=', ', end='')
-    print(' }')
-    print()
+    finally:
+        # put stdout back even if something blew up, the traceback
+        # comes out after whatever was buffered
+        sys.stdout = stdout
+        sink.close()
 
 if __name__ == "__main__":
     dump(parseargs())
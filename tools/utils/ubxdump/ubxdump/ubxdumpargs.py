@@ -66,6 +66,10 @@ def parseargs():
                         action='store_true',
                         help='extra wide summary (better viewing)')
 
+    parser.add_argument('-o', '--output',
+                        metavar='FILE',
+                        help='write the display to FILE (.gz/.bz2 compressed)')
+
     return parser.parse_args()
 
 if __name__ == '__main__':